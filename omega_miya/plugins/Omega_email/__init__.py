@@ -1,4 +1,5 @@
 import re
+import asyncio
 from nonebot import MatcherGroup, export, logger
 from nonebot.rule import to_me
 from nonebot.permission import SUPERUSER
@@ -6,7 +7,7 @@ from nonebot.typing import T_State
 from nonebot.adapters.cqhttp.bot import Bot
 from nonebot.adapters.cqhttp.event import MessageEvent, GroupMessageEvent
 from nonebot.adapters.cqhttp.permission import GROUP
-from omega_miya.utils.Omega_Base import DBEmailBox, DBGroup
+from omega_miya.utils.Omega_Base import DBEmailBox, DBGroup, Result
 from omega_miya.utils.Omega_plugin_utils import init_export, has_command_permission, has_auth_node
 from .utils import check_mailbox, get_unseen_mail_info, encrypt_password, decrypt_password
 
@@ -183,38 +184,51 @@ async def handle_first_receive(bot: Bot, event: GroupMessageEvent, state: T_Stat
     mail_box_list_msg = '\n'.join([x for x in group_bind_mailbox.result])
     await mail_receive.send(f'本群组已绑定邮箱:\n{mail_box_list_msg}\n\n正在连接到邮箱服务器, 请稍后...')
 
-    for mailbox_address in group_bind_mailbox.result:
-        mailbox = DBEmailBox(address=mailbox_address).get_info()
-        if not mailbox.success():
-            logger.error(f'邮箱 {mailbox_address} 信息获取失败, 请检查数据库, error: {mailbox.info}')
-            await mail_receive.send(f'邮箱: {mailbox_address} 收件失败QAQ, 请联系管理员处理')
-            continue
+    # 各邮箱并行收件
+    receive_results = await asyncio.gather(*[__receive_mailbox(mailbox_address=x)
+                                             for x in group_bind_mailbox.result])
 
-        host = mailbox.result.get('server_host')
-        password = mailbox.result.get('password')
-        # 解密密码
-        password = decrypt_password(ciphertext=password)
-        if not password.success():
-            logger.error(f'邮箱 {mailbox_address} 密码验证失败')
-            await mail_receive.send(f'邮箱: {mailbox_address}\n密码验证失败QAQ, 请联系管理员处理')
-            continue
-        password = password.result
-        unseen_mail_res = await get_unseen_mail_info(address=mailbox_address, server_host=host, password=password)
-        if not unseen_mail_res.success():
-            logger.error(f'邮箱 {mailbox_address} 收件失败, error: {unseen_mail_res.info}')
-            await mail_receive.send(f'邮箱: {mailbox_address}\n收件失败QAQ, 请稍后再试')
+    for mailbox_address, receive_res in zip(group_bind_mailbox.result, receive_results):
+        if receive_res.error:
+            await mail_receive.send(receive_res.info)
             continue
-        elif not unseen_mail_res.result:
+        elif not receive_res.result:
             logger.info(f'邮箱 {mailbox_address} 收件完成, 没有新的邮件')
             await mail_receive.send(f'邮箱: {mailbox_address}\n收件完成, 没有新的邮件~')
             continue
         else:
-            for mail in unseen_mail_res.result:
-                html = mail.html
+            for mail in receive_res.result:
+                html = mail.html or mail.body or ''
                 content = re.sub(r'<[^>]*>', '', html)
                 content = re.sub(r'\s', '', content)
                 content = content.replace('&nbsp;', '').replace('\n', '').replace(' ', '')
                 msg = f"【{mail.header}】\n时间: {mail.date}\n发件人: {mail.sender}\n{'='*16}\n{content}"
                 await mail_receive.send(msg)
-            logger.info(f'邮箱 {mailbox_address} 收件完成, 共{len(unseen_mail_res.result)}封新的邮件')
-            await mail_receive.send(f'邮箱: {mailbox_address}\n收件完成, 共{len(unseen_mail_res.result)}封新的邮件~')
+            logger.info(f'邮箱 {mailbox_address} 收件完成, 共{len(receive_res.result)}封新的邮件')
+            await mail_receive.send(f'邮箱: {mailbox_address}\n收件完成, 共{len(receive_res.result)}封新的邮件~')
+
+
+async def __receive_mailbox(mailbox_address: str) -> Result:
+    """
+    :return: 失败时 info 为发送给用户的提示
+    """
+    mailbox = DBEmailBox(address=mailbox_address).get_info()
+    if not mailbox.success():
+        logger.error(f'邮箱 {mailbox_address} 信息获取失败, 请检查数据库, error: {mailbox.info}')
+        return Result(error=True, info=f'邮箱: {mailbox_address} 收件失败QAQ, 请联系管理员处理', result=[])
+
+    host = mailbox.result.get('server_host')
+    port = mailbox.result.get('port') or 993
+    password = mailbox.result.get('password')
+    # 解密密码
+    password = decrypt_password(ciphertext=password)
+    if not password.success():
+        logger.error(f'邮箱 {mailbox_address} 密码验证失败')
+        return Result(error=True, info=f'邮箱: {mailbox_address}\n密码验证失败QAQ, 请联系管理员处理', result=[])
+    password = password.result
+    unseen_mail_res = await get_unseen_mail_info(address=mailbox_address, server_host=host, password=password,
+                                                 port=port)
+    if not unseen_mail_res.success():
+        logger.error(f'邮箱 {mailbox_address} 收件失败, error: {unseen_mail_res.info}')
+        return Result(error=True, info=f'邮箱: {mailbox_address}\n收件失败QAQ, 请稍后再试', result=[])
+    return unseen_mail_res
@@ -1,18 +1,46 @@
 import imaplib
 import email
 import hashlib
+import re
+import threading
 from email.header import Header
-from typing import List
+from typing import Dict, List, Optional, Tuple
+
+
+def _decode_header(value: Optional[str]) -> str:
+    if value is None:
+        return ''
+    result = ''
+    for text, charset in email.header.decode_header(value):
+        if charset and type(text) == bytes:
+            result += str(text, encoding=charset, errors='replace')
+        elif type(text) == bytes:
+            result += str(text, encoding='utf8', errors='replace')
+        else:
+            result += text
+    return result
+
+
+def _decode_payload(part) -> str:
+    charset = part.get_content_charset()
+    payload = part.get_payload(decode=True)
+    if charset and type(payload) == bytes:
+        return str(payload, encoding=charset, errors='replace')
+    elif type(payload) == bytes:
+        return str(payload, encoding='utf8', errors='replace')
+    else:
+        return str(payload)
 
 
 class Email(object):
-    def __init__(self, date: str, header: str, sender: str, to: str, body: str = '', html: str = ''):
+    def __init__(self, date: str, header: str, sender: str, to: str, body: str = '', html: str = '', uid: int = 0):
         self.date = date
         self.header = header
         self.sender = sender
         self.to = to
         self.body = body
         self.html = html
+        self.uid = uid
 
         hash_str = str([date, header, sender, to])
         md5 = hashlib.md5()
@@ -20,6 +48,24 @@ class Email(object):
         _hash = md5.hexdigest()
         self.hash = _hash
 
+    @classmethod
+    def from_message(cls, msg: email.message.Message, uid: int = 0) -> 'Email':
+        """
+        解析邮件, 只有邮件头时 body 与 html 为 None
+        """
+        body = None
+        html = None
+        for part in msg.walk():
+            if part.get_content_type() == "text/plain":
+                body = _decode_payload(part).replace(r'&nbsp;', '\n')
+            elif part.get_content_type() == "text/html":
+                html = _decode_payload(part).replace('&nbsp;', '')
+            else:
+                pass
+        return cls(date=_decode_header(msg.get('Date')), header=_decode_header(msg.get('subject')),
+                   sender=_decode_header(msg.get('from')), to=_decode_header(msg.get('to')),
+                   body=body, html=html, uid=uid)
+
     def __repr__(self):
         return f'<Email(header={self.header}, _from={self.sender}, to={self.to}' \
                f"\n\nbody={self.body}\n\nhtml={self.html})>"
@@ -38,89 +84,136 @@ class EmailImap(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """exit方法，关闭文件并返回True"""
-        self.__mail.select()
         if self.__mail.state == 'SELECTED':
             self.__mail.close()
+        if self.__mail.state in ['AUTH', 'SELECTED']:
             self.__mail.logout()
         return True
 
-    def get_mail_info(self, charset, *criteria) -> List[Email]:
-        self.__mail.login(self.__address, self.__password)
-        self.__mail.select()
-        typ, msg_nums = self.__mail.search(charset, *criteria)
-        msg_nums = str(msg_nums[0], encoding='utf8')
-
-        result_list = []
-
-        # 遍历所有邮件
-        for num in msg_nums.split(' '):
-            if num == '':
-                continue
-
-            stat_code, data = self.__mail.fetch(num, 'RFC822')
-            msg = email.message_from_bytes(data[0][1])
-
-            # 解析邮件
-            # 日期
-            date = email.header.decode_header(msg.get('Date'))[0][0]
-            date = str(date)
-
-            # 标题
-            header, charset = email.header.decode_header(msg.get('subject'))[0]
-            header = str(header, encoding=charset)
-
-            # 发件人
-            sender_info = email.header.decode_header(msg.get('from'))
-            sender = ''
-            for sender_text, charset in sender_info:
-                if charset and type(sender_text) == bytes:
-                    sender_text = str(sender_text, encoding=charset)
-                    sender += sender_text
-                elif type(sender_text) == bytes:
-                    sender_text = str(sender_text, encoding='utf8')
-                    sender += sender_text
-                else:
-                    sender += sender_text
-
-            # 收件人
-            receiver_info = email.header.decode_header(msg.get('to'))
-            receiver = ''
-            for receiver_text, charset in receiver_info:
-                if charset and type(receiver_text) == bytes:
-                    receiver_text = str(receiver_text, encoding=charset)
-                    receiver += receiver_text
-                elif type(receiver_text) == bytes:
-                    receiver_text = str(receiver_text, encoding='utf8')
-                    receiver += receiver_text
-                else:
-                    receiver += receiver_text
-
-            body = None
-            html = None
-            for part in msg.walk():
-                if part.get_content_type() == "text/plain":
-                    charset = part.get_content_charset()
-                    body = part.get_payload(decode=True)
-                    if charset and type(body) == bytes:
-                        body = str(body, encoding=charset)
-                    elif type(body) == bytes:
-                        body = str(body, encoding='utf8')
-                    else:
-                        body = str(body)
-                    body = body.replace(r'&nbsp;', '\n')
-                elif part.get_content_type() == "text/html":
-                    charset = part.get_content_charset()
-                    html = part.get_payload(decode=True)
-                    if charset and type(html) == bytes:
-                        html = str(html, encoding=charset)
-                    elif type(html) == bytes:
-                        html = str(html, encoding='utf8')
-                    else:
-                        html = str(html)
-                    html = html.replace('&nbsp;', '')
-                else:
-                    pass
-
-            result_list.append(Email(date=date, header=header, sender=sender, to=receiver, body=body, html=html))
-
-        return result_list
+
+class MailboxSession(object):
+    """
+    保持登录状态的邮箱连接, 增量同步收件箱中的未读邮件
+    记录已处理的最大 UID, 之后只搜索更大的 UID; UIDVALIDITY 变化时重新从头同步
+    先批量获取邮件头用于去重, 再批量获取未处理邮件的完整内容, 获取均使用 BODY.PEEK, 处理完成后统一标记为已读
+    imaplib 连接不是线程安全的, 同一邮箱的同步操作需持有 lock
+    """
+    # 获取邮件头的字段
+    __header_fields = 'BODY.PEEK[HEADER.FIELDS (DATE SUBJECT FROM TO)]'
+    __uid_pattern = re.compile(rb'UID (\d+)')
+
+    def __init__(self, host: str, address: str, password: str, port: int = 993,
+                 batch_size: int = 50, timeout: float = 30):
+        self.host = host
+        self.address = address
+        self.password = password
+        self.port = port
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.__mail: Optional[imaplib.IMAP4_SSL] = None
+        self.__uid_validity: Optional[bytes] = None
+        self.__last_uid = 0
+
+    def __connect(self) -> imaplib.IMAP4_SSL:
+        mail = imaplib.IMAP4_SSL(host=self.host, port=self.port)
+        mail.sock.settimeout(self.timeout)
+        mail.login(self.address, self.password)
+        mail.select()
+        _, (uid_validity, *_) = mail.response('UIDVALIDITY')
+        if uid_validity != self.__uid_validity:
+            self.__uid_validity = uid_validity
+            self.__last_uid = 0
+        return mail
+
+    def __ensure(self) -> imaplib.IMAP4_SSL:
+        """
+        返回可用的连接, 连接断开时重新登录
+        """
+        if self.__mail is not None:
+            try:
+                self.__mail.noop()
+                return self.__mail
+            except Exception:
+                self.__drop()
+        self.__mail = self.__connect()
+        return self.__mail
+
+    def __drop(self) -> None:
+        mail, self.__mail = self.__mail, None
+        if mail is None:
+            return
+        try:
+            mail.logout()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        with self.lock:
+            self.__drop()
+
+    def __batches(self, uids: List[int]):
+        for i in range(0, len(uids), self.batch_size):
+            yield uids[i:i + self.batch_size]
+
+    def __fetch(self, mail: imaplib.IMAP4_SSL, uids: List[int], message_parts: str) -> Dict[int, bytes]:
+        """
+        :return: UID -> 获取到的内容
+        """
+        result = {}
+        for batch in self.__batches(uids):
+            typ, data = mail.uid('FETCH', ','.join(str(x) for x in batch), f'(UID {message_parts})')
+            if typ != 'OK':
+                raise imaplib.IMAP4.error(f'FETCH failed: {data}')
+            for item in data:
+                if not isinstance(item, tuple):
+                    continue
+                uid_match = self.__uid_pattern.search(item[0])
+                if uid_match:
+                    result[int(uid_match.group(1))] = item[1]
+        return result
+
+    def __search_new(self, mail: imaplib.IMAP4_SSL) -> List[int]:
+        if self.__last_uid:
+            typ, data = mail.uid('SEARCH', None, 'UNSEEN', f'UID {self.__last_uid + 1}:*')
+        else:
+            typ, data = mail.uid('SEARCH', None, 'UNSEEN')
+        if typ != 'OK':
+            raise imaplib.IMAP4.error(f'SEARCH failed: {data}')
+        # "n:*" 在没有更大的 UID 时仍会返回当前最大的 UID, 需要过滤
+        return sorted(x for x in map(int, data[0].split()) if x > self.__last_uid)
+
+    def sync(self, known_hash_filter=None) -> Tuple[List[Email], List[Email]]:
+        """
+        获取上次同步后新增的未读邮件
+        :param known_hash_filter: 传入邮件 hash 列表, 返回其中已处理过的 hash 集合, 这些邮件不再获取完整内容
+        :return: (新邮件列表, 已处理过的邮件列表), 已处理过的邮件只有邮件头
+        """
+        with self.lock:
+            try:
+                return self.__sync(known_hash_filter=known_hash_filter)
+            except Exception:
+                # 出错后丢弃连接, 下次同步时重新登录
+                self.__drop()
+                raise
+
+    def __sync(self, known_hash_filter=None) -> Tuple[List[Email], List[Email]]:
+        mail = self.__ensure()
+        uids = self.__search_new(mail)
+        if not uids:
+            return [], []
+
+        headers = {uid: Email.from_message(email.message_from_bytes(raw), uid=uid)
+                   for uid, raw in self.__fetch(mail, uids, self.__header_fields).items()}
+        known_hashes = known_hash_filter([x.hash for x in headers.values()]) if known_hash_filter else set()
+        known_mails = [x for x in headers.values() if x.hash in known_hashes]
+        new_uids = sorted(uid for uid, x in headers.items() if x.hash not in known_hashes)
+
+        new_mails = [Email.from_message(email.message_from_bytes(raw), uid=uid)
+                     for uid, raw in sorted(self.__fetch(mail, new_uids, 'BODY.PEEK[]').items())]
+
+        # 统一标记为已读
+        for batch in self.__batches(uids):
+            mail.uid('STORE', ','.join(str(x) for x in batch), '+FLAGS', r'(\Seen)')
+        self.__last_uid = max(uids)
+        return new_mails, known_mails
@@ -1,14 +1,59 @@
 import asyncio
 import nonebot
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Set
 from omega_miya.utils.Omega_Base import DBEmail, Result
 from omega_miya.utils.Omega_plugin_utils import AESEncryptStr
-from .imap import EmailImap
+from .imap import EmailImap, MailboxSession
 
 
 global_config = nonebot.get_driver().config
 AES_KEY = global_config.aes_key
 
+# 同时同步的邮箱数
+SYNC_WORKERS = int(getattr(global_config, 'email_sync_workers', 4))
+# 单次 FETCH 的邮件数
+FETCH_BATCH_SIZE = int(getattr(global_config, 'email_fetch_batch_size', 50))
+
+__sync_executor = ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='omega_email')
+# 邮箱地址 -> 保持登录的邮箱连接
+__sessions: Dict[str, MailboxSession] = {}
+__sessions_lock = threading.Lock()
+
+
+def __get_session(address: str, server_host: str, password: str, port: int) -> MailboxSession:
+    with __sessions_lock:
+        session = __sessions.get(address)
+        if session is not None and (session.host, session.password, session.port) != (server_host, password, port):
+            # 邮箱信息变化后重新登录
+            session.close()
+            session = None
+        if session is None:
+            session = __sessions[address] = MailboxSession(
+                host=server_host, address=address, password=password, port=port, batch_size=FETCH_BATCH_SIZE)
+        return session
+
+
+def __list_exist_hash(mail_hashes: Iterable[str]) -> Set[str]:
+    res = DBEmail.list_exist_hash(mail_hashes=mail_hashes)
+    if not res.success():
+        raise RuntimeError(f'Query exist mail hash failed: {res.info}')
+    return res.result
+
+
+@nonebot.get_driver().on_shutdown
+async def __close_sessions():
+    def __close():
+        with __sessions_lock:
+            for session in __sessions.values():
+                session.close()
+            __sessions.clear()
+
+    await asyncio.get_running_loop().run_in_executor(None, __close)
+    __sync_executor.shutdown(wait=False)
+
 
 async def check_mailbox(address: str, server_host: str, password: str) -> Result:
     def __check_mailbox() -> Result:
@@ -27,24 +72,25 @@ async def check_mailbox(address: str, server_host: str, password: str) -> Result
     return result
 
 
-async def get_unseen_mail_info(address: str, server_host: str, password: str) -> Result:
+async def get_unseen_mail_info(address: str, server_host: str, password: str, port: int = 993) -> Result:
+    """
+    增量同步邮箱中的未读邮件, 在线程池中执行, 不同邮箱可以并行同步
+    :return: result 为新邮件列表, 已保存过的邮件不再返回
+    """
     def __get_unseen_mail_info() -> Result:
         try:
-            mail = EmailImap(host=server_host, address=address, password=password)
-            unseen_mails = mail.get_mail_info(None, 'UNSEEN')
-            res = []
-            for email in unseen_mails:
+            session = __get_session(address=address, server_host=server_host, password=password, port=port)
+            new_mails, _ = session.sync(known_hash_filter=__list_exist_hash)
+            for email in new_mails:
                 DBEmail(mail_hash=email.hash).add(date=email.date, header=email.header, sender=email.sender,
                                                   to=email.to, body=email.body, html=email.html)
-
-                res.append(email)
-            __result = Result(error=False, info='Success', result=res)
+            __result = Result(error=False, info='Success', result=new_mails)
         except Exception as e:
             __result = Result(error=True, info=repr(e), result=[])
         return __result
 
     loop = asyncio.get_running_loop()
-    result = await loop.run_in_executor(None, __get_unseen_mail_info)
+    result = await loop.run_in_executor(__sync_executor, __get_unseen_mail_info)
 
     return result
 
@@ -1,8 +1,64 @@
 import asyncio
-from nonebot import logger, require, get_bots
+from collections import deque
+from typing import Deque, Dict, Set
+from nonebot import logger, require, get_driver
 from nonebot.adapters.cqhttp import MessageSegment
 from omega_miya.utils.Omega_Base import DBSubscription, DBDynamic, DBTable
-from .utils import get_user_dynamic_history, get_user_info, get_user_dynamic, get_dynamic_info, pic_2_base64
+from omega_miya.utils.Omega_plugin_utils import notice_dispatcher
+from .utils import get_user_dynamic_history, get_user_info, get_dynamic_info, pic_2_source
+
+
+class DynamicTracker(object):
+    """
+    按用户记录已处理动态的高水位(最大 dynamic_id)及最近处理过的 recent_size 条动态 id
+    dynamic_id 随发布时间递增, 不超过高水位的动态均视为已处理, 判断为 O(1) 且无需加载历史动态
+    尚无高水位的用户(新订阅或无记录)沿用原有逻辑, 未处理过的动态均视为新动态
+    """
+    def __init__(self, recent_size: int = 50):
+        self.recent_size = recent_size
+        self.__high_water: Dict[int, int] = {}
+        self.__recent: Dict[int, Deque[int]] = {}
+        self.__recent_set: Dict[int, Set[int]] = {}
+        self.seeded = False
+
+    def seed(self, latest_dynamic_ids: Dict[int, int]) -> None:
+        for uid, dynamic_id in latest_dynamic_ids.items():
+            self.mark(uid, dynamic_id)
+        self.seeded = True
+
+    def is_new(self, uid: int, dynamic_id: int) -> bool:
+        if dynamic_id in self.__recent_set.get(uid, ()):
+            return False
+        high_water = self.__high_water.get(uid)
+        return high_water is None or dynamic_id > high_water
+
+    def mark(self, uid: int, dynamic_id: int) -> None:
+        if dynamic_id > self.__high_water.get(uid, -1):
+            self.__high_water[uid] = dynamic_id
+        recent = self.__recent.setdefault(uid, deque())
+        recent_set = self.__recent_set.setdefault(uid, set())
+        if dynamic_id in recent_set:
+            return
+        recent.append(dynamic_id)
+        recent_set.add(dynamic_id)
+        if len(recent) > self.recent_size:
+            recent_set.discard(recent.popleft())
+
+
+dynamic_tracker = DynamicTracker()
+
+
+# 启动时以一次聚合查询初始化各用户的动态高水位
+async def init_dynamic_tracker():
+    _res = await DBDynamic.async_latest_dynamic_ids()
+    if not _res.success():
+        logger.error(f'init_dynamic_tracker: 初始化动态记录失败, error: {_res.info}')
+        return
+    dynamic_tracker.seed(_res.result)
+    logger.opt(colors=True).info(f'init_dynamic_tracker: <g>已载入 {len(_res.result)} 个用户的动态记录.</g>')
+
+
+get_driver().on_startup(init_dynamic_tracker)
 
 
 # 启用检查动态状态的定时任务
@@ -49,10 +105,11 @@ async def bilibili_dynamic_monitor():
 
     logger.debug(f"bilibili_dynamic_monitor: checking started")
 
-    # 获取当前bot列表
-    bots = []
-    for bot_id, bot in get_bots().items():
-        bots.append(bot)
+    # 动态记录未初始化时所有动态都会被视为新动态, 初始化失败则跳过本轮检查
+    if not dynamic_tracker.seeded:
+        await init_dynamic_tracker()
+        if not dynamic_tracker.seeded:
+            return
 
     # 获取所有有通知权限的群组
     all_noitce_groups = []
@@ -80,25 +137,24 @@ async def bilibili_dynamic_monitor():
 
         dynamic_info = dict(_res.result)
 
-        # 用户所有的动态id
-        _res = get_user_dynamic(user_id=dy_uid)
-        if not _res.success():
-            logger.error(f'bilibili_dynamic_monitor: 获取用户已有动态失败, uid: {dy_uid}, error: {_res.info}')
+        # 先筛选出新动态, 避免处理过程中更新的高水位影响同批次其他动态的判断
+        new_dynamic_ids = set(x['id'] for x in dynamic_info.values() if dynamic_tracker.is_new(dy_uid, x['id']))
+        if not new_dynamic_ids:
             return
-        user_dy_id_list = list(_res.result)
 
         sub = DBSubscription(sub_type=2, sub_id=dy_uid)
 
         # 获取订阅了该直播间的所有群
-        sub_group = sub.sub_group_list().result
+        sub_group = (await sub.async_sub_group_list()).result
         # 需通知的群
         notice_group = list(set(all_noitce_groups) & set(sub_group))
 
         for num in range(len(dynamic_info)):
             try:
                 # 如果有新的动态
-                if dynamic_info[num]['id'] not in user_dy_id_list:
+                if dynamic_info[num]['id'] in new_dynamic_ids:
                     logger.info(f"用户: {dy_uid}/{dynamic_info[num]['name']} 新动态: {dynamic_info[num]['id']}")
+                    msg = None
                     # 转发的动态
                     if dynamic_info[num]['type'] == 1:
                         # 获取原动态信息
@@ -117,9 +173,9 @@ async def bilibili_dynamic_monitor():
                                 # 处理图片序列
                                 pic_segs = ''
                                 for pic_url in origin_dynamic_info['origin_pics']:
-                                    _res = await pic_2_base64(pic_url)
-                                    pic_b64 = _res.result
-                                    pic_segs += f'{MessageSegment.image(pic_b64)}\n'
+                                    _res = await pic_2_source(pic_url)
+                                    pic_source = _res.result
+                                    pic_segs += f'{MessageSegment.image(pic_source)}\n'
                                 msg = '{}转发了{}的动态！\n\n“{}”\n{}\n{}\n@{}: {}\n{}'.format(
                                     dynamic_info[num]['name'], origin_dynamic_info['name'],
                                     dynamic_info[num]['content'], dynamic_info[num]['url'], '=' * 16,
@@ -133,132 +189,54 @@ async def bilibili_dynamic_monitor():
                                     dynamic_info[num]['content'], dynamic_info[num]['url'], '=' * 16,
                                     origin_dynamic_info['name'], origin_dynamic_info['content']
                                 )
-                        for group_id in notice_group:
-                            for _bot in bots:
-                                try:
-                                    await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                    logger.info(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']}")
-                                except Exception as _e:
-                                    logger.warning(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']} 失败, "
-                                                   f"error: {repr(_e)}")
-                                    continue
                     # 原创的动态（有图片）
                     elif dynamic_info[num]['type'] == 2:
                         # 处理图片序列
                         pic_segs = ''
                         for pic_url in dynamic_info[num]['pic_urls']:
-                            _res = await pic_2_base64(pic_url)
-                            pic_b64 = _res.result
-                            pic_segs += f'{MessageSegment.image(pic_b64)}\n'
+                            _res = await pic_2_source(pic_url)
+                            pic_source = _res.result
+                            pic_segs += f'{MessageSegment.image(pic_source)}\n'
                         msg = '{}发布了新动态！\n\n“{}”\n{}\n{}'.format(
                             dynamic_info[num]['name'], dynamic_info[num]['content'],
                             dynamic_info[num]['url'], pic_segs)
-                        for group_id in notice_group:
-                            for _bot in bots:
-                                try:
-                                    await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                    logger.info(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']}")
-                                except Exception as _e:
-                                    logger.warning(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']} 失败, "
-                                                   f"error: {repr(_e)}")
-                                    continue
                     # 原创的动态（无图片）
                     elif dynamic_info[num]['type'] == 4:
                         msg = '{}发布了新动态！\n\n“{}”\n{}'.format(
                             dynamic_info[num]['name'], dynamic_info[num]['content'], dynamic_info[num]['url'])
-                        for group_id in notice_group:
-                            for _bot in bots:
-                                try:
-                                    await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                    logger.info(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']}")
-                                except Exception as _e:
-                                    logger.warning(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']} 失败, "
-                                                   f"error: {repr(_e)}")
-                                    continue
                     # 视频
                     elif dynamic_info[num]['type'] == 8:
                         msg = '{}发布了新的视频！\n\n《{}》\n“{}”\n{}'.format(
                             dynamic_info[num]['name'], dynamic_info[num]['origin'],
                             dynamic_info[num]['content'], dynamic_info[num]['url'])
-                        for group_id in notice_group:
-                            for _bot in bots:
-                                try:
-                                    await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                    logger.info(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']}")
-                                except Exception as _e:
-                                    logger.warning(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']} 失败, "
-                                                   f"error: {repr(_e)}")
-                                    continue
                     # 小视频
                     elif dynamic_info[num]['type'] == 16:
                         msg = '{}发布了新的小视频动态！\n\n“{}”\n{}'.format(
                             dynamic_info[num]['name'], dynamic_info[num]['content'], dynamic_info[num]['url'])
-                        for group_id in notice_group:
-                            for _bot in bots:
-                                try:
-                                    await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                    logger.info(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']}")
-                                except Exception as _e:
-                                    logger.warning(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']} 失败, "
-                                                   f"error: {repr(_e)}")
-                                    continue
                     # 番剧
                     elif dynamic_info[num]['type'] in [32, 512]:
                         msg = '{}发布了新的番剧！\n\n《{}》\n{}'.format(
                             dynamic_info[num]['name'], dynamic_info[num]['origin'], dynamic_info[num]['url'])
-                        for group_id in notice_group:
-                            for _bot in bots:
-                                try:
-                                    await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                    logger.info(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']}")
-                                except Exception as _e:
-                                    logger.warning(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']} 失败, "
-                                                   f"error: {repr(_e)}")
-                                    continue
                     # 文章
                     elif dynamic_info[num]['type'] == 64:
                         msg = '{}发布了新的文章！\n\n《{}》\n“{}”\n{}'.format(
                             dynamic_info[num]['name'], dynamic_info[num]['origin'],
                             dynamic_info[num]['content'], dynamic_info[num]['url'])
-                        for group_id in notice_group:
-                            for _bot in bots:
-                                try:
-                                    await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                    logger.info(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']}")
-                                except Exception as _e:
-                                    logger.warning(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']} 失败, "
-                                                   f"error: {repr(_e)}")
-                                    continue
                     # 音频
                     elif dynamic_info[num]['type'] == 256:
                         msg = '{}发布了新的音乐！\n\n《{}》\n“{}”\n{}'.format(
                             dynamic_info[num]['name'], dynamic_info[num]['origin'],
                             dynamic_info[num]['content'], dynamic_info[num]['url'])
-                        for group_id in notice_group:
-                            for _bot in bots:
-                                try:
-                                    await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                    logger.info(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']}")
-                                except Exception as _e:
-                                    logger.warning(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']} 失败, "
-                                                   f"error: {repr(_e)}")
-                                    continue
                     # B站活动相关
                     elif dynamic_info[num]['type'] == 2048:
                         msg = '{}发布了一条活动相关动态！\n\n【{}】\n“{}”\n{}'.format(
                             dynamic_info[num]['name'], dynamic_info[num]['origin'],
                             dynamic_info[num]['content'], dynamic_info[num]['url'])
-                        for group_id in notice_group:
-                            for _bot in bots:
-                                try:
-                                    await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                    logger.info(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']}")
-                                except Exception as _e:
-                                    logger.warning(f"向群组: {group_id} 发送新动态通知: {dynamic_info[num]['id']} 失败, "
-                                                   f"error: {repr(_e)}")
-                                    continue
                     elif dynamic_info[num]['type'] == -1:
                         logger.warning(f"未知的动态类型: {dynamic_info[num]['id']}")
+                    if msg:
+                        await notice_dispatcher.send_group_msg(
+                            group_ids=notice_group, message=msg, log_info=f"新动态通知: {dynamic_info[num]['id']}")
                     # 更新动态内容到数据库
                     dy_id = dynamic_info[num]['id']
                     dy_type = dynamic_info[num]['type']
@@ -270,6 +248,7 @@ async def bilibili_dynamic_monitor():
                         logger.info(f"向数据库写入动态信息: {dynamic_info[num]['id']} 成功")
                     else:
                         logger.error(f"向数据库写入动态信息: {dynamic_info[num]['id']} 失败")
+                    dynamic_tracker.mark(dy_uid, dy_id)
             except Exception as _e:
                 logger.error(f'bilibili_dynamic_monitor: 解析新动态: {dy_uid} 的时发生了错误, error info: {repr(_e)}')
 
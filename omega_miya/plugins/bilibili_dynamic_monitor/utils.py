@@ -1,8 +1,6 @@
-import aiohttp
-import base64
 import json
-from io import BytesIO
 import nonebot
+from omega_miya.utils.Omega_plugin_utils import http_client, image_cache
 from omega_miya.utils.Omega_Base import DBTable, Result
 
 DYNAMIC_API_URL = 'https://api.vc.bilibili.com/dynamic_svr/v1/dynamic_svr/space_history'
@@ -31,68 +29,25 @@ async def fetch_json(url: str, paras: dict = None) -> Result:
     cookies_res = check_bili_cookies()
     if cookies_res.success():
         cookies = cookies_res.result
-    timeout_count = 0
-    error_info = ''
-    while timeout_count < 3:
-        try:
-            timeout = aiohttp.ClientTimeout(total=10)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                headers = {'accept': 'application/json, text/plain, */*',
-                           'accept-encoding': 'gzip, deflate, br',
-                           'accept-language:': 'zh-CN,zh;q=0.9',
-                           'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                         'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36',
-                           'origin': 'https://t.bilibili.com',
-                           'referer': 'https://t.bilibili.com/'}
-                async with session.get(url=url, params=paras, headers=headers, cookies=cookies, timeout=timeout) as rp:
-                    _json = await rp.json()
-                result = Result(error=False, info='Success', result=_json)
-            return result
-        except Exception as e:
-            error_info += f'{repr(e)} Occurred in fetch_json trying {timeout_count + 1} using paras: {paras}\n'
-        finally:
-            timeout_count += 1
-    else:
-        error_info += f'Failed too many times in fetch_json using paras: {paras}'
-        result = Result(error=True, info=error_info, result={})
-        return result
+    headers = {'accept': 'application/json, text/plain, */*',
+               'accept-encoding': 'gzip, deflate, br',
+               'accept-language:': 'zh-CN,zh;q=0.9',
+               'origin': 'https://t.bilibili.com',
+               'referer': 'https://t.bilibili.com/'}
+    result = await http_client.get_json(url=url, params=paras, headers=headers, cookies=cookies, timeout=10)
+    return result
 
 
-# 图片转base64
-async def pic_2_base64(url: str) -> Result:
-    async def get_image(pic_url: str):
-        timeout_count = 0
-        error_info = ''
-        while timeout_count < 3:
-            try:
-                timeout = aiohttp.ClientTimeout(total=10)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                             'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36',
-                               'origin': 'https://t.bilibili.com',
-                               'referer': 'https://t.bilibili.com/'}
-                    async with session.get(url=pic_url, headers=headers, timeout=timeout) as resp:
-                        _res = await resp.read()
-                return _res
-            except Exception as _e:
-                error_info += f'{repr(_e)} Occurred in pic_2_base64 trying {timeout_count + 1} using paras: {pic_url}\n'
-            finally:
-                timeout_count += 1
-        else:
-            error_info += f'Failed too many times in pic_2_base64 using paras: {pic_url}'
-            return None
-
-    origin_image_f = BytesIO()
-    try:
-        origin_image_f.write(await get_image(pic_url=url))
-    except Exception as e:
-        result = Result(error=True, info=f'pic_2_base64 error: {repr(e)}', result='')
+# 获取图片发送来源, 默认为 base64 字符串, 见 image_cache.get_source
+async def pic_2_source(url: str) -> Result:
+    headers = {'origin': 'https://t.bilibili.com',
+               'referer': 'https://t.bilibili.com/'}
+    _res = await image_cache.get_source(
+        key=url, downloader=lambda path: http_client.download(url=url, save_path=path, headers=headers, timeout=10))
+    if not _res.success():
+        result = Result(error=True, info=f'pic_2_source error: {_res.info}', result='')
         return result
-    b64 = base64.b64encode(origin_image_f.getvalue())
-    b64 = str(b64, encoding='utf-8')
-    b64 = 'base64://' + b64
-    origin_image_f.close()
-    result = Result(error=False, info='Success', result=b64)
+    result = Result(error=False, info='Success', result=_res.result)
     return result
 
 
@@ -374,7 +329,7 @@ async def get_dynamic_info(dynamic_id) -> Result:
 
 
 __all__ = [
-    'pic_2_base64',
+    'pic_2_source',
     'get_user_info',
     'get_user_dynamic',
     'get_user_dynamic_history',
@@ -1,17 +1,64 @@
 import asyncio
 import time
-from nonebot import logger, require, get_driver, get_bots
+from datetime import datetime
+from apscheduler.events import EVENT_JOB_SUBMITTED
+from nonebot import logger, require, get_driver
 from nonebot.adapters.cqhttp import MessageSegment
 from omega_miya.utils.Omega_Base import DBSubscription, DBHistory, DBTable
-from .utils import get_live_info, get_user_info, pic_2_base64, verify_cookies
+from omega_miya.utils.Omega_plugin_utils import notice_dispatcher
+from .utils import fetch_live_info_with_name, get_live_info, get_live_info_batch, pic_2_source, verify_cookies
 
 
+global_config = get_driver().config
+# 同时检查的直播间数量上限
+LIVE_MONITOR_CONCURRENCY = int(getattr(global_config, 'bili_live_monitor_concurrency', 10))
+# 单轮检查耗时超过该值(秒)时告警, 默认为白天检查间隔的一半
+LIVE_MONITOR_WARN_DURATION = float(getattr(global_config, 'bili_live_monitor_warn_duration', 60))
+
 # 初始化直播间标题, 状态
 live_title = {}
 live_status = {}
 live_up_name = {}
 
 
+class MonitorMetrics(object):
+    """
+    记录每轮检查的耗时与启动延迟(实际开始时间与计划触发时间之差)
+    用于根据直播间数量调整检查间隔
+    """
+    def __init__(self):
+        self.cycles = 0
+        self.rooms = 0
+        self.failed = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.last_lag = 0.0
+        self.__total_duration = 0.0
+
+    def record(self, rooms: int, failed: int, duration: float, lag: float) -> None:
+        self.cycles += 1
+        self.rooms = rooms
+        self.failed = failed
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.last_lag = lag
+        self.__total_duration += duration
+
+    def metrics(self) -> dict:
+        return {
+            'cycles': self.cycles,
+            'rooms': self.rooms,
+            'failed': self.failed,
+            'last_duration': self.last_duration,
+            'max_duration': self.max_duration,
+            'avg_duration': self.__total_duration / self.cycles if self.cycles else 0.0,
+            'last_lag': self.last_lag
+        }
+
+
+live_monitor_metrics = MonitorMetrics()
+
+
 async def init_live_info():
     global live_title
     global live_status
@@ -25,22 +72,9 @@ async def init_live_info():
 
     logger.opt(colors=True).info('init_live_info: <y>初始化B站直播间监控列表...</y>')
     t = DBTable(table_name='Subscription')
-    for item in t.list_col_with_condition('sub_id', 'sub_type', 1).result:
-        sub_id = int(item[0])
+    sub_ids = [int(item[0]) for item in t.list_col_with_condition('sub_id', 'sub_type', 1).result]
+    for sub_id, live_info in (await fetch_live_info_with_name(room_ids=sub_ids)).items():
         try:
-            # 获取直播间信息
-            _res = await get_live_info(room_id=sub_id)
-            if not _res.success():
-                logger.error(f'init_live_info: 获取直播间信息失败, room_id: {sub_id}, error: {_res.info}')
-                continue
-            live_info = _res.result
-            up_uid = _res.result.get('uid')
-            _res = await get_user_info(user_uid=up_uid)
-            if not _res.success():
-                logger.error(f'init_live_info: 获取直播间UP用户信息失败, room_id: {sub_id}, error: {_res.info}')
-                continue
-            up_name = _res.result.get('name')
-
             # 直播状态放入live_status全局变量中
             live_status[sub_id] = int(live_info['status'])
 
@@ -48,7 +82,7 @@ async def init_live_info():
             live_title[sub_id] = str(live_info['title'])
 
             # 直播间up名称放入live_up_name全局变量中
-            live_up_name[sub_id] = str(up_name)
+            live_up_name[sub_id] = str(live_info['uname'])
         except Exception as e:
             logger.error(f'init_live_info: 获取直播间信息错误, room_id: {sub_id}, error: {repr(e)}')
             continue
@@ -84,39 +118,45 @@ scheduler = require("nonebot_plugin_apscheduler").scheduler
 async def live_db_upgrade():
     logger.debug('live_db_upgrade: started upgrade subscription info')
     t = DBTable(table_name='Subscription')
-    for item in t.list_col_with_condition('sub_id', 'sub_type', 1).result:
-        sub_id = int(item[0])
+    sub_ids = [int(item[0]) for item in t.list_col_with_condition('sub_id', 'sub_type', 1).result]
+    for sub_id, live_info in (await fetch_live_info_with_name(room_ids=sub_ids)).items():
         sub = DBSubscription(sub_type=1, sub_id=sub_id)
-        _res = await get_live_info(room_id=sub_id)
-        if not _res.success():
-            logger.error(f'live_db_upgrade: 获取直播间信息失败, room_id: {sub_id}, error: {_res.info}')
-            continue
-        up_uid = _res.result.get('uid')
-        _res = await get_user_info(user_uid=up_uid)
-        if not _res.success():
-            logger.error(f'live_db_upgrade: 获取直播间UP用户信息失败, room_id: {sub_id}, error: {_res.info}')
-            continue
-        up_name = _res.result.get('name')
-        _res = sub.add(up_name=up_name)
+        _res = sub.add(up_name=live_info['uname'])
         if not _res.success():
             logger.error(f'live_db_upgrade: 更新直播间信息失败, room_id: {sub_id}, error: {_res.info}')
             continue
     logger.debug('live_db_upgrade: upgrade subscription info completed')
 
 
+# 直播检查任务最近一次的计划触发时间, 由 APScheduler 提交任务时的事件记录
+LIVE_MONITOR_JOB_IDS = ('bilibili_live_monitor_in_day', 'bilibili_live_monitor_in_night')
+live_monitor_scheduled_at = None
+
+
+def record_live_monitor_scheduled(event):
+    global live_monitor_scheduled_at
+    if event.job_id in LIVE_MONITOR_JOB_IDS and event.scheduled_run_times:
+        live_monitor_scheduled_at = event.scheduled_run_times[-1]
+
+
+scheduler.add_listener(record_live_monitor_scheduled, EVENT_JOB_SUBMITTED)
+
+
 # 创建直播检查函数
 async def bilibili_live_monitor():
-
+    global live_monitor_scheduled_at
+
+    # 以计划触发时间计算启动延迟, 非计划任务触发(如手动调用)时为 0
+    lag = 0.0
+    if live_monitor_scheduled_at is not None:
+        lag = max((datetime.now(live_monitor_scheduled_at.tzinfo) - live_monitor_scheduled_at).total_seconds(), 0.0)
+        live_monitor_scheduled_at = None
+    cycle_start = time.monotonic()
     logger.debug(f"bilibili_live_monitor: checking started")
     global live_title
     global live_status
     global live_up_name
 
-    # 获取当前bot列表
-    bots = []
-    for bot_id, bot in get_bots().items():
-        bots.append(bot)
-
     # 获取所有有通知权限的群组
     all_noitce_groups = []
     t = DBTable(table_name='Group')
@@ -129,19 +169,50 @@ async def bilibili_live_monitor():
     for item in t.list_col_with_condition('sub_id', 'sub_type', 1).result:
         check_sub.append(int(item[0]))
 
+    # 批量获取直播间状态, 批量接口未返回的直播间再逐个获取
+    _res = await get_live_info_batch(room_ids=check_sub)
+    if not _res.success():
+        logger.warning(f'bilibili_live_monitor: 批量获取直播间信息失败, 将逐个获取, error: {_res.info}')
+    batch_live_info = _res.result
+
+    # 一次查询获取所有直播间的订阅群, 查询失败时逐个直播间查询
+    _res = await DBSubscription.async_sub_group_map(sub_type=1)
+    if not _res.success():
+        logger.warning(f'bilibili_live_monitor: 获取直播间订阅群失败, 将逐个查询, error: {_res.info}')
+        sub_group_map = None
+    else:
+        sub_group_map = _res.result
+
+    failed_count = 0
+    semaphore = asyncio.Semaphore(LIVE_MONITOR_CONCURRENCY)
+
     # 注册一个异步函数用于检查直播间状态
     async def check_live(room_id: int):
+        nonlocal failed_count
         # 获取直播间信息
-        _res = await get_live_info(room_id=room_id)
-        if not _res.success():
-            logger.error(f'bilibili_live_monitor: 获取直播间信息失败, room_id: {room_id}, error: {_res.info}')
-            return
-        live_info = _res.result
+        live_info = batch_live_info.get(room_id)
+        if live_info is None:
+            _res = await get_live_info(room_id=room_id)
+            if not _res.success():
+                failed_count += 1
+                logger.error(f'bilibili_live_monitor: 获取直播间信息失败, room_id: {room_id}, error: {_res.info}')
+                return
+            live_info = _res.result
 
-        sub = DBSubscription(sub_type=1, sub_id=room_id)
+        # 启动后新增的订阅, 仅记录当前状态不发送通知
+        if room_id not in live_status:
+            live_status[room_id] = int(live_info['status'])
+            live_title[room_id] = str(live_info['title'])
+            live_up_name[room_id] = str(live_info.get('uname', room_id))
+            logger.info(f'bilibili_live_monitor: 新增直播间订阅 {room_id}/{live_up_name[room_id]} 已初始化, '
+                        f'直播状态: {live_status[room_id]}')
+            return
 
         # 获取订阅了该直播间的所有群
-        sub_group = sub.sub_group_list().result
+        if sub_group_map is not None:
+            sub_group = sub_group_map.get(room_id, [])
+        else:
+            sub_group = (await DBSubscription(sub_type=1, sub_id=room_id).async_sub_group_list()).result
         # 需通知的群
         notice_group = list(set(all_noitce_groups) & set(sub_group))
 
@@ -157,20 +228,14 @@ async def bilibili_live_monitor():
             logger.info(f"直播间: {room_id}/{up_name} 标题变更为: {live_info['title']}")
         elif live_info['status'] == 1 and live_info['title'] != live_title[room_id]:
             # 通知有通知权限且订阅了该直播间的群
-            cover_pic = await pic_2_base64(url=live_info.get('cover_img'))
+            cover_pic = await pic_2_source(url=live_info.get('cover_img'))
             if cover_pic.success():
                 msg = f"{up_name}的直播间换标题啦！\n\n【{live_info['title']}】\n{MessageSegment.image(cover_pic.result)}"
             else:
                 # msg = f"{up_name}的直播间换标题啦！\n\n【{live_info['title']}】\n{live_info['url']}"
                 msg = f"{up_name}的直播间换标题啦！\n\n【{live_info['title']}】"
-            for group_id in notice_group:
-                for _bot in bots:
-                    try:
-                        await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                        logger.info(f"向群组: {group_id} 发送直播间: {room_id} 标题变更通知")
-                    except Exception as _e:
-                        logger.warning(f"向群组: {group_id} 发送直播间: {room_id} 标题变更通知失败, error: {repr(_e)}")
-                        continue
+            await notice_dispatcher.send_group_msg(group_ids=notice_group, message=msg,
+                                                   log_info=f'直播间: {room_id} 标题变更通知')
             live_title[room_id] = live_info['title']
             logger.info(f"直播间: {room_id}/{up_name} 标题变更为: {live_info['title']}")
 
@@ -182,19 +247,13 @@ async def bilibili_live_monitor():
                 if live_info['status'] == 0:
                     live_start_info = f"LiveEnd! Room: {room_id}/{up_name}"
                     new_event = DBHistory(time=int(time.time()), self_id=-1, post_type='bilibili', detail_type='live')
-                    new_event.add(sub_type='live_end', user_id=room_id, user_name=up_name,
-                                  raw_data=repr(live_info), msg_data=live_start_info)
+                    await new_event.async_add(sub_type='live_end', user_id=room_id, user_name=up_name,
+                                              raw_data=repr(live_info), msg_data=live_start_info)
 
                     msg = f'{up_name}下播了'
                     # 通知有通知权限且订阅了该直播间的群
-                    for group_id in notice_group:
-                        for _bot in bots:
-                            try:
-                                await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                logger.info(f"向群组: {group_id} 发送直播间: {room_id} 下播通知")
-                            except Exception as _e:
-                                logger.warning(f"向群组: {group_id} 发送直播间: {room_id} 下播通知失败, error: {repr(_e)}")
-                                continue
+                    await notice_dispatcher.send_group_msg(group_ids=notice_group, message=msg,
+                                                           log_info=f'直播间: {room_id} 下播通知')
                     # 更新直播间状态
                     live_status[room_id] = live_info['status']
                     logger.info(f"直播间: {room_id}/{up_name} 下播了")
@@ -204,56 +263,55 @@ async def bilibili_live_monitor():
                     live_start_info = f"LiveStart! Room: {room_id}/{up_name}, Title: {live_info['title']}, " \
                                       f"TrueTime: {live_info['time']}"
                     new_event = DBHistory(time=int(time.time()), self_id=-1, post_type='bilibili', detail_type='live')
-                    new_event.add(sub_type='live_start', user_id=room_id, user_name=up_name,
-                                  raw_data=repr(live_info), msg_data=live_start_info)
+                    await new_event.async_add(sub_type='live_start', user_id=room_id, user_name=up_name,
+                                              raw_data=repr(live_info), msg_data=live_start_info)
 
-                    cover_pic = await pic_2_base64(url=live_info.get('cover_img'))
+                    cover_pic = await pic_2_source(url=live_info.get('cover_img'))
                     if cover_pic.success():
                         msg = f"{live_info['time']}\n{up_name}开播啦！\n\n【{live_info['title']}】" \
                               f"\n{MessageSegment.image(cover_pic.result)}"
                     else:
                         # msg = f"{live_info['time']}\n{up_name}开播啦！\n\n【{live_info['title']}】\n{live_info['url']}"
                         msg = f"{live_info['time']}\n{up_name}开播啦！\n\n【{live_info['title']}】"
-                    for group_id in notice_group:
-                        for _bot in bots:
-                            try:
-                                await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                logger.info(f"向群组: {group_id} 发送直播间: {room_id} 开播通知")
-                            except Exception as _e:
-                                logger.warning(f"向群组: {group_id} 发送直播间: {room_id} 开播通知失败, error: {repr(_e)}")
-                                continue
+                    await notice_dispatcher.send_group_msg(group_ids=notice_group, message=msg,
+                                                           log_info=f'直播间: {room_id} 开播通知')
                     live_status[room_id] = live_info['status']
                     logger.info(f"直播间: {room_id}/{up_name} 开播了")
                 # 现在状态为未开播（轮播中）
                 elif live_info['status'] == 2:
                     live_start_info = f"LiveEnd! Room: {room_id}/{up_name}"
                     new_event = DBHistory(time=int(time.time()), self_id=-1, post_type='bilibili', detail_type='live')
-                    new_event.add(sub_type='live_end_with_playlist', user_id=room_id, user_name=up_name,
-                                  raw_data=repr(live_info), msg_data=live_start_info)
+                    await new_event.async_add(sub_type='live_end_with_playlist', user_id=room_id,
+                                              user_name=up_name, raw_data=repr(live_info), msg_data=live_start_info)
 
                     msg = f'{up_name}下播了（轮播中）'
-                    for group_id in notice_group:
-                        for _bot in bots:
-                            try:
-                                await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                                logger.info(f"向群组: {group_id} 发送直播间: {room_id} 下播通知")
-                            except Exception as _e:
-                                logger.warning(f"向群组: {group_id} 发送直播间: {room_id} 下播通知失败, error: {repr(_e)}")
-                                continue
+                    await notice_dispatcher.send_group_msg(group_ids=notice_group, message=msg,
+                                                           log_info=f'直播间: {room_id} 下播通知')
                     live_status[room_id] = live_info['status']
                     logger.info(f"直播间: {room_id}/{up_name} 下播了（轮播中）")
             except Exception as _e:
                 logger.warning(f'试图向群组发送直播间: {room_id}/{up_name} 的直播通知时发生了错误: {repr(_e)}')
 
-    # 检查所有在订阅表里面的直播间(异步)
+    async def bounded_check_live(room_id: int):
+        async with semaphore:
+            await check_live(room_id=room_id)
+
+    # 检查所有在订阅表里面的直播间(异步, 并发数受 LIVE_MONITOR_CONCURRENCY 限制)
     tasks = []
     for rid in check_sub:
-        tasks.append(check_live(rid))
-    try:
-        await asyncio.gather(*tasks)
-        logger.debug('bilibili_live_monitor: checking completed')
-    except Exception as e:
-        logger.error(f'bilibili_live_monitor: error occurred in checking  {repr(e)}')
+        tasks.append(bounded_check_live(rid))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for rid, result in zip(check_sub, results):
+        if isinstance(result, Exception):
+            failed_count += 1
+            logger.error(f'bilibili_live_monitor: error occurred in checking room {rid}: {repr(result)}')
+
+    duration = time.monotonic() - cycle_start
+    live_monitor_metrics.record(rooms=len(check_sub), failed=failed_count, duration=duration, lag=lag)
+    logger.debug(f'bilibili_live_monitor: checking completed, metrics: {live_monitor_metrics.metrics()}')
+    if duration > LIVE_MONITOR_WARN_DURATION:
+        logger.warning(f'bilibili_live_monitor: 本轮检查 {len(check_sub)} 个直播间耗时 {duration:.2f}s, '
+                       f'启动延迟 {lag:.2f}s, 已接近检查间隔, 请考虑增大并发数或检查间隔')
 
 
 # 分时间段创建计划任务, 夜间闲时降低检查频率
@@ -297,5 +355,6 @@ scheduler.add_job(
 
 __all__ = [
     'scheduler',
-    'init_live_info'
+    'init_live_info',
+    'live_monitor_metrics'
 ]
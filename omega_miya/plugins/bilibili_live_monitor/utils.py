@@ -1,14 +1,20 @@
-import aiohttp
+import asyncio
 import nonebot
-import base64
-from io import BytesIO
+from typing import Dict, List
+from nonebot import logger
+from omega_miya.utils.Omega_plugin_utils import http_client, image_cache
 from omega_miya.utils.Omega_Base import Result
 
-LIVE_API_URL = 'https://api.live.bilibili.com/room/v1/Room/get_info'
-USER_INFO_API_URL = 'https://api.bilibili.com/x/space/acc/info'
+global_config = nonebot.get_driver().config
+# 直播及用户信息 API 地址, 可配置为本地替身服务器用于调试
+LIVE_API_HOST = str(getattr(global_config, 'bili_live_api_host', 'https://api.live.bilibili.com')).rstrip('/')
+API_HOST = str(getattr(global_config, 'bili_api_host', 'https://api.bilibili.com')).rstrip('/')
+
+LIVE_API_URL = f'{LIVE_API_HOST}/room/v1/Room/get_info'
+LIVE_BATCH_API_URL = f'{LIVE_API_HOST}/xlive/web-room/v1/index/getRoomBaseInfo'
+USER_INFO_API_URL = f'{API_HOST}/x/space/acc/info'
 LIVE_URL = 'https://live.bilibili.com/'
 
-global_config = nonebot.get_driver().config
 BILI_SESSDATA = global_config.bili_sessdata
 BILI_CSRF = global_config.bili_csrf
 BILI_UID = global_config.bili_uid
@@ -29,68 +35,25 @@ async def fetch_json(url: str, paras: dict = None) -> Result:
     cookies_res = check_bili_cookies()
     if cookies_res.success():
         cookies = cookies_res.result
-    timeout_count = 0
-    error_info = ''
-    while timeout_count < 3:
-        try:
-            timeout = aiohttp.ClientTimeout(total=10)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                headers = {'accept': 'application/json, text/plain, */*',
-                           'accept-encoding': 'gzip, deflate, br',
-                           'accept-language:': 'zh-CN,zh;q=0.9',
-                           'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                         'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36',
-                           'origin': 'https://www.bilibili.com',
-                           'referer': 'https://www.bilibili.com/'}
-                async with session.get(url=url, params=paras, headers=headers, cookies=cookies, timeout=timeout) as rp:
-                    _json = await rp.json()
-                result = Result(error=False, info='Success', result=_json)
-            return result
-        except Exception as e:
-            error_info += f'{repr(e)} Occurred in fetch_json trying {timeout_count + 1} using paras: {paras}\n'
-        finally:
-            timeout_count += 1
-    else:
-        error_info += f'Failed too many times in fetch_json using paras: {paras}'
-        result = Result(error=True, info=error_info, result={})
-        return result
+    headers = {'accept': 'application/json, text/plain, */*',
+               'accept-encoding': 'gzip, deflate, br',
+               'accept-language:': 'zh-CN,zh;q=0.9',
+               'origin': 'https://www.bilibili.com',
+               'referer': 'https://www.bilibili.com/'}
+    result = await http_client.get_json(url=url, params=paras, headers=headers, cookies=cookies, timeout=10)
+    return result
 
 
-# 图片转base64
-async def pic_2_base64(url: str) -> Result:
-    async def get_image(pic_url: str):
-        timeout_count = 0
-        error_info = ''
-        while timeout_count < 3:
-            try:
-                timeout = aiohttp.ClientTimeout(total=10)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                             'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36',
-                               'origin': 'https://www.bilibili.com',
-                               'referer': 'https://www.bilibili.com/'}
-                    async with session.get(url=pic_url, headers=headers, timeout=timeout) as resp:
-                        _res = await resp.read()
-                return _res
-            except Exception as _e:
-                error_info += f'{repr(_e)} Occurred in pic_2_base64 trying {timeout_count + 1} using paras: {pic_url}\n'
-            finally:
-                timeout_count += 1
-        else:
-            error_info += f'Failed too many times in pic_2_base64 using paras: {pic_url}'
-            return None
-
-    origin_image_f = BytesIO()
-    try:
-        origin_image_f.write(await get_image(pic_url=url))
-    except Exception as e:
-        result = Result(error=True, info=f'pic_2_base64 error: {repr(e)}', result='')
+# 获取图片发送来源, 默认为 base64 字符串, 见 image_cache.get_source
+async def pic_2_source(url: str) -> Result:
+    headers = {'origin': 'https://www.bilibili.com',
+               'referer': 'https://www.bilibili.com/'}
+    _res = await image_cache.get_source(
+        key=url, downloader=lambda path: http_client.download(url=url, save_path=path, headers=headers, timeout=10))
+    if not _res.success():
+        result = Result(error=True, info=f'pic_2_source error: {_res.info}', result='')
         return result
-    b64 = base64.b64encode(origin_image_f.getvalue())
-    b64 = str(b64, encoding='utf-8')
-    b64 = 'base64://' + b64
-    origin_image_f.close()
-    result = Result(error=False, info='Success', result=b64)
+    result = Result(error=False, info='Success', result=_res.result)
     return result
 
 
@@ -120,6 +83,61 @@ async def get_live_info(room_id) -> Result:
     return result
 
 
+async def _gather_batches(keys: list, batch_size: int, fetcher) -> Result:
+    """
+    将 keys 按 batch_size 分批并发请求, 合并各批结果, 部分批次失败时仍返回其余批次的结果
+    """
+    keys = list(keys)
+    batches = [keys[i:i + batch_size] for i in range(0, len(keys), batch_size)]
+    results = await asyncio.gather(*[fetcher(x) for x in batches])
+    live_infos = {}
+    error_info = ''
+    for _res in results:
+        if _res.success():
+            live_infos.update(_res.result)
+        else:
+            error_info += f'{_res.info}\n'
+    if not live_infos and error_info:
+        return Result(error=True, info=error_info, result={})
+    return Result(error=False, info=error_info if error_info else 'Success', result=live_infos)
+
+
+# 批量获取直播间信息, 每次请求查询 batch_size 个直播间
+async def get_live_info_batch(room_ids: List[int], batch_size: int = 20) -> Result:
+    """
+    :return: Result.result 为 {room_id: 直播间信息}, 结构同 get_live_info 并附带 uname, 未返回的直播间不在结果中
+    """
+    async def _fetch(_room_ids: List[int]) -> Result:
+        payload = [('req_biz', 'link-center')] + [('room_ids', x) for x in _room_ids]
+        _res = await fetch_json(url=LIVE_BATCH_API_URL, paras=payload)
+        if not _res.success():
+            return _res
+        elif dict(_res.result).get('code') != 0:
+            return Result(error=True, info=f"Get Live info failed: {dict(_res.result).get('message')}", result={})
+        __res = {}
+        for item in dict(_res.result['data'].get('by_room_ids') or {}).values():
+            try:
+                live_info = {
+                    'status': item['live_status'],
+                    'url': LIVE_URL + str(item['room_id']),
+                    'title': item['title'],
+                    'time': item['live_time'],
+                    'uid': item['uid'],
+                    'cover_img': item['cover'],
+                    'uname': item.get('uname')
+                }
+            except Exception as e:
+                logger.warning(f'get_live_info_batch: live info parse failed: {repr(e)}, raw data: {item}')
+                continue
+            # 兼容以短号订阅的直播间
+            for room_id in (item.get('room_id'), item.get('short_id')):
+                if room_id in _room_ids:
+                    __res[room_id] = live_info
+        return Result(error=False, info='Success', result=__res)
+
+    return await _gather_batches(keys=room_ids, batch_size=batch_size, fetcher=_fetch)
+
+
 # 根据用户uid获取用户信息
 async def get_user_info(user_uid) -> Result:
     url = USER_INFO_API_URL
@@ -142,8 +160,36 @@ async def get_user_info(user_uid) -> Result:
     return result
 
 
+async def fetch_live_info_with_name(room_ids: List[int]) -> Dict[int, dict]:
+    """
+    批量获取直播间信息及UP名称, 批量接口未返回或缺少UP名称的直播间再逐个获取
+    :return: {room_id: live_info}, 获取失败的直播间不在结果中
+    """
+    _res = await get_live_info_batch(room_ids=room_ids)
+    if not _res.success():
+        logger.warning(f'批量获取直播间信息失败, 将逐个获取, error: {_res.info}')
+    live_infos = dict(_res.result)
+
+    for room_id in room_ids:
+        live_info = live_infos.get(room_id)
+        if live_info is None:
+            _res = await get_live_info(room_id=room_id)
+            if not _res.success():
+                logger.error(f'获取直播间信息失败, room_id: {room_id}, error: {_res.info}')
+                continue
+            live_info = live_infos[room_id] = _res.result
+        if not live_info.get('uname'):
+            _res = await get_user_info(user_uid=live_info.get('uid'))
+            if not _res.success():
+                logger.error(f'获取直播间UP用户信息失败, room_id: {room_id}, error: {_res.info}')
+                del live_infos[room_id]
+                continue
+            live_info['uname'] = _res.result.get('name')
+    return live_infos
+
+
 async def verify_cookies() -> Result:
-    cookies_verify_url = 'https://api.bilibili.com/x/web-interface/nav'
+    cookies_verify_url = f'{API_HOST}/x/web-interface/nav'
     _res = await fetch_json(url=cookies_verify_url, paras=None)
     if _res.success():
         code = _res.result.get('code')
@@ -163,9 +209,11 @@ async def verify_cookies() -> Result:
 
 
 __all__ = [
+    'fetch_live_info_with_name',
     'get_live_info',
+    'get_live_info_batch',
     'get_user_info',
-    'pic_2_base64',
+    'pic_2_source',
     'verify_cookies'
 ]
 
@@ -4,7 +4,8 @@ from nonebot.adapters.cqhttp.bot import Bot
 from nonebot.adapters.cqhttp.event import GroupMessageEvent
 from nonebot.adapters.cqhttp.permission import GROUP
 from omega_miya.utils.Omega_plugin_utils import init_export, has_command_permission, permission_level, PluginCoolDown
-from .data_source import deck_list, draw_deck
+from .data_source import deck_list, draw_deck, simulation_deck_list
+from .simulation import simulate_deck, DEFAULT_PULLS, MAX_PULLS
 
 # Custom plugin usage text
 __plugin_raw_name__ = __name__.split('.')[-1]
@@ -22,7 +23,8 @@ Command & Lv.10
 1 Minutes
 
 **Usage**
-/抽卡 [卡组]'''
+/抽卡 [卡组]
+/抽卡模拟 [卡组] [次数]'''
 
 # 声明本插件可配置的权限节点
 __plugin_auth_node__ = [
@@ -91,3 +93,33 @@ async def handle_deck(bot: Bot, event: GroupMessageEvent, state: T_State):
     # 向用户发送结果
     msg = f"{draw_user}抽卡【{_draw}】!!\n{'='*12}\n{draw_result}"
     await deck.finish(msg)
+
+
+simulate = Draw.command('simulate', aliases={'抽卡模拟'})
+
+
+@simulate.handle()
+async def handle_simulate(bot: Bot, event: GroupMessageEvent, state: T_State):
+    args = str(event.get_plaintext()).strip().lower().split()
+    if not args or len(args) > 2:
+        msg = f'用法: /抽卡模拟 [卡组] [次数]\n次数默认为{DEFAULT_PULLS}, 最多{MAX_PULLS}\n当前可模拟的卡组有:'
+        for item in simulation_deck_list.keys():
+            msg += f'\n【{item}】'
+        await simulate.finish(msg)
+
+    deck_name = args[0]
+    if deck_name not in simulation_deck_list.keys():
+        await simulate.finish('没有这个卡组QAQ')
+
+    pulls = DEFAULT_PULLS
+    if len(args) == 2:
+        if not args[1].isdigit() or int(args[1]) <= 0:
+            await simulate.finish('模拟次数应为正整数QAQ')
+        pulls = int(args[1])
+
+    simulate_result = await simulate_deck(deck=simulation_deck_list[deck_name], pulls=pulls)
+    if not simulate_result.success():
+        logger.error(f'Group: {event.group_id}, 模拟抽卡【{deck_name}】失败, error: {simulate_result.info}')
+        await simulate.finish('模拟失败QAQ, 请稍后再试')
+
+    await simulate.finish(simulate_result.result)
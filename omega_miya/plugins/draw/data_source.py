@@ -13,3 +13,9 @@ deck_list = {
 
 def draw_deck(deck: str):
     return deck_list.get(deck)
+
+
+# 支持模拟统计的卡组
+simulation_deck_list = {
+    '明日方舟': ARKNIGHTS_DECK
+}
@@ -1,12 +1,13 @@
 from .tarot import one_tarot
 from .superpower import superpower
 from .course import course
-from .arknights import draw_one_arknights, draw_ten_arknights
+from .arknights import draw_one_arknights, draw_ten_arknights, ARKNIGHTS_DECK
 
 __all__ = [
     'one_tarot',
     'superpower',
     'course',
     'draw_one_arknights',
-    'draw_ten_arknights'
+    'draw_ten_arknights',
+    'ARKNIGHTS_DECK'
 ]
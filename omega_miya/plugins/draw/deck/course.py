@@ -193,6 +193,11 @@ advance = {
 }
 
 
+# random.sample 不支持 set, 预先转换为 tuple
+BASIC_POOL = tuple(sorted(basic))
+ADVANCE_POOL = tuple(sorted(advance))
+
+
 def course(user_id: int) -> str:
     # 用qq、日期生成随机种子
     # random_seed_str = str([user_id, datetime.date.today()])
@@ -200,8 +205,8 @@ def course(user_id: int) -> str:
     # md5.update(random_seed_str.encode('utf-8'))
     # random_seed = md5.hexdigest()
     # random.seed(random_seed)
-    course_day = random.sample(basic, k=1)
-    course_day.extend(random.sample(advance, k=3))
+    course_day = random.sample(BASIC_POOL, k=1)
+    course_day.extend(random.sample(ADVANCE_POOL, k=3))
     course_t = str.join('》\n《', course_day)
     result = f"今天要修行的课有:\n《{course_t}》"
     return result
@@ -0,0 +1,174 @@
+"""
+卡组抽取引擎
+卡池加载时按最终概率编译为 alias 表, 单次抽取为 O(1), 与卡池大小无关
+多次抽取由 NumPy 一次生成全部随机数并以数组下标查表
+"""
+import json
+import os
+import random
+from time import monotonic
+import numpy as np
+from typing import Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+from nonebot import logger
+
+
+T = TypeVar('T')
+
+_rng = np.random.default_rng()
+
+
+class AliasTable(object):
+    """
+    Vose alias method 加权抽样表
+    """
+    __slots__ = ('prob', 'alias', 'size', '__prob_array', '__alias_array')
+
+    def __init__(self, weights: Sequence[float]):
+        size = len(weights)
+        total = float(sum(weights))
+        if size == 0 or total <= 0 or any(x < 0 for x in weights):
+            raise ValueError('Weights must be non-negative with a positive sum')
+
+        scaled = [x * size / total for x in weights]
+        prob = [1.0] * size
+        alias = list(range(size))
+        small = [i for i, x in enumerate(scaled) if x < 1.0]
+        large = [i for i, x in enumerate(scaled) if x >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # 剩余的均为浮点误差导致的概率接近 1 的项
+        self.prob = prob
+        self.alias = alias
+        self.size = size
+        self.__prob_array = np.array(prob, dtype=np.float64)
+        self.__alias_array = np.array(alias, dtype=np.intp)
+
+    def sample(self, rand: Callable[[], float] = random.random) -> int:
+        u = rand() * self.size
+        i = min(int(u), self.size - 1)
+        return i if u - i < self.prob[i] else self.alias[i]
+
+    def sample_array(self, k: int, rng: np.random.Generator = None) -> np.ndarray:
+        """
+        :return: 长度为 k 的下标数组
+        """
+        rng = _rng if rng is None else rng
+        u = rng.random(k) * self.size
+        i = np.minimum(u.astype(np.intp), self.size - 1)
+        return np.where(u - i < self.__prob_array[i], i, self.__alias_array[i])
+
+    def sample_many(self, k: int, rng: np.random.Generator = None) -> List[int]:
+        if k <= 0:
+            return []
+        # 单次抽取时 NumPy 的调用开销高于纯 Python
+        if k == 1:
+            return [self.sample()]
+        return self.sample_array(k, rng=rng).tolist()
+
+    def probabilities(self) -> List[float]:
+        """
+        :return: 各项的实际概率, 用于校验及统计
+        """
+        result = [0.0] * self.size
+        for i in range(self.size):
+            result[i] += self.prob[i] / self.size
+            result[self.alias[i]] += (1.0 - self.prob[i]) / self.size
+        return result
+
+
+class CompiledDeck(Generic[T]):
+    """
+    从数据文件加载并编译的卡组
+    数据文件的修改时间每 check_interval 秒检查一次, 变化时重新编译, 编译失败则保留原卡组
+    每次成功编译后 version 加一, 可用于缓存以卡组为依据的计算结果
+    """
+    def __init__(self, name: str, data_file: str, compiler: Callable[[dict], Tuple[List[T], List[float], str]],
+                 check_interval: float = 5.0):
+        """
+        :param compiler: 接收数据文件内容, 返回 (抽取结果列表, 对应权重, 卡组说明文本)
+        """
+        self.name = name
+        self.data_file = data_file
+        self.check_interval = check_interval
+        self.__compiler = compiler
+        self.__items: List[T] = []
+        self.__item_array: Optional[np.ndarray] = None
+        self.__table: Optional[AliasTable] = None
+        self.__info = ''
+        self.__version = 0
+        self.__mtime = None
+        self.__checked_at = 0.0
+
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    @property
+    def items(self) -> List[T]:
+        return self.__items
+
+    @property
+    def table(self) -> AliasTable:
+        self.reload_if_changed()
+        return self.__table
+
+    @property
+    def info(self) -> str:
+        return self.__info
+
+    def load(self) -> None:
+        with open(self.data_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        items, weights, info = self.__compiler(data)
+        if len(items) != len(weights):
+            raise ValueError('Items and weights length mismatch')
+        table = AliasTable(weights)
+        # 以 object 数组保存抽取结果, 多次抽取时直接按下标数组取值
+        item_array = np.empty(len(items), dtype=object)
+        for i, item in enumerate(items):
+            item_array[i] = item
+        self.__items, self.__item_array, self.__table, self.__info = items, item_array, table, info
+        self.__version += 1
+        logger.info(f'Draw: 已加载卡组 {self.name}, 共 {len(items)} 项')
+
+    def reload_if_changed(self) -> None:
+        now = monotonic()
+        if self.__table is not None and now - self.__checked_at < self.check_interval:
+            return
+        self.__checked_at = now
+        try:
+            mtime = os.path.getmtime(self.data_file)
+            if mtime != self.__mtime:
+                # 先记录修改时间, 加载失败时等待文件再次修改后重试
+                self.__mtime = mtime
+                self.load()
+        except Exception as e:
+            logger.error(f'Draw: 加载卡组 {self.name} 失败, 继续使用原卡组, error: {repr(e)}')
+        if self.__table is None:
+            raise RuntimeError(f'Deck {self.name} not loaded')
+
+    def draw(self) -> T:
+        # 先取 table, 重新加载后 items 与 table 一致
+        table = self.table
+        return self.__items[table.sample()]
+
+    def draw_many(self, k: int, rng: np.random.Generator = None) -> List[T]:
+        table = self.table
+        if k <= 0:
+            return []
+        if k == 1:
+            return [self.__items[table.sample()]]
+        return self.__item_array[table.sample_array(k, rng=rng)].tolist()
+
+
+__all__ = [
+    'AliasTable',
+    'CompiledDeck'
+]
@@ -0,0 +1,147 @@
+"""
+抽卡模拟统计
+使用卡组编译好的 alias 表在 NumPy 中成批抽取, 在进程池中执行
+结果按 (卡组, 卡组版本, 模拟次数) 缓存, 卡组数据文件修改后自动失效
+"""
+from collections import OrderedDict
+from typing import List
+import numpy as np
+from omega_miya.utils.Omega_Base import Result
+from omega_miya.utils.Omega_plugin_utils import process_pool
+from .deck.engine import CompiledDeck
+
+
+# 单批抽取次数, 须为 10 的倍数以便统计十连
+BATCH_SIZE = 1_000_000
+# 允许的最大模拟次数
+MAX_PULLS = 10_000_000
+DEFAULT_PULLS = 1_000_000
+
+
+def _gap_stats(gaps: np.ndarray) -> dict:
+    if gaps.size == 0:
+        return {'count': 0, 'mean': 0.0, 'p50': 0, 'p90': 0, 'p99': 0}
+    p50, p90, p99 = np.percentile(gaps, [50, 90, 99])
+    return {'count': int(gaps.size), 'mean': float(gaps.mean()), 'p50': int(p50), 'p90': int(p90), 'p99': int(p99)}
+
+
+def simulate_pulls(prob: List[float], alias: List[int], stars: List[int], up_flags: List[bool], pulls: int,
+                   batch_size: int = BATCH_SIZE, seed: int = None) -> dict:
+    """
+    :param prob: alias 表概率
+    :param alias: alias 表别名
+    :param stars: 各项的星级
+    :param up_flags: 各项是否为 up
+    :param pulls: 模拟抽取次数, 向上取整为 10 的倍数
+    :return: 各星级次数, 获得最高星级及最高星级 up 所需抽数的统计, 十连出现次高星级以上的比例
+    """
+    rng = np.random.default_rng(seed)
+    prob = np.asarray(prob, dtype=np.float64)
+    alias = np.asarray(alias, dtype=np.int64)
+    stars = np.asarray(stars, dtype=np.int64)
+    up_flags = np.asarray(up_flags, dtype=bool)
+    size = prob.size
+    star_levels = np.unique(stars)
+    top_star = int(star_levels[-1])
+    second_star = int(star_levels[-2]) if star_levels.size > 1 else top_star
+    is_top = stars == top_star
+    is_top_up = is_top & up_flags
+
+    pulls = -(-pulls // 10) * 10
+    batch_size = max(10, batch_size // 10 * 10)
+    star_counts = np.zeros(top_star + 1, dtype=np.int64)
+    ten_pull_hits = 0
+    # (各项是否计入, 间隔列表), 间隔为两次获得之间的抽数
+    trackers = [(is_top, []), (is_top_up, [])]
+    # 上一次获得的位置, 用于计算跨批次的间隔
+    last_positions = [-1] * len(trackers)
+
+    offset = 0
+    while offset < pulls:
+        n = min(batch_size, pulls - offset)
+        u = rng.random(n) * size
+        index = np.minimum(u.astype(np.int64), size - 1)
+        result = np.where(u - index < prob[index], index, alias[index])
+
+        result_stars = stars[result]
+        star_counts += np.bincount(result_stars, minlength=top_star + 1)
+        ten_pull_hits += int((result_stars.reshape(-1, 10) >= second_star).any(axis=1).sum())
+
+        for i, (flags, gaps) in enumerate(trackers):
+            positions = np.flatnonzero(flags[result]) + offset
+            if positions.size:
+                gaps.append(np.diff(positions, prepend=last_positions[i]))
+                last_positions[i] = int(positions[-1])
+        offset += n
+
+    top_gaps, top_up_gaps = [np.concatenate(gaps) if gaps else np.zeros(0, dtype=np.int64) for _, gaps in trackers]
+    return {
+        'pulls': pulls,
+        'star_counts': {int(x): int(star_counts[x]) for x in star_levels},
+        'top_star': top_star,
+        'second_star': second_star,
+        'top_gaps': _gap_stats(top_gaps),
+        'top_up_gaps': _gap_stats(top_up_gaps),
+        'ten_pull_rate': ten_pull_hits / (pulls // 10)
+    }
+
+
+def format_simulation(deck_name: str, stats: dict, top_probability: float) -> str:
+    pulls = stats['pulls']
+    star_msg = '\n'.join(f"{star}★: {count / pulls:.2%}"
+                         for star, count in sorted(stats['star_counts'].items(), reverse=True))
+    top_star = stats['top_star']
+    top_gaps = stats['top_gaps']
+    top_up_gaps = stats['top_up_gaps']
+    msg = f"【{deck_name}】模拟抽卡{pulls}次\n{'='*12}\n各星级出率:\n{star_msg}\n{'='*12}\n" \
+          f"获得{top_star}★所需抽数:\n期望{top_gaps['mean']:.1f}抽(理论{1 / top_probability:.1f}抽)\n" \
+          f"50%的人在{top_gaps['p50']}抽内\n90%的人在{top_gaps['p90']}抽内\n99%的人在{top_gaps['p99']}抽内"
+    if top_up_gaps['count']:
+        msg += f"\n{'='*12}\n获得UP{top_star}★所需抽数:\n期望{top_up_gaps['mean']:.1f}抽\n" \
+               f"50%的人在{top_up_gaps['p50']}抽内\n90%的人在{top_up_gaps['p90']}抽内\n" \
+               f"99%的人在{top_up_gaps['p99']}抽内"
+    msg += f"\n{'='*12}\n十连出{stats['second_star']}★以上的概率: {stats['ten_pull_rate']:.2%}"
+    return msg
+
+
+# (卡组名, 卡组版本, 模拟次数) -> 结果文本
+__simulation_cache: OrderedDict = OrderedDict()
+__simulation_cache_size = 32
+
+
+async def simulate_deck(deck: CompiledDeck, pulls: int = DEFAULT_PULLS) -> Result:
+    """
+    :param deck: 抽取结果为 (星级, 名称, 是否为up) 的卡组
+    :return: result 为统计结果文本
+    """
+    pulls = max(10, min(pulls, MAX_PULLS))
+    table = deck.table
+    items = deck.items
+    cache_key = (deck.name, deck.version, pulls)
+    cache = __simulation_cache.get(cache_key)
+    if cache is not None:
+        __simulation_cache.move_to_end(cache_key)
+        return Result(error=False, info='Cache hit', result=cache)
+
+    stars = [x[0] for x in items]
+    up_flags = [x[2] for x in items]
+    _res = await process_pool.run(simulate_pulls, table.prob, table.alias, stars, up_flags, pulls,
+                                  name='draw.simulate')
+    if not _res.success():
+        return Result(error=True, info=_res.info, result='')
+
+    top_star = max(stars)
+    top_probability = sum(p for p, star in zip(table.probabilities(), stars) if star == top_star)
+    msg = format_simulation(deck_name=deck.name, stats=_res.result, top_probability=top_probability)
+    __simulation_cache[cache_key] = msg
+    while len(__simulation_cache) > __simulation_cache_size:
+        __simulation_cache.popitem(last=False)
+    return Result(error=False, info='Success', result=msg)
+
+
+__all__ = [
+    'MAX_PULLS',
+    'DEFAULT_PULLS',
+    'simulate_pulls',
+    'simulate_deck'
+]
@@ -1,6 +1,5 @@
 import re
-import os
-from nonebot import MatcherGroup, logger
+from nonebot import MatcherGroup, logger, get_driver
 from nonebot.typing import T_State
 from nonebot.rule import to_me
 from nonebot.adapters.cqhttp.bot import Bot
@@ -8,7 +7,7 @@ from nonebot.adapters.cqhttp.message import MessageSegment
 from nonebot.adapters.cqhttp.event import GroupMessageEvent
 from nonebot.adapters.cqhttp.permission import GROUP
 from omega_miya.utils.Omega_plugin_utils import has_command_permission, permission_level
-from .resources import MiyaVoice
+from .resources import miya_voice
 
 """
 miya按钮bot实现版本
@@ -16,6 +15,12 @@ miya按钮bot实现版本
 """
 
 
+# 启动时构建音频索引, 发送时不再访问文件系统
+@get_driver().on_startup
+async def load_voices():
+    miya_voice.load()
+
+
 button = MatcherGroup(type='message', rule=to_me() & has_command_permission() & permission_level(level=10),
                       permission=GROUP, priority=100, block=False)
 
@@ -27,8 +32,8 @@ miya_button = button.on_endswith(msg='喵一个')
 async def miya_button(bot: Bot, event: GroupMessageEvent, state: T_State):
     arg = str(event.get_plaintext()).strip().lower()
     voice = re.sub('喵一个', '', arg)
-    voice_file = MiyaVoice().get_voice_filepath(voice=voice)
-    if not os.path.exists(voice_file):
+    voice_file = miya_voice.get_voice_filepath(voice=voice)
+    if not voice_file:
         await bot.send(event=event, message='喵？')
     else:
         msg = MessageSegment.record(file=f'file:///{voice_file}')
@@ -1,194 +1,131 @@
+"""
+音频素材库
+启动时从 voices.json 清单及 voices 目录扫描构建一次索引, 并校验文件是否存在
+清单格式为 {名称: {"file": 文件路径(相对 voices 目录), "tag": 标签}}
+voices 目录中未列入清单的音频文件同样会被加入, 名称为文件名, 位于子目录中时以子目录名为标签
+新增素材只需放入文件并按需编辑清单, 无需修改代码
+"""
+import json
 import os
 import random
+from typing import Dict, Optional, Tuple
+from nonebot import logger
 
 
-class Voice(object):
-    def __init__(self):
-        self.VoicesFiles = dict()
+RESOURCES_PATH = os.path.dirname(os.path.abspath(__file__))
+VOICES_PATH = os.path.join(RESOURCES_PATH, 'voices')
+MANIFEST_PATH = os.path.join(RESOURCES_PATH, 'voices.json')
+VOICE_SUFFIXES = ('.mp3', '.amr', '.silk', '.wav', '.ogg', '.m4a', '.flac')
 
-    def get_voice_filepath(self, voice: str) -> str:
-        plugin_path = os.path.dirname(os.path.abspath(__file__))
-        if voice in self.VoicesFiles.keys():
-            return os.path.join(plugin_path, 'voices', self.VoicesFiles[voice]['file'])
-        elif voice:
-            voice_list = []
-            for name, content in self.VoicesFiles.items():
-                if voice == content['tag']:
-                    voice_list.append(content['file'])
-            if not voice_list:
-                return ''
-            else:
-                return os.path.join(plugin_path, 'voices', random.choice(voice_list))
-        else:
-            voice_list = []
-            for name, content in self.VoicesFiles.items():
-                voice_list.append(content['file'])
-            return os.path.join(plugin_path, 'voices', random.choice(voice_list))
 
+class VoiceLibrary(object):
+    def __init__(self, voices_path: str = VOICES_PATH, manifest_path: str = MANIFEST_PATH):
+        self.voices_path = voices_path
+        self.manifest_path = manifest_path
+        self.__loaded = False
+        # 名称 -> 文件绝对路径
+        self.__names: Dict[str, str] = {}
+        # 标签 -> 该标签下的文件绝对路径
+        self.__tags: Dict[str, Tuple[str, ...]] = {}
+        self.__all: Tuple[str, ...] = ()
+
+    @property
+    def loaded(self) -> bool:
+        return self.__loaded
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self.__names.keys())
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        return tuple(self.__tags.keys())
+
+    def __scan_voices(self) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        :return: 相对路径 -> (名称, 标签)
+        """
+        result = {}
+        if not os.path.isdir(self.voices_path):
+            return result
+        for root, _, files in os.walk(self.voices_path):
+            rel_dir = os.path.relpath(root, self.voices_path)
+            tag = None if rel_dir == '.' else rel_dir.split(os.sep)[0]
+            for file in sorted(files):
+                name, suffix = os.path.splitext(file)
+                if suffix.lower() not in VOICE_SUFFIXES:
+                    continue
+                rel_path = os.path.normpath(os.path.join(rel_dir, file))
+                result[rel_path] = (name, tag)
+        return result
+
+    def load(self) -> None:
+        manifest = {}
+        if os.path.isfile(self.manifest_path):
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except Exception as e:
+                logger.error(f'Miya button: 读取音频清单失败, error: {repr(e)}')
+
+        scanned = self.__scan_voices()
+        names: Dict[str, str] = {}
+        tags: Dict[str, list] = {}
 
-class MiyaVoice(Voice):
-    def __init__(self):
+        def _add(name_: str, rel_path_: str, tag_: Optional[str]) -> None:
+            file_path = os.path.join(self.voices_path, rel_path_)
+            if name_ in names:
+                logger.warning(f'Miya button: 音频 {name_} 重复, 已忽略 {rel_path_}')
+                return
+            names[name_] = file_path
+            if tag_:
+                tags.setdefault(tag_, []).append(file_path)
+
+        listed = set()
+        missing = []
+        for name, content in manifest.items():
+            rel_path = os.path.normpath(content.get('file', ''))
+            if rel_path not in scanned:
+                missing.append(name)
+                continue
+            listed.add(rel_path)
+            # 清单中的标签优先于目录标签
+            _add(name, rel_path, content.get('tag', scanned[rel_path][1]))
+
+        for rel_path, (name, tag) in scanned.items():
+            if rel_path not in listed:
+                _add(name, rel_path, tag)
+        if missing:
+            logger.warning(f'Miya button: 清单中 {len(missing)} 个音频的文件不存在, 已忽略: {", ".join(missing)}')
+
+        self.__names = names
+        self.__tags = {tag: tuple(files) for tag, files in tags.items()}
+        # 同一文件可能对应多个名称, 随机时每个文件只计一次
+        self.__all = tuple(dict.fromkeys(names.values()))
+        self.__loaded = True
+        logger.info(f'Miya button: 已加载音频 {len(self.__all)} 个, 标签 {len(self.__tags)} 个')
+
+    def get_voice_filepath(self, voice: str) -> Optional[str]:
         """
-        硬编码音频素材文件
-        先暂时这样以后有空再改
+        按名称, 标签的顺序查找, voice 为空时从全部音频中随机
+        :return: 音频文件路径, 未找到时返回 None
         """
-        super().__init__()
-        self.VoicesFiles = {
-            '表演绝活': {
-                'file': '0.mp3',
-                'tag': '普通'
-            },
-            'iloveyou': {
-                'file': '1.mp3',
-                'tag': '卖萌'
-            },
-            '你才千岁幼猫': {
-                'file': '2.mp3',
-                'tag': '普通'
-            },
-            '坏蛋': {
-                'file': '3.mp3',
-                'tag': '卖萌'
-            },
-            '我信了你的鬼话': {
-                'file': '4.mp3',
-                'tag': '普通'
-            },
-            '来打我': {
-                'file': '5.mp3',
-                'tag': '普通'
-            },
-            '说别人憨的人': {
-                'file': '6.mp3',
-                'tag': '普通'
-            },
-            '欸嘿': {
-                'file': '7.mp3',
-                'tag': '卖萌'
-            },
-            'nya': {
-                'file': '8.mp3',
-                'tag': '怪叫'
-            },
-            '啊我输了': {
-                'file': '9.mp3',
-                'tag': '普通'
-            },
-            '嗷': {
-                'file': '10.mp3',
-                'tag': '怪叫'
-            },
-            '嗷嗷': {
-                'file': '11.mp3',
-                'tag': '怪叫'
-            },
-            '变八嘎太': {
-                'file': '12.mp3',
-                'tag': '普通'
-            },
-            '憋气': {
-                'file': '13.mp3',
-                'tag': '普通'
-            },
-            '喵啊啊': {
-                'file': '14.mp3',
-                'tag': '怪叫'
-            },
-            '喵啊啊啊': {
-                'file': '15.mp3',
-                'tag': '怪叫'
-            },
-            '喵呜': {
-                'file': '16.mp3',
-                'tag': '卖萌'
-            },
-            '那怎么可能笨蛋表': {
-                'file': '17.mp3',
-                'tag': '普通'
-            },
-            '那怎么可能笨蛋里': {
-                'file': '18.mp3',
-                'tag': '普通'
-            },
-            '勝負あったな': {
-                'file': '19.mp3',
-                'tag': '普通'
-            },
-            '哇啊啊': {
-                'file': '20.mp3',
-                'tag': '怪叫'
-            },
-            '汪': {
-                'file': '21.mp3',
-                'tag': '怪叫'
-            },
-            '呀': {
-                'file': '22.mp3',
-                'tag': '怪叫'
-            },
-            'miya起床': {
-                'file': '23.mp3',
-                'tag': '阴阳'
-            },
-            '啊啊啊': {
-                'file': '24.mp3',
-                'tag': '怪叫'
-            },
-            '嗝~啊': {
-                'file': '25.mp3',
-                'tag': '怪叫'
-            },
-            '喵~~': {
-                'file': '26.mp3',
-                'tag': '卖萌'
-            },
-            '喵~': {
-                'file': '27.mp3',
-                'tag': '卖萌'
-            },
-            '喵~~~': {
-                'file': '28.mp3',
-                'tag': '卖萌'
-            },
-            '喵喵喵喵喵喵喵喵喵': {
-                'file': '29.mp3',
-                'tag': '卖萌'
-            },
-            '嗯小哥哥人家不要了': {
-                'file': '30.mp3',
-                'tag': '卖萌'
-            },
-            '嗯~': {
-                'file': '31.mp3',
-                'tag': '卖萌'
-            },
-            '你花呗还没还': {
-                'file': '32.mp3',
-                'tag': '阴阳'
-            },
-            '你快点啊我等的花儿都谢了': {
-                'file': '33.mp3',
-                'tag': '阴阳'
-            },
-            '起床了大笨蛋': {
-                'file': '34.mp3',
-                'tag': '阴阳'
-            },
-            '起来了dd': {
-                'file': '35.mp3',
-                'tag': '阴阳'
-            },
-            '作业写了吗': {
-                'file': '36.mp3',
-                'tag': '阴阳'
-            },
-            '异世相遇尽享美味': {
-                'file': '37.mp3',
-                'tag': '卖萌'
-            }
-        }
-
-
-if __name__ == '__main__':
-    for key, item in MiyaVoice().VoicesFiles.items():
-        print(key, '//', item.get('tag'))
+        if not self.__loaded:
+            self.load()
+        if voice in self.__names:
+            return self.__names[voice]
+        elif voice:
+            files = self.__tags.get(voice)
+        else:
+            files = self.__all
+        return random.choice(files) if files else None
+
+
+# 全局音频素材库
+miya_voice = VoiceLibrary()
+
+
+__all__ = [
+    'VoiceLibrary',
+    'miya_voice'
+]
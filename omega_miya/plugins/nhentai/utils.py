@@ -1,6 +1,6 @@
-import aiohttp
 import nonebot
 import os
+from omega_miya.utils.Omega_plugin_utils import http_client
 from omega_miya.utils.Omega_Base import Result
 
 
@@ -12,26 +12,8 @@ GET_API_URL = f'{global_config.api_url}/api/nhentai/get/'
 
 
 async def fetch_json(url: str, paras: dict) -> Result:
-    timeout_count = 0
-    error_info = ''
-    while timeout_count < 3:
-        try:
-            timeout = aiohttp.ClientTimeout(total=90)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                         'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'}
-                async with session.get(url=url, params=paras, headers=headers, timeout=timeout) as resp:
-                    _json = await resp.json()
-                result = Result(error=False, info='Success', result=_json)
-            return result
-        except Exception as e:
-            error_info += f'{repr(e)} Occurred in fetch_json trying {timeout_count + 1} using paras: {paras}\n'
-        finally:
-            timeout_count += 1
-    else:
-        error_info += f'Failed too many times in fetch_json using paras: {paras}'
-        result = Result(error=True, info=error_info, result={})
-        return result
+    result = await http_client.get_json(url=url, params=paras, timeout=90)
+    return result
 
 
 async def nh_search(tag: str) -> Result:
@@ -67,23 +49,9 @@ async def nh_download(_id) -> Result:
         return Result(error=False, info='File exist', result={'file': file, 'password': password})
 
     # 尝试从服务器下载资源
-    error_info = ''
-    timeout_count = 0
-    while timeout_count < 3:
-        try:
-            timeout = aiohttp.ClientTimeout(total=180)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                         'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'}
-                async with session.get(url=GET_API_URL, headers=headers, params=dl_payload, timeout=timeout) as resp:
-                    nh_file = await resp.read()
-                    with open(file, 'wb+') as f:
-                        f.write(nh_file)
-                        return Result(error=False, info='Success', result={'file': file, 'password': password})
-        except Exception as _e:
-            error_info += f'{__name__}: {repr(_e)} Occurred in getting trying {timeout_count + 1} with id: {_id}'
-        finally:
-            timeout_count += 1
-    else:
-        error_info += f'{__name__}: Failed too many times in getting with id: {_id}'
-        return Result(error=True, info=f'Download failed, error info: {error_info}', result={})
+    _res = await http_client.get_bytes(url=GET_API_URL, params=dl_payload, timeout=180)
+    if not _res.success():
+        return Result(error=True, info=f'Download failed, error info: {_res.info}', result={})
+    with open(file, 'wb+') as f:
+        f.write(_res.result)
+    return Result(error=False, info='Success', result={'file': file, 'password': password})
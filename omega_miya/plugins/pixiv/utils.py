@@ -1,5 +1,7 @@
-import aiohttp
+import base64
 import nonebot
+from typing import Optional
+from omega_miya.utils.Omega_plugin_utils import http_client, image_cache, StateStore
 from omega_miya.utils.Omega_Base import Result
 
 
@@ -11,34 +13,46 @@ DOWNLOAD_API_URL = f'{global_config.api_url}/api/pixiv/download/'
 
 
 async def fetch_json(url: str, paras: dict) -> Result:
-    timeout_count = 0
-    error_info = ''
-    while timeout_count < 3:
-        try:
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                         'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'}
-                async with session.get(url=url, params=paras, headers=headers, timeout=timeout) as resp:
-                    _json = await resp.json()
-                result = Result(error=False, info='Success', result=_json)
-            return result
-        except Exception as e:
-            error_info += f'{repr(e)} Occurred in fetch_json trying {timeout_count + 1} using paras: {paras}\n'
-        finally:
-            timeout_count += 1
-    else:
-        error_info += f'Failed too many times in fetch_json using paras: {paras}'
-        result = Result(error=True, info=error_info, result={})
-        return result
+    result = await http_client.get_json(url=url, params=paras, timeout=30)
+    return result
+
+
+class _IllustMsg(object):
+    __slots__ = ('msg',)
+
+    def __init__(self):
+        self.msg: Optional[str] = None
+
+
+# 作品说明文本缓存, 与图片缓存分开, 不占用图片缓存的内存及磁盘预算
+_illust_msg_store: StateStore[_IllustMsg] = StateStore(factory=_IllustMsg, max_size=1024, idle_ttl=24 * 3600)
 
 
 async def fetch_image(pid: [int, str]) -> Result:
-    # 获取illust
-    payload = {'key': API_KEY, 'pid': pid, 'mode': 'regular'}
-    _res = await fetch_json(url=DOWNLOAD_API_URL, paras=payload)
-    if _res.success() and not _res.result.get('error'):
-        illust_data = _res.result.get('body')
+    async def _fetch_illust() -> Result:
+        payload = {'key': API_KEY, 'pid': pid, 'mode': 'regular'}
+        _res = await fetch_json(url=DOWNLOAD_API_URL, paras=payload)
+        if not _res.success() or _res.result.get('error'):
+            return Result(error=True, info=f'网络超时或 {pid} 不存在', result={})
+        return Result(error=False, info='Success', result=_res.result.get('body'))
+
+    async def _fetch_illust_image() -> Result:
+        # 图片已被淘汰但说明仍在缓存中时单独获取图片
+        _res = await _fetch_illust()
+        if not _res.success():
+            return Result(error=True, info=_res.info, result=b'')
+        pic_b64 = str(_res.result.get('pic_b64'))
+        return Result(error=False, info='Success', result=base64.b64decode(pic_b64.replace('base64://', '', 1)))
+
+    image_key = f'pixiv_illust_{pid}_regular'
+    illust_msg = _illust_msg_store.get(str(pid))
+    if illust_msg.msg is None:
+        # 获取illust, 同时将图片写入缓存
+        _res = await _fetch_illust()
+        if not _res.success():
+            _illust_msg_store.pop(str(pid))
+            return Result(error=True, info=f'网络超时或 {pid} 不存在', result={})
+        illust_data = _res.result
         title = illust_data.get('title')
         author = illust_data.get('uname')
         url = illust_data.get('url')
@@ -50,8 +64,13 @@ async def fetch_image(pid: [int, str]) -> Result:
             msg = f'「{title}」/「{author}」\n{tags}\n{url}'
         else:
             msg = f'「{title}」/「{author}」\n{tags}\n{url}\n----------------\n{description[:28]}......'
-        pic_b64 = illust_data.get('pic_b64')
-        result = Result(error=False, info='Success', result={'msg': msg, 'b64': pic_b64})
-    else:
-        result = Result(error=True, info=f'网络超时或 {pid} 不存在', result={})
+        pic_b64 = str(illust_data.get('pic_b64'))
+        await image_cache.put(key=image_key, data=base64.b64decode(pic_b64.replace('base64://', '', 1)))
+        illust_msg.msg = msg
+
+    # 'b64' 保留原键名, 值为 image_cache.get_source 返回的图片来源
+    image_res = await image_cache.get_source(key=image_key, fetcher=_fetch_illust_image)
+    if not image_res.success():
+        return Result(error=True, info=f'网络超时或 {pid} 不存在', result={})
+    result = Result(error=False, info='Success', result={'msg': illust_msg.msg, 'b64': image_res.result})
     return result
@@ -1,8 +1,9 @@
 import asyncio
-from nonebot import logger, require, get_bots
+from nonebot import logger, require
 from nonebot.adapters.cqhttp import MessageSegment
 from omega_miya.utils.Omega_Base import DBSubscription, DBTable
-from .utils import get_pixivsion_article, pixivsion_article_parse, fetch_image_b64
+from omega_miya.utils.Omega_plugin_utils import notice_dispatcher
+from .utils import get_pixivsion_article, pixivsion_article_parse, fetch_image_source
 from .block_tag import TAG_BLOCK_LIST
 
 
@@ -30,11 +31,6 @@ scheduler = require("nonebot_plugin_apscheduler").scheduler
 async def pixivision_monitor():
     logger.debug(f"pixivision_monitor: checking started")
 
-    # 获取当前bot列表
-    bots = []
-    for bot_id, bot in get_bots().items():
-        bots.append(bot)
-
     # 获取所有有通知权限的群组
     all_noitce_groups = []
     t = DBTable(table_name='Group')
@@ -101,17 +97,12 @@ async def pixivision_monitor():
             article_data = a_res.result
             msg = f"新的Pixivision特辑！\n\n" \
                   f"《{article_data['title']}》\n\n{article_data['description']}\n{article_data['url']}"
-            for group_id in notice_group:
-                for _bot in bots:
-                    try:
-                        await _bot.call_api(api='send_group_msg', group_id=group_id, message=msg)
-                    except Exception as e:
-                        logger.warning(f"向群组: {group_id} 发送article简介信息失败, error: {repr(e)}")
-                        continue
+            await notice_dispatcher.send_group_msg(group_ids=notice_group, message=msg,
+                                                   log_info=f'article: {aid} 简介信息')
             # 处理article中图片内容
             tasks = []
             for pid in article_data['illusts_list']:
-                tasks.append(fetch_image_b64(pid=pid))
+                tasks.append(fetch_image_source(pid=pid))
             p_res = await asyncio.gather(*tasks)
             image_error = 0
             for image_res in p_res:
@@ -120,14 +111,9 @@ async def pixivision_monitor():
                     continue
                 else:
                     img_seg = MessageSegment.image(image_res.result)
-                # 发送图片
-                for group_id in notice_group:
-                    for _bot in bots:
-                        try:
-                            await _bot.call_api(api='send_group_msg', group_id=group_id, message=img_seg)
-                        except Exception as e:
-                            logger.warning(f"向群组: {group_id} 发送图片内容失败, error: {repr(e)}")
-                            continue
+                # 发送图片, 各图片依次发送以保持顺序, 同一图片向各群并行发送
+                await notice_dispatcher.send_group_msg(group_ids=notice_group, message=img_seg,
+                                                       log_info=f'article: {aid} 图片内容')
             logger.info(f"article: {aid} 图片已发送完成, 失败: {image_error}")
         else:
             logger.error(f"article: {aid} 信息解析失败, info: {a_res.info}")
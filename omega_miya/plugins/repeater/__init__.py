@@ -4,35 +4,36 @@ from nonebot.typing import T_State
 from nonebot.adapters.cqhttp.bot import Bot
 from nonebot.adapters.cqhttp.event import GroupMessageEvent
 from nonebot.adapters.cqhttp.permission import GROUP
-from omega_miya.utils.Omega_plugin_utils import has_notice_permission
+from omega_miya.utils.Omega_plugin_utils import has_notice_permission, StateStore, msg_digest
 from .utils import sp_event_check
 
-last_msg = {}
-last_repeat_msg = {}
-repeat_count = {}
+
+class RepeatState(object):
+    """
+    群组复读状态, 仅保存消息摘要
+    """
+    __slots__ = ('last_msg', 'last_repeat_msg', 'repeat_count')
+
+    def __init__(self):
+        self.last_msg = b''
+        self.last_repeat_msg = b''
+        self.repeat_count = 0
+
+
+# 各群组复读状态, 一周内无消息的群组自动淘汰
+repeat_state: StateStore[RepeatState] = StateStore(factory=RepeatState, max_size=1024, idle_ttl=7 * 24 * 3600)
 
 repeater = on_message(rule=has_notice_permission(), permission=GROUP, priority=100, block=False)
 
 
 @repeater.handle()
 async def handle_repeater(bot: Bot, event: GroupMessageEvent, state: T_State):
-    group_id = event.group_id
-
-    global last_msg, last_repeat_msg, repeat_count
-
-    try:
-        last_msg[group_id]
-    except KeyError:
-        last_msg[group_id] = ''
-    try:
-        last_repeat_msg[group_id]
-    except KeyError:
-        last_repeat_msg[group_id] = ''
+    group_state = repeat_state.get(event.group_id)
 
     # 特殊消息
     sp_res, sp_msg = await sp_event_check(event=event)
     if sp_res:
-        repeat_count[group_id] = 0
+        group_state.repeat_count = 0
         await repeater.finish(message=sp_msg)
 
     t_msg = event.message
@@ -41,15 +42,16 @@ async def handle_repeater(bot: Bot, event: GroupMessageEvent, state: T_State):
     if re.match(r'^/', msg):
         return
 
-    if msg != last_msg[group_id] or msg == last_repeat_msg[group_id]:
-        last_msg[group_id] = msg
-        repeat_count[group_id] = 0
+    digest = msg_digest(msg)
+    if digest != group_state.last_msg or digest == group_state.last_repeat_msg:
+        group_state.last_msg = digest
+        group_state.repeat_count = 0
         return
     else:
-        repeat_count[group_id] += 1
-        last_repeat_msg[group_id] = ''
-        if repeat_count[group_id] >= 2:
+        group_state.repeat_count += 1
+        group_state.last_repeat_msg = b''
+        if group_state.repeat_count >= 2:
             await repeater.send(t_msg)
-            repeat_count[group_id] = 0
-            last_msg[group_id] = ''
-            last_repeat_msg[group_id] = msg
+            group_state.repeat_count = 0
+            group_state.last_msg = b''
+            group_state.last_repeat_msg = digest
@@ -1,29 +1,126 @@
+import os
 import re
+import json
+from time import monotonic
+from typing import Dict, List, Optional, Pattern, Tuple
+from nonebot import logger
 from nonebot.adapters import Event
 
-sp_msg = {
-    r'(.+)好萌好可爱$':
-        {'group_id': [], 'replyMsg': r'我也觉得{}好萌好可爱', 'handle': True},
-    r'^#测试群友(.+)浓度#?$':
-        {'group_id': [], 'replyMsg': r'群友{}浓度已超出测量范围Σ(っ °Д °;)っ', 'handle': True},
-    r'^对呀对呀$':
-        {'group_id': [], 'replyMsg': r'对呀对呀', 'handle': None},
-    r'^小母猫':
-        {'group_id': [], 'replyMsg': r'喵喵喵~', 'handle': None}
-}
+# 特殊消息规则表, 修改后无需重启, 下一条消息到达时自动重新加载
+# pattern: 正则; reply: 回复内容, handle 为 true 时以匹配到的分组依次填充 {};
+# group_id: 生效的群组, 为空则全部群组生效
+SP_RULES_FILE = os.path.join(os.path.dirname(__file__), 'sp_rules.json')
+
+
+# 含数字反向引用, 命名分组引用或全局内联标记的正则合并后语义会改变, 需单独匹配
+_UNCOMBINABLE_PATTERN = re.compile(r'\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)')
+
+# 匹配段: (正则, {外层分组名: (该规则第一个子分组在 m.groups() 中的下标, 子分组数, 规则)}), 单独匹配的规则分组名为 None
+T_Segment = Tuple[Pattern, Dict[Optional[str], Tuple[int, int, dict]]]
+
+
+class SpecialReplyRules(object):
+    """
+    特殊消息规则匹配器
+    相邻的可合并规则按顺序以命名分组合并为一个正则, 每条消息只需一次匹配, 与规则数量无关
+    含命名分组, 反向引用或全局内联标记的规则无法合并, 单独成段, 匹配时按段依次尝试, 保持规则的先后顺序
+    按生效群组预先为每个群组编译各自的匹配段, 未单独配置的群组使用仅含全局规则的匹配段
+    规则文件的修改时间每 check_interval 秒检查一次, 变化时重新编译, 单条规则无效时仅忽略该规则
+    """
+    def __init__(self, rules_file: str, check_interval: float = 5.0):
+        self.rules_file = rules_file
+        self.check_interval = check_interval
+        self.__rules: List[dict] = []
+        self.__default_matcher: List[T_Segment] = []
+        self.__group_matchers: Dict[int, List[T_Segment]] = {}
+        self.__mtime = None
+        self.__checked_at = 0.0
+
+    @staticmethod
+    def __combinable(pattern: Pattern) -> bool:
+        # 规则自身的命名分组合并后可能重名
+        return not pattern.groupindex and not _UNCOMBINABLE_PATTERN.search(pattern.pattern)
+
+    @classmethod
+    def __compile(cls, rules: List[Tuple[int, dict, Pattern]]) -> List[T_Segment]:
+        segments = []
+        batch = []
+
+        def _flush():
+            if not batch:
+                return
+            try:
+                combined = re.compile('|'.join(f'(?P<_r{i}>{rule["pattern"]})' for i, rule, _ in batch))
+                segments.append((combined, {f'_r{i}': (combined.groupindex[f'_r{i}'], pattern_.groups, rule)
+                                            for i, rule, pattern_ in batch}))
+            except re.error as e:
+                logger.warning(f'Repeater: 合并特殊消息规则失败, 改为逐条匹配, error: {repr(e)}')
+                segments.extend((pattern_, {None: (0, pattern_.groups, rule)}) for _, rule, pattern_ in batch)
+            batch.clear()
+
+        for index, rule, pattern in rules:
+            if cls.__combinable(pattern):
+                batch.append((index, rule, pattern))
+            else:
+                _flush()
+                segments.append((pattern, {None: (0, pattern.groups, rule)}))
+        _flush()
+        return segments
+
+    def load(self) -> None:
+        with open(self.rules_file, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        indexed_rules = []
+        for index, rule in enumerate(rules):
+            # 逐条校验, 无效的规则仅忽略该条
+            try:
+                indexed_rules.append((index, rule, re.compile(rule['pattern'])))
+            except Exception as e:
+                logger.error(f'Repeater: 特殊消息规则 {index} 无效, 已忽略, rule: {rule}, error: {repr(e)}')
+        default_matcher = self.__compile([x for x in indexed_rules if not x[1].get('group_id')])
+        group_ids = {int(group_id) for _, rule, _ in indexed_rules for group_id in rule.get('group_id', [])}
+        group_matchers = {}
+        for group_id in group_ids:
+            group_matchers[group_id] = self.__compile(
+                [x for x in indexed_rules
+                 if not x[1].get('group_id') or group_id in [int(y) for y in x[1].get('group_id')]])
+        self.__rules = [rule for _, rule, _ in indexed_rules]
+        self.__default_matcher = default_matcher
+        self.__group_matchers = group_matchers
+        logger.info(f'Repeater: 已加载特殊消息规则 {len(self.__rules)} 条, 共 {len(default_matcher)} 个匹配段')
+
+    def reload_if_changed(self) -> None:
+        now = monotonic()
+        if now - self.__checked_at < self.check_interval:
+            return
+        self.__checked_at = now
+        try:
+            mtime = os.path.getmtime(self.rules_file)
+            if mtime != self.__mtime:
+                # 先记录修改时间, 加载失败时等待文件再次修改后重试
+                self.__mtime = mtime
+                self.load()
+        except Exception as e:
+            logger.error(f'Repeater: 加载特殊消息规则失败, 继续使用原规则, error: {repr(e)}')
+
+    def match(self, group_id: Optional[int], msg: str) -> Tuple[bool, str]:
+        self.reload_if_changed()
+        for pattern, group_map in self.__group_matchers.get(group_id, self.__default_matcher):
+            m = pattern.match(msg)
+            if m is None:
+                continue
+            # 合并正则的各分支互斥, lastgroup 即为匹配到的规则对应的外层命名分组
+            start, count, rule = group_map[None] if None in group_map else group_map[m.lastgroup]
+            reply = rule['reply']
+            if rule.get('handle'):
+                reply = reply.format(*m.groups()[start:start + count])
+            return True, reply
+        return False, ''
+
+sp_rules = SpecialReplyRules(rules_file=SP_RULES_FILE)
 
 
 async def sp_event_check(event: Event) -> (bool, str):
     msg = str(event.get_message())
     group_id = event.dict().get('group_id')
-    for key in sp_msg.keys():
-        if re.match(key, msg):
-            if group_id in sp_msg.get(key).get('group_id') or not sp_msg.get(key).get('group_id'):
-                handle = sp_msg.get(key).get('handle')
-                if handle:
-                    msg = sp_msg.get(key).get('replyMsg').format(re.findall(key, msg)[0])
-                    return True, msg
-                else:
-                    msg = sp_msg.get(key).get('replyMsg')
-                    return True, msg
-    return False, ''
+    return sp_rules.match(group_id=group_id, msg=msg)
@@ -7,7 +7,7 @@ from nonebot.adapters.cqhttp.permission import GROUP
 from nonebot.adapters.cqhttp import MessageSegment, Message
 from omega_miya.utils.Omega_plugin_utils import init_export
 from omega_miya.utils.Omega_plugin_utils import has_command_permission, has_level_or_node
-from .utils import get_identify_result, pic_2_base64
+from .utils import get_identify_result, pic_2_source
 
 
 # Custom plugin usage text
@@ -98,14 +98,14 @@ async def handle_draw(bot: Bot, event: GroupMessageEvent, state: T_State):
             thumb_img_url = f'https://trace.moe/thumbnail.php?' \
                             f'anilist_id={anilist_id}&file={filename}&t={raw_at}&token={tokenthumb}'
 
-            img_b64 = await pic_2_base64(thumb_img_url)
-            if not img_b64.success():
+            img_source = await pic_2_source(thumb_img_url)
+            if not img_source.success():
                 msg = f"识别结果: {anime}\n\n名称:\n【{title_native}】\n【{title_chinese}】\n" \
                       f"相似度: {similarity}\n\n原始文件: {filename}\nEpisode: 【{episode}】\n" \
                       f"截图时间位置: {at}\n绅士: 【{is_adult}】"
                 await search_anime.send(msg)
             else:
-                img_seg = MessageSegment.image(img_b64.result)
+                img_seg = MessageSegment.image(img_source.result)
                 msg = f"识别结果: {anime}\n\n名称:\n【{title_native}】\n【{title_chinese}】\n" \
                       f"相似度: {similarity}\n\n原始文件: {filename}\nEpisode: 【{episode}】\n" \
                       f"截图时间位置: {at}\n绅士: 【{is_adult}】\n{img_seg}"
@@ -7,7 +7,7 @@ from nonebot.adapters.cqhttp.permission import GROUP
 from nonebot.adapters.cqhttp import MessageSegment, Message
 from omega_miya.utils.Omega_plugin_utils import init_export
 from omega_miya.utils.Omega_plugin_utils import has_command_permission, has_level_or_node
-from .utils import pic_2_base64, get_identify_result, get_ascii2d_identify_result
+from .utils import pic_2_source, get_identify_result, get_ascii2d_identify_result
 
 # Custom plugin usage text
 __plugin_raw_name__ = __name__.split('.')[-1]
@@ -86,12 +86,12 @@ async def handle_draw(bot: Bot, event: GroupMessageEvent, state: T_State):
                     else:
                         ext_urls = item['ext_urls']
                         ext_urls = ext_urls.strip()
-                    img_b64 = await pic_2_base64(item['thumbnail'])
-                    if not img_b64.success():
+                    img_source = await pic_2_source(item['thumbnail'])
+                    if not img_source.success():
                         msg = f"识别结果: {item['index_name']}\n\n相似度: {item['similarity']}\n资源链接: {ext_urls}"
                         await search_image.send(msg)
                     else:
-                        img_seg = MessageSegment.image(img_b64.result)
+                        img_seg = MessageSegment.image(img_source.result)
                         msg = f"识别结果: {item['index_name']}\n\n相似度: {item['similarity']}\n资源链接: {ext_urls}\n{img_seg}"
                         await search_image.send(Message(msg))
                 except Exception as e:
@@ -1,9 +1,7 @@
-import aiohttp
-import base64
 import re
-from io import BytesIO
 from bs4 import BeautifulSoup
 from nonebot import logger
+from omega_miya.utils.Omega_plugin_utils import http_client, image_cache
 from omega_miya.utils.Omega_Base import Result
 
 
@@ -12,65 +10,26 @@ API_URL = 'https://saucenao.com/search.php'
 API_URL_ASCII2D = 'https://ascii2d.net/search/url/'
 
 
-# 图片转base64
-async def pic_2_base64(url: str) -> Result:
-    async def get_image(pic_url: str):
-        timeout_count = 0
-        while timeout_count < 3:
-            try:
-                timeout = aiohttp.ClientTimeout(total=10)
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                             'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'}
-                    async with session.get(url=pic_url, headers=headers, timeout=timeout) as resp:
-                        _res = await resp.read()
-                return _res
-            except Exception as _e:
-                error_info = f'{repr(_e)} Occurred in get_image trying {timeout_count + 1} using paras: {pic_url}'
-                logger.info(error_info)
-            finally:
-                timeout_count += 1
-        else:
-            error_info = f'Failed too many times in get_image using paras: {pic_url}'
-            logger.warning(error_info)
-            return None
-
-    origin_image_f = BytesIO()
-    try:
-        origin_image_f.write(await get_image(pic_url=url))
-    except Exception as e:
-        result = Result(error=True, info=f'pic_2_base64 error: {repr(e)}', result='')
+# 获取图片发送来源, 默认为 base64 字符串, 见 image_cache.get_source
+async def pic_2_source(url: str) -> Result:
+    _res = await image_cache.get_source(
+        key=url, downloader=lambda path: http_client.download(url=url, save_path=path, timeout=10))
+    if not _res.success():
+        logger.warning(f'pic_2_source failed: {_res.info}')
+        result = Result(error=True, info=f'pic_2_source error: {_res.info}', result='')
         return result
-    b64 = base64.b64encode(origin_image_f.getvalue())
-    b64 = str(b64, encoding='utf-8')
-    b64 = 'base64://' + b64
-    origin_image_f.close()
-    result = Result(error=False, info='Success', result=b64)
+    result = Result(error=False, info='Success', result=_res.result)
     return result
 
 
 # 获取识别结果 Saucenao模块
 async def get_identify_result(url: str) -> list:
     async def get_result(__url: str, paras: dict) -> dict:
-        timeout_count = 0
-        while timeout_count < 3:
-            try:
-                timeout = aiohttp.ClientTimeout(total=10)
-                async with aiohttp.ClientSession(timeout=timeout) as __session:
-                    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                             'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'}
-                    async with __session.get(url=__url, params=paras, headers=headers, timeout=timeout) as resp:
-                        json = await resp.json()
-                return json
-            except Exception as e:
-                error_info = f'{repr(e)} Occurred in get_result trying {timeout_count + 1} using paras: {paras}'
-                logger.info(error_info)
-            finally:
-                timeout_count += 1
-        else:
-            error_info = f'Failed too many times in get_result using paras: {paras}'
-            logger.warning(error_info)
+        _res = await http_client.get_json(url=__url, params=paras, timeout=10)
+        if not _res.success():
+            logger.warning(f'get_result failed: {_res.info}')
             return {'header': {'status': 1}, 'results': []}
+        return _res.result
 
     __payload = {'output_type': 2,
                  'api_key': API_KEY,
@@ -102,51 +61,22 @@ async def get_identify_result(url: str) -> list:
 # 获取识别结果 ascii2d模块
 async def get_ascii2d_identify_result(url: str) -> list:
     async def get_ascii2d_redirects(_url: str) -> dict:
-        timeout_count = 0
-        while timeout_count < 3:
-            try:
-                timeout = aiohttp.ClientTimeout(total=10)
-                async with aiohttp.ClientSession(timeout=timeout) as __session:
-                    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                             'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36',
-                               'accept-language': 'zh-CN,zh;q=0.9'}
-                    async with __session.get(url=_url, headers=headers, timeout=timeout,
-                                             allow_redirects=False) as resp:
-                        res_headers = resp.headers
-                        res_dict = {'error': False, 'body': dict(res_headers)}
-                return res_dict
-            except Exception as e:
-                error_info = f'{repr(e)} Occurred in get_ascii2d_redirects trying {timeout_count + 1} using url: {_url}'
-                logger.info(error_info)
-            finally:
-                timeout_count += 1
-        else:
-            error_info = f'Failed too many times in get_result using url: {_url}'
-            logger.warning(error_info)
+        headers = {'accept-language': 'zh-CN,zh;q=0.9'}
+        _res = await http_client.get_headers(url=_url, headers=headers, timeout=10, allow_redirects=False)
+        if not _res.success():
+            logger.warning(f'get_ascii2d_redirects failed: {_res.info}')
             return {'error': True, 'body': None}
+        return {'error': False, 'body': _res.result}
 
     async def get_ascii2d_result(__url: str) -> str:
-        timeout_count = 0
-        while timeout_count < 3:
-            try:
-                timeout = aiohttp.ClientTimeout(total=10)
-                async with aiohttp.ClientSession(timeout=timeout) as __session:
-                    headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                             'AppleWebKit/537.36 (KHTML, like Gecko) '
-                                             'Chrome/83.0.4103.116 Safari/537.36',
-                               'accept-language': 'zh-CN,zh;q=0.9'}
-                    async with __session.get(url=__url, headers=headers, timeout=timeout) as resp:
-                        res_headers = await resp.text()
-                return res_headers
-            except Exception as e:
-                error_info = f'{repr(e)} Occurred in get_ascii2d_result trying {timeout_count + 1} using url: {__url}'
-                logger.info(error_info)
-            finally:
-                timeout_count += 1
-        else:
-            error_info = f'Failed too many times in get_result using url: {__url}'
-            logger.warning(error_info)
-            return ''
+        headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                                 'AppleWebKit/537.36 (KHTML, like Gecko) '
+                                 'Chrome/83.0.4103.116 Safari/537.36',
+                   'accept-language': 'zh-CN,zh;q=0.9'}
+        _res = await http_client.get_text(url=__url, headers=headers, timeout=10)
+        if not _res.success():
+            logger.warning(f'get_ascii2d_result failed: {_res.info}')
+        return _res.result
 
     search_url = f'{API_URL_ASCII2D}{url}'
     __result_json = await get_ascii2d_redirects(_url=search_url)
@@ -1,6 +1,6 @@
 import asyncio
 import random
-from nonebot import on_command, export, logger
+from nonebot import on_command, export, logger, get_driver
 from nonebot.rule import to_me
 from nonebot.permission import SUPERUSER
 from nonebot.typing import T_State
@@ -12,7 +12,24 @@ from omega_miya.utils.Omega_plugin_utils import init_export
 from omega_miya.utils.Omega_plugin_utils import \
     has_command_permission, has_level_or_node, PluginCoolDown
 from omega_miya.utils.Omega_Base import DBPixivillust
-from .utils import fetch_illust_b64, add_illust
+from .utils import fetch_illust_source
+from .importer import IllustImporter
+
+
+global_config = get_driver().config
+# 导入图库时同时获取作品信息的请求数及每批写入数据库的作品数
+IMPORT_CONCURRENCY = int(getattr(global_config, 'setu_import_concurrency', 10))
+IMPORT_BATCH_SIZE = int(getattr(global_config, 'setu_import_batch_size', 100))
+
+
+# 启动时构建 Pixiv 作品索引, 构建失败时图库查询使用数据库
+@get_driver().on_startup
+async def build_pixiv_illust_index():
+    _res = await DBPixivillust.async_build_index()
+    if _res.success():
+        logger.info(f'Pixiv illust index built: {_res.result}')
+    else:
+        logger.error(f'Pixiv illust index build failed, 使用数据库查询, error: {_res.info}')
 
 
 # Custom plugin usage text
@@ -84,25 +101,8 @@ async def handle_setu(bot: Bot, event: GroupMessageEvent, state: T_State):
     tags = state['tags']
 
     if tags:
-        _res_list = list()
-        for tag in tags:
-            """
-            _tag = DBPixivtag(tagname=tag)
-            _res = _tag.list_illust(nsfw_tag=nsfw_tag)
-            """
-            _res = DBPixivillust.list_illust(nsfw_tag=nsfw_tag, keyword=tag)
-            if _res.success():
-                _pids = set(_res.result)
-                _res_list.append(_pids)
-        if len(_res_list) > 1:
-            # 处理tag交集, 同时满足所有tag
-            for item in _res_list[1:]:
-                _res_list[0].intersection_update(item)
-            pid_list = _res_list[0]
-        elif len(_res_list) == 1:
-            pid_list = _res_list[0]
-        else:
-            pid_list = _res_list
+        # 同时满足所有tag
+        pid_list = DBPixivillust.list_illust_by_tags(nsfw_tag=nsfw_tag, keywords=list(tags)).result
     else:
         # 没有tag则随机获取
         pid_list = DBPixivillust.rand_illust(num=3, nsfw_tag=nsfw_tag)
@@ -117,7 +117,7 @@ async def handle_setu(bot: Bot, event: GroupMessageEvent, state: T_State):
     # 处理article中图片内容
     tasks = []
     for pid in pid_list:
-        tasks.append(fetch_illust_b64(pid=pid))
+        tasks.append(fetch_illust_source(pid=pid))
     p_res = await asyncio.gather(*tasks)
     fault_count = 0
     for image_res in p_res:
@@ -160,21 +160,8 @@ async def handle_first_receive(bot: Bot, event: GroupMessageEvent, state: T_Stat
 async def handle_moepic(bot: Bot, event: GroupMessageEvent, state: T_State):
     tags = state['tags']
     if tags:
-        _res_list = list()
-        for tag in tags:
-            _res = DBPixivillust.list_illust(nsfw_tag=0, keyword=tag)
-            if _res.success():
-                _pids = set(_res.result)
-                _res_list.append(_pids)
-        if len(_res_list) > 1:
-            # 处理tag交集, 同时满足所有tag
-            for item in _res_list[1:]:
-                _res_list[0].intersection_update(item)
-            pid_list = _res_list[0]
-        elif len(_res_list) == 1:
-            pid_list = _res_list[0]
-        else:
-            pid_list = _res_list
+        # 同时满足所有tag
+        pid_list = DBPixivillust.list_illust_by_tags(nsfw_tag=0, keywords=list(tags)).result
     else:
         # 没有tag则随机获取
         pid_list = DBPixivillust.rand_illust(num=3, nsfw_tag=0)
@@ -189,7 +176,7 @@ async def handle_moepic(bot: Bot, event: GroupMessageEvent, state: T_State):
     # 处理article中图片内容
     tasks = []
     for pid in pid_list:
-        tasks.append(fetch_illust_b64(pid=pid))
+        tasks.append(fetch_illust_source(pid=pid))
     p_res = await asyncio.gather(*tasks)
     fault_count = 0
     for image_res in p_res:
@@ -285,35 +272,19 @@ async def handle_setu_import(bot: Bot, event: Event, state: T_State):
 
     await setu_import.send('已读取导入文件列表, 开始获取作品信息~')
 
-    # 对列表去重
-    pid_list = list(set(pid_list))
-
-    # 导入操作
-    all_count = len(pid_list)
-    success_count = 0
-    # 全部一起并发api撑不住, 做适当切分
-    # 每个切片数量
-    seg_n = 10
-    pid_seg_list = []
-    for i in range(0, all_count, seg_n):
-        pid_seg_list.append(pid_list[i:i + seg_n])
-    # 每个切片打包一个任务
-    seg_len = len(pid_seg_list)
-    process_rate = 0
-    for seg_list in pid_seg_list:
-        tasks = []
-        for pid in seg_list:
-            tasks.append(add_illust(pid=pid, nsfw_tag=nsfw_tag))
-        # 进行异步处理
-        _res = await asyncio.gather(*tasks)
-        # 对结果进行计数
-        for item in _res:
-            if item.success():
-                success_count += 1
-        # 显示进度
-        process_rate += 1
-        if process_rate % 10 == 0:
-            await setu_import.send(f'导入操作中，已完成: {process_rate}/{seg_len}')
-
-    logger.info(f'setu_import: 导入操作已完成, 成功: {success_count}, 总计: {all_count}')
-    await setu_import.send(f'导入操作已完成, 成功: {success_count}, 总计: {all_count}')
+    # 导入操作, 中断后再次导入会跳过检查点中已完成的作品
+    importer = IllustImporter(nsfw_tag=nsfw_tag, checkpoint_path=f'{import_pid_file}.checkpoint',
+                              concurrency=IMPORT_CONCURRENCY, batch_size=IMPORT_BATCH_SIZE)
+
+    async def _progress(stats: dict):
+        await setu_import.send(f"导入操作中, 已完成: {stats['processed']}/{stats['total']}, "
+                               f"速度: {stats['rate']:.1f}个/秒, 预计剩余: {int(stats['eta'])}秒")
+
+    _res = await importer.run(pid_list=pid_list, progress=_progress, report_interval=60)
+    stats = _res.result
+    msg = f"导入操作已完成, 成功: {stats['written']}, 失败: {stats['failed']}, " \
+          f"跳过(已导入): {stats['skipped']}, 总计: {stats['total'] + stats['skipped']}, 用时: {int(stats['elapsed'])}秒"
+    if not _res.success():
+        msg = f"导入操作中断, 已完成: {stats['written']}, 重新导入时将跳过已完成的作品, error: {_res.info}"
+    logger.info(f'setu_import: {msg}')
+    await setu_import.send(msg)
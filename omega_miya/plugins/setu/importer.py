@@ -0,0 +1,181 @@
+"""
+图库批量导入流水线
+"""
+import os
+import asyncio
+from time import monotonic
+from typing import Awaitable, Callable, Iterable, List, Set
+from nonebot import logger
+from omega_miya.utils.Omega_Base import DBPixivillust, Result
+from .utils import parse_illust_info
+
+
+class IllustImporter(object):
+    """
+    流式导入作品
+    concurrency 个 worker 从 pid 队列中依次取任务获取作品信息, 任一请求完成即开始下一个, 不再按切片整组等待
+    写入任务将获取到的作品攒够 batch_size 个或距首个作品超过 flush_interval 秒时在一个事务中批量写入
+    每批写入成功后将 pid 追加到检查点文件, 中断后再次导入时跳过已完成的 pid, 全部成功后删除检查点
+    """
+    def __init__(self, nsfw_tag: int, checkpoint_path: str, concurrency: int = 10,
+                 batch_size: int = 100, flush_interval: float = 5.0):
+        self.nsfw_tag = nsfw_tag
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.__total = 0
+        self.__skipped = 0
+        self.__written = 0
+        self.__failed = 0
+        self.__started_at = 0.0
+
+    def stats(self) -> dict:
+        processed = self.__written + self.__failed
+        elapsed = monotonic() - self.__started_at if self.__started_at else 0.0
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        return {
+            'total': self.__total,
+            'skipped': self.__skipped,
+            'processed': processed,
+            'written': self.__written,
+            'failed': self.__failed,
+            'elapsed': elapsed,
+            'rate': rate,
+            'eta': (self.__total - processed) / rate if rate > 0 else 0.0
+        }
+
+    def __load_checkpoint(self) -> Set[int]:
+        if not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path, 'r') as f:
+            return {int(x) for x in f.read().split() if x.isdigit()}
+
+    def __save_checkpoint(self, pids: List[int]) -> None:
+        with open(self.checkpoint_path, 'a') as f:
+            f.write(''.join(f'{x}\n' for x in pids))
+
+    def __remove_checkpoint(self) -> None:
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    async def run(self, pid_list: Iterable[int],
+                  progress: Callable[[dict], Awaitable[None]] = None, report_interval: float = 30) -> Result:
+        """
+        :param progress: 每隔 report_interval 秒以 stats() 回调一次, 用于报告进度
+        :return: result 为最终的 stats()
+        """
+        pid_list = list(dict.fromkeys(pid_list))
+        loop = asyncio.get_event_loop()
+        # 检查点文件操作均在线程池中执行
+        done = await loop.run_in_executor(None, self.__load_checkpoint)
+        pending = [x for x in pid_list if x not in done]
+        self.__total = len(pending)
+        self.__skipped = len(pid_list) - len(pending)
+        self.__written = self.__failed = 0
+        self.__started_at = monotonic()
+
+        pid_queue = asyncio.Queue()
+        for pid in pending:
+            pid_queue.put_nowait(pid)
+        # 有界队列, 写入跟不上时 worker 暂停获取
+        illust_queue = asyncio.Queue(maxsize=self.batch_size * 2)
+
+        workers = [loop.create_task(self.__fetch_worker(pid_queue, illust_queue))
+                   for _ in range(min(self.concurrency, len(pending)))]
+        writer = loop.create_task(self.__write_worker(illust_queue))
+        reporter = loop.create_task(self.__report(progress, report_interval)) if progress else None
+        fetching = asyncio.gather(*workers)
+        try:
+            # 写入任务异常退出后不再消费作品队列, worker 会阻塞在 put 上, 因此需同时等待写入任务
+            await asyncio.wait([fetching, writer], return_when=asyncio.FIRST_COMPLETED)
+            if writer.done():
+                writer.result()
+                raise RuntimeError('Write worker exited before fetch workers finished')
+            await fetching
+            await illust_queue.put(None)
+            await writer
+        except Exception as e:
+            stats = self.stats()
+            logger.error(f'IllustImporter: 导入中断, 已完成的作品保存在检查点中, {stats}, error: {repr(e)}')
+            return Result(error=True, info=f'Import interrupted: {repr(e)}', result=stats)
+        finally:
+            for task in workers + [writer, reporter]:
+                if task is not None and not task.done():
+                    task.cancel()
+            if not fetching.done():
+                fetching.cancel()
+            # 取回已取消任务的异常, 避免未获取异常的警告
+            await asyncio.gather(fetching, writer, return_exceptions=True)
+
+        stats = self.stats()
+        if not self.__failed:
+            await loop.run_in_executor(None, self.__remove_checkpoint)
+        logger.info(f'IllustImporter: 导入完成, {stats}')
+        return Result(error=False, info='Success', result=stats)
+
+    async def __report(self, progress: Callable[[dict], Awaitable[None]], interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await progress(self.stats())
+            except Exception as e:
+                logger.warning(f'IllustImporter: 进度报告失败, error: {repr(e)}')
+
+    async def __fetch_worker(self, pid_queue: asyncio.Queue, illust_queue: asyncio.Queue) -> None:
+        while True:
+            try:
+                pid = pid_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            _res = await parse_illust_info(pid=pid, nsfw_tag=self.nsfw_tag)
+            if _res.success():
+                await illust_queue.put(_res.result)
+            else:
+                self.__failed += 1
+                logger.debug(f'IllustImporter: 获取作品 {pid} 信息失败, error: {_res.info}')
+
+    async def __write_worker(self, illust_queue: asyncio.Queue) -> None:
+        finished = False
+        while not finished:
+            illust = await illust_queue.get()
+            if illust is None:
+                return
+            batch = [illust]
+            deadline = monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    illust = await asyncio.wait_for(illust_queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if illust is None:
+                    finished = True
+                    break
+                batch.append(illust)
+            await self.__write(batch)
+
+    async def __write(self, batch: List[dict]) -> None:
+        _res = await DBPixivillust.async_add_batch(batch)
+        if _res.success():
+            written = [int(x['pid']) for x in batch]
+        else:
+            # 批量写入失败时逐个重试, 避免单个异常作品导致整批失败
+            logger.warning(f'IllustImporter: 批量写入 {len(batch)} 个作品失败, 逐个重试, error: {_res.info}')
+            written = []
+            for illust in batch:
+                _illust_res = await DBPixivillust.async_add_batch([illust])
+                if _illust_res.success():
+                    written.append(int(illust['pid']))
+                else:
+                    self.__failed += 1
+                    logger.error(f'IllustImporter: 作品 {illust["pid"]} 写入失败, error: {_illust_res.info}')
+        await asyncio.get_event_loop().run_in_executor(None, self.__save_checkpoint, written)
+        self.__written += len(written)
+
+
+__all__ = [
+    'IllustImporter'
+]
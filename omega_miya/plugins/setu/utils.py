@@ -1,6 +1,7 @@
-import aiohttp
+import base64
 import nonebot
-from omega_miya.utils.Omega_Base import DBPixivillust, Result
+from omega_miya.utils.Omega_plugin_utils import http_client, image_cache
+from omega_miya.utils.Omega_Base import Result
 
 
 global_config = nonebot.get_driver().config
@@ -10,39 +11,31 @@ DOWNLOAD_API_URL = f'{global_config.api_url}/api/pixiv/download/'
 
 
 async def fetch_json(url: str, paras: dict) -> Result:
-    timeout_count = 0
-    error_info = ''
-    while timeout_count < 3:
-        try:
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                headers = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                                         'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'}
-                async with session.get(url=url, params=paras, headers=headers, timeout=timeout) as resp:
-                    _json = await resp.json()
-                result = Result(error=False, info='Success', result=_json)
-            return result
-        except Exception as e:
-            error_info += f'{repr(e)} Occurred in fetch_json trying {timeout_count + 1} using paras: {paras}\n'
-        finally:
-            timeout_count += 1
-    else:
-        error_info += f'Failed too many times in fetch_json using paras: {paras}'
-        result = Result(error=True, info=error_info, result={})
-        return result
+    result = await http_client.get_json(url=url, params=paras, timeout=30)
+    return result
 
 
-# 图片转base64
-async def fetch_illust_b64(pid: [int, str]) -> Result:
-    # 获取illust
+async def download_illust(pid: [int, str]) -> Result:
+    """
+    通过 API 获取 illust 原始图片字节
+    """
     payload = {'key': API_KEY, 'pid': pid, 'mode': 'regular'}
     _res = await fetch_json(url=DOWNLOAD_API_URL, paras=payload)
     if _res.success() and not _res.result.get('error'):
-        illust_data = _res.result.get('body')
-        pic_b64 = illust_data.get('pic_b64')
-        result = Result(error=False, info='Success', result=pic_b64)
+        pic_b64 = str(_res.result.get('body').get('pic_b64'))
+        result = Result(error=False, info='Success', result=base64.b64decode(pic_b64.replace('base64://', '', 1)))
     else:
-        result = Result(error=True, info=f'网络超时或 {pid} 不存在', result='')
+        result = Result(error=True, info=f'网络超时或 {pid} 不存在', result=b'')
+    return result
+
+
+# 获取图片发送来源, 默认为 base64 字符串, 见 image_cache.get_source
+async def fetch_illust_source(pid: [int, str]) -> Result:
+    # 获取illust, 优先使用缓存
+    _res = await image_cache.get_source(key=f'pixiv_illust_{pid}_regular', fetcher=lambda: download_illust(pid=pid))
+    if not _res.success():
+        return Result(error=True, info=_res.info, result='')
+    result = Result(error=False, info='Success', result=_res.result)
     return result
 
 
@@ -57,20 +50,24 @@ async def fetch_illust_info(pid: [int, str]) -> Result:
     return result
 
 
-async def add_illust(pid: int, nsfw_tag: int) -> Result:
+async def parse_illust_info(pid: int, nsfw_tag: int) -> Result:
+    """
+    获取作品信息并整理为 DBPixivillust.add 所需的参数
+    """
     _res = await fetch_illust_info(pid=pid)
-    if _res.success():
-        illust_data = _res.result.get('body')
-        title = illust_data.get('title')
-        uid = illust_data.get('uid')
-        uname = illust_data.get('uname')
-        url = illust_data.get('url')
-        tags = illust_data.get('tags')
-        is_r18 = illust_data.get('is_r18')
-
-        if is_r18:
-            nsfw_tag = 2
+    if not _res.success():
+        return _res
+    illust_data = _res.result.get('body')
+    if illust_data.get('is_r18'):
+        nsfw_tag = 2
+    illust = {
+        'pid': pid,
+        'uid': illust_data.get('uid'),
+        'title': illust_data.get('title'),
+        'uname': illust_data.get('uname'),
+        'nsfw_tag': nsfw_tag,
+        'tags': illust_data.get('tags'),
+        'url': illust_data.get('url')
+    }
+    return Result(error=False, info='Success', result=illust)
 
-        illust = DBPixivillust(pid=pid)
-        _res = illust.add(uid=uid, title=title, uname=uname, nsfw_tag=nsfw_tag, tags=tags, url=url)
-    return _res
@@ -7,7 +7,7 @@ from nonebot.adapters.cqhttp.permission import GROUP
 from nonebot.adapters.cqhttp import MessageSegment
 from omega_miya.utils.Omega_plugin_utils import init_export
 from omega_miya.utils.Omega_plugin_utils import has_command_permission, permission_level
-from .utils import sticker_maker_main, pic_2_base64
+from .utils import sticker_maker_main
 
 
 # Custom plugin usage text
@@ -119,20 +119,13 @@ async def handle_sticker_text(bot: Bot, event: GroupMessageEvent, state: T_State
     sticker_temp_help_msg = state['temp_help_msg']
 
     try:
-        sticker_path = await sticker_maker_main(url=sticker_image_url, temp=sticker_temp_name, text=sticker_text,
-                                                sticker_temp_type=sticker_temp_type)
+        sticker_source = await sticker_maker_main(url=sticker_image_url, temp=sticker_temp_name, text=sticker_text,
+                                                  sticker_temp_type=sticker_temp_type)
 
-        if not sticker_path:
+        if not sticker_source:
             raise Exception('sticker_maker_main return null')
 
-        # 发送base64图片
-        sticker_b64 = await pic_2_base64(sticker_path)
-        sticker_seg = MessageSegment.image(sticker_b64)
-
-        """
-        # 直接用文件构造消息段
-        sticker_seg = MessageSegment.image(f'file:///{sticker_path}')
-        """
+        sticker_seg = MessageSegment.image(sticker_source)
 
         # 发送图片
         await sticker.send(sticker_seg)
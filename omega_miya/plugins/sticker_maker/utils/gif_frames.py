@@ -0,0 +1,86 @@
+"""
+使用预先解码的帧序列渲染动图表情包, 在进程池中执行
+按模板 ass 的时间将字幕直接绘制到各帧上, 无需启动 ffmpeg
+"""
+import re
+from typing import List, Tuple
+from PIL import Image, ImageDraw
+from .resource import DEFAULT_FONT_PATH, load_font, load_gif_frames
+
+
+__ass_tag_pattern = re.compile(r'{[^}]*}')
+
+
+def _ass_time(time: str) -> float:
+    hour, minute, second = time.split(':')
+    return int(hour) * 3600 + int(minute) * 60 + float(second)
+
+
+def parse_ass(ass_text: str) -> Tuple[int, dict, List[Tuple[float, float, str, str]]]:
+    """
+    只解析绘制字幕所需的部分
+    :return: (PlayResX, 样式名 -> 样式字段, [(开始秒数, 结束秒数, 样式名, 文本)])
+    """
+    play_res_x = 384
+    style_format = []
+    styles = {}
+    events = []
+    for line in ass_text.splitlines():
+        line = line.strip()
+        if line.startswith('PlayResX:'):
+            play_res_x = int(line.split(':', maxsplit=1)[1])
+        elif line.startswith('Format:') and not style_format:
+            style_format = [x.strip() for x in line.split(':', maxsplit=1)[1].split(',')]
+        elif line.startswith('Style:'):
+            values = [x.strip() for x in line.split(':', maxsplit=1)[1].split(',')]
+            style = dict(zip(style_format, values))
+            styles[style.get('Name')] = style
+        elif line.startswith('Dialogue:'):
+            split_line = line.split(':', maxsplit=1)[1].split(',', maxsplit=9)
+            text = __ass_tag_pattern.sub('', split_line[9]).replace(r'\N', '\n').replace(r'\n', '\n').strip()
+            events.append((_ass_time(split_line[1]), _ass_time(split_line[2]), split_line[3], text))
+    return play_res_x, styles, events
+
+
+def render_gif_frames(frames_dir: str, ass_text: str, output_path: str, fps: int) -> int:
+    """
+    :param frames_dir: 预先解码的帧序列目录, 帧间隔为 1 / fps 秒
+    :param ass_text: 已填入文本的模板 ass
+    :return: 帧数
+    """
+    frames = load_gif_frames(frames_dir)
+    width = frames[0].width
+    play_res_x, styles, events = parse_ass(ass_text)
+    scale = width / play_res_x
+
+    output_frames = []
+    for index, frame in enumerate(frames):
+        now = index / fps
+        active = [x for x in events if x[0] <= now < x[1] and x[3]]
+        if not active:
+            output_frames.append(frame)
+            continue
+
+        frame = frame.copy()
+        draw = ImageDraw.Draw(frame)
+        for _, _, style_name, text in active:
+            style = styles.get(style_name, {})
+            font = load_font(DEFAULT_FONT_PATH, max(1, round(float(style.get('Fontsize', 20)) * scale)))
+            outline = max(1, round(float(style.get('Outline', 2)) * scale))
+            margin_v = round(int(style.get('MarginV', 10)) * scale)
+            # 底部居中
+            left, top, right, bottom = draw.multiline_textbbox((0, 0), text, font=font, stroke_width=outline,
+                                                               align='center')
+            text_coordinate = ((width - (right - left)) // 2 - left, frame.height - margin_v - bottom)
+            draw.multiline_text(text_coordinate, text, font=font, fill=(255, 255, 255), align='center',
+                                stroke_width=outline, stroke_fill=(0, 0, 0))
+        output_frames.append(frame)
+
+    output_frames[0].save(output_path, format='GIF', save_all=True, append_images=output_frames[1:],
+                          duration=round(1000 / fps), loop=0)
+    return len(output_frames)
+
+
+__all__ = [
+    'render_gif_frames'
+]
@@ -0,0 +1,62 @@
+"""
+静态表情包渲染, 在进程池中执行, 输出为编码后的图片 bytes
+"""
+from io import BytesIO
+from typing import Optional
+from PIL import Image
+from .resource import DEFAULT_FONT_PATH, load_static_template
+from .default_render import stick_maker_temp_default, stick_maker_temp_whitebg, stick_maker_temp_littleangel
+from .static_render import stick_maker_static_traitor, stick_maker_static_jichou
+
+
+def render_sticker(temp: str, sticker_temp_type: str, text: str, image_data: Optional[bytes] = None) -> bytes:
+    """
+    渲染静态表情包
+    :param temp: 模板名称
+    :param sticker_temp_type: 模板类型, default 或 static
+    :param image_data: default 模板使用的原始图片
+    :return: JPEG 图片
+    """
+    # 定义表情包处理函数
+    stick_maker = {
+        'default': stick_maker_temp_default,
+        'whitebg': stick_maker_temp_whitebg,
+        'littleangel': stick_maker_temp_littleangel,
+        'traitor': stick_maker_static_traitor,
+        'jichou': stick_maker_static_jichou
+    }
+
+    # 默认模式
+    if sticker_temp_type == 'default':
+        font_path = DEFAULT_FONT_PATH
+        # 调整图片大小（宽度512像素）
+        with Image.open(BytesIO(image_data)) as origin_image:
+            image_resize_width = 512
+            image_resize_height = 512 * origin_image.height // origin_image.width
+            make_image = origin_image.resize((image_resize_width, image_resize_height))
+
+    # 静态模板模式
+    elif sticker_temp_type == 'static':
+        bg_image, font_path = load_static_template(temp)
+        # 模板可能在背景上直接绘制, 使用副本
+        make_image = bg_image.copy()
+        (image_resize_width, image_resize_height) = make_image.size
+
+    else:
+        raise ValueError(f'Unsupported sticker type: {sticker_temp_type}')
+
+    # 调用模板处理图片
+    make_image = stick_maker[temp](text=text, image_file=make_image, font_path=font_path,
+                                   image_wight=image_resize_width, image_height=image_resize_height)
+
+    # 输出图片
+    if make_image.mode != 'RGB':
+        make_image = make_image.convert('RGB')
+    with BytesIO() as output:
+        make_image.save(output, 'JPEG')
+        return output.getvalue()
+
+
+__all__ = [
+    'render_sticker'
+]
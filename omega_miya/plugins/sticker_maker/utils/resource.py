@@ -0,0 +1,67 @@
+"""
+表情包模板资源缓存
+字体, 静态模板背景及动图模板帧序列在各渲染子进程中按 LRU 缓存
+"""
+import os
+from functools import lru_cache
+from typing import Tuple
+from PIL import Image, ImageFont
+
+
+STATIC_PATH = os.path.join(os.path.dirname(__file__), 'static')
+DEFAULT_FONT_PATH = os.path.join(os.path.dirname(__file__), 'fonts', 'msyhbd.ttc')
+
+
+@lru_cache(maxsize=64)
+def load_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
+    """
+    按字体路径及字号缓存字体, 模板中缩小字号重试时不会重复读取字体文件
+    """
+    return ImageFont.truetype(font_path, size)
+
+
+@lru_cache(maxsize=16)
+def load_static_template(temp: str) -> Tuple[Image.Image, str]:
+    """
+    :return: (已解码的预置背景, 预置字体路径)
+    """
+    static_temp_path = os.path.join(STATIC_PATH, temp)
+
+    # 检查预置背景图
+    bg_image_path = os.path.join(static_temp_path, 'default_bg.png')
+    if not os.path.exists(bg_image_path):
+        raise ValueError('模板预置文件错误, 默认图片应为default_bg.png')
+
+    # 检查预置字体
+    if os.path.exists(os.path.join(static_temp_path, 'default_font.ttc')):
+        font_path = os.path.join(static_temp_path, 'default_font.ttc')
+    elif os.path.exists(os.path.join(static_temp_path, 'default_font.ttf')):
+        font_path = os.path.join(static_temp_path, 'default_font.ttf')
+    else:
+        raise ValueError('模板预置文件错误, 默认字体应为default_font.ttc或default_font.ttf')
+
+    with Image.open(bg_image_path) as bg_image:
+        bg_image.load()
+        return bg_image.copy(), font_path
+
+
+@lru_cache(maxsize=4)
+def load_gif_frames(frames_dir: str) -> Tuple[Image.Image, ...]:
+    """
+    读取预先解码的动图模板帧序列, 帧文件按文件名排序
+    """
+    frames = []
+    for frame_name in sorted(x for x in os.listdir(frames_dir) if x.endswith('.png')):
+        with Image.open(os.path.join(frames_dir, frame_name)) as frame:
+            frames.append(frame.convert('RGB'))
+    if not frames:
+        raise ValueError(f'No frame in {frames_dir}')
+    return tuple(frames)
+
+
+__all__ = [
+    'DEFAULT_FONT_PATH',
+    'load_font',
+    'load_static_template',
+    'load_gif_frames'
+]
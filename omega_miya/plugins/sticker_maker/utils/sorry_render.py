@@ -1,9 +1,32 @@
+"""
+动图表情包渲染
+ffmpeg 以异步子进程执行, 限制并发数及超时时间
+可选的帧序列模式: 帧数较少的模板预先解码为帧序列, 之后在进程池中直接用 PIL 绘制字幕, 无需每次启动 ffmpeg
+帧序列模式不支持 ass 字幕的对齐方式及颜色等样式, 默认关闭, 仅应对已确认渲染效果一致的模板开启
+输出保存在 image_cache 中, 相同模板与文本的并发请求合并为一次渲染, 按 image_cache 的磁盘预算淘汰
+"""
+import asyncio
 import hashlib
 import os
 import re
-from subprocess import Popen, PIPE
+import shutil
+import tempfile
+from typing import Dict, List, Optional
 from jinja2 import Template
-from nonebot import log
+from nonebot import logger, get_driver
+from omega_miya.utils.Omega_Base import Result
+from omega_miya.utils.Omega_plugin_utils import image_cache, process_pool
+from .gif_frames import render_gif_frames
+
+
+global_config = get_driver().config
+
+GIF_STATIC_PATH = os.path.join(os.path.dirname(__file__), 'gif_static')
+# 帧序列保存在缓存目录中, 不写入模板所在的源码目录
+GIF_FRAMES_PATH = os.path.abspath(os.path.join(image_cache.cache_dir, os.path.pardir, 'sticker_maker', 'frames'))
+# 输出动图的帧率及宽度
+GIF_FPS = 8
+GIF_WIDTH = 300
 
 
 def calculate_hash(src):
@@ -12,32 +35,16 @@ def calculate_hash(src):
     return m2.hexdigest()
 
 
-def render_gif(template_name, sentences):
-    filename = template_name + "-" + calculate_hash(sentences) + ".gif"
-    plugin_path = os.path.dirname(__file__)
-    gif_sticker_path = os.path.join(plugin_path, 'gif_sticker')
-    if not os.path.exists(gif_sticker_path):
-        os.mkdir(gif_sticker_path)
-    gif_path = os.path.join(gif_sticker_path, filename)
-    if os.path.exists(gif_path):
-        return gif_path
-    make_gif_with_ffmpeg(template_name, sentences, filename)
-    return gif_path
-
-
 def ass_text(template_name):
-    plugin_path = os.path.dirname(__file__)
-    template_path = os.path.join(plugin_path, 'gif_static', template_name, 'template.tpl')
+    template_path = os.path.join(GIF_STATIC_PATH, template_name, 'template.tpl')
     with open(template_path) as fp:
         content = fp.read()
     return content
 
 
-def render_ass(template_name, sentences, filename):
-    plugin_path = os.path.dirname(__file__)
-    output_file_path = os.path.join(plugin_path, 'gif_sticker', f'{filename}.ass')
-    template = ass_text(template_name)
-    rendered_ass_text = Template(template).render(sentences=sentences)
+def render_ass(template_name, sentences, output_dir):
+    output_file_path = os.path.join(output_dir, 'template.ass')
+    rendered_ass_text = Template(ass_text(template_name)).render(sentences=sentences)
     with open(output_file_path, "w", encoding="utf8") as fp:
         fp.write(rendered_ass_text)
     # 处理路径字符, 否则windows绝对路径直接放到ffmpeg中用会出错,
@@ -47,19 +54,128 @@ def render_ass(template_name, sentences, filename):
     return output_file_path
 
 
-def make_gif_with_ffmpeg(template_name, sentences, filename):
-    ass_path = render_ass(template_name, sentences, filename)
-    plugin_path = os.path.dirname(__file__)
-    gif_path = os.path.join(plugin_path, 'gif_sticker', filename)
-    video_path = os.path.join(plugin_path, 'gif_static', template_name, 'template.mp4')
-    log.logger.debug(ass_path, gif_path, video_path)
+class GifRenderer(object):
+    def __init__(self, max_concurrency: int = 2, timeout: float = 60, frame_mode_max_frames: int = 0):
+        """
+        :param max_concurrency: 同时运行的 ffmpeg 进程数
+        :param timeout: 单个 ffmpeg 进程的超时时间(秒)
+        :param frame_mode_max_frames: 帧数不超过该值的模板使用帧序列模式, 默认为 0 即禁用
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.frame_mode_max_frames = frame_mode_max_frames
+        self.__slots: Optional[asyncio.Semaphore] = None
+        # 模板名 -> 帧序列目录, 不使用帧序列模式的模板为 None
+        self.__frames: Dict[str, Optional[str]] = {}
+        self.__frames_locks: Dict[str, asyncio.Lock] = {}
+
+    async def run_ffmpeg(self, *args: str) -> Result:
+        if self.__slots is None:
+            self.__slots = asyncio.Semaphore(self.max_concurrency)
+        async with self.__slots:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    'ffmpeg', '-hide_banner', '-loglevel', 'error', *args,
+                    stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+            except Exception as e:
+                return Result(error=True, info=f'Start ffmpeg failed: {repr(e)}', result=-1)
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                return Result(error=True, info=f'ffmpeg timeout after {self.timeout}s', result=-1)
+            except asyncio.CancelledError:
+                process.kill()
+                raise
+            if process.returncode != 0:
+                return Result(error=True, info=f'ffmpeg exit with code {process.returncode}: '
+                                               f'{stderr.decode("utf8", errors="replace")[-512:]}', result=-1)
+            return Result(error=False, info='Success', result=0)
+
+    async def __prepare_frames(self, template_name: str) -> Optional[str]:
+        """
+        首次使用时将模板视频解码为帧序列
+        :return: 帧序列目录, 模板帧数过多或解码失败时返回 None
+        """
+        if template_name in self.__frames:
+            return self.__frames[template_name]
+
+        async with self.__frames_locks.setdefault(template_name, asyncio.Lock()):
+            if template_name in self.__frames:
+                return self.__frames[template_name]
+
+            frames_dir = os.path.join(GIF_FRAMES_PATH, template_name)
+            if not os.path.isdir(frames_dir):
+                os.makedirs(GIF_FRAMES_PATH, exist_ok=True)
+                tmp_dir = tempfile.mkdtemp(dir=GIF_FRAMES_PATH)
+                video_path = os.path.join(GIF_STATIC_PATH, template_name, 'template.mp4')
+                _res = await self.run_ffmpeg('-i', video_path, '-r', str(GIF_FPS), '-vf', f'scale={GIF_WIDTH}:-1',
+                                             os.path.join(tmp_dir, '%04d.png'))
+                if not _res.success():
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                    logger.warning(f'Stick_maker: 解码模板 {template_name} 帧序列失败, 使用ffmpeg渲染, {_res.info}')
+                    self.__frames[template_name] = None
+                    return None
+                os.rename(tmp_dir, frames_dir)
+
+            frame_count = len([x for x in os.listdir(frames_dir) if x.endswith('.png')])
+            use_frames = 0 < frame_count <= self.frame_mode_max_frames
+            self.__frames[template_name] = frames_dir if use_frames else None
+            return self.__frames[template_name]
+
+    async def __render_with_frames(self, template_name: str, frames_dir: str, sentences: List[str],
+                                   output_path: str) -> Result:
+        rendered_ass_text = Template(ass_text(template_name)).render(sentences=sentences)
+        _res = await process_pool.run(render_gif_frames, frames_dir, rendered_ass_text, output_path, GIF_FPS,
+                                      name=f'sticker_maker.{template_name}')
+        if not _res.success():
+            return Result(error=True, info=f'Render gif frames failed: {_res.info}', result=-1)
+        return Result(error=False, info='Success', result=0)
+
+    async def __render_with_ffmpeg(self, template_name: str, sentences: List[str], output_path: str) -> Result:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ass_path = render_ass(template_name, sentences, tmp_dir)
+            video_path = os.path.join(GIF_STATIC_PATH, template_name, 'template.mp4')
+            return await self.run_ffmpeg('-i', video_path, '-r', str(GIF_FPS),
+                                         '-vf', f"ass='{ass_path}',scale={GIF_WIDTH}:-1",
+                                         '-f', 'gif', '-y', output_path)
+
+    async def render(self, template_name: str, sentences: List[str]) -> Result:
+        """
+        :return: result 为可直接用于发送的图片来源
+        """
+        async def _render(save_path: str) -> Result:
+            tmp_path = f'{save_path}.{os.getpid()}.tmp'
+            try:
+                frames_dir = None
+                if self.frame_mode_max_frames > 0:
+                    frames_dir = await self.__prepare_frames(template_name)
+                _res = Result(error=True, info='Frame mode disabled', result=-1)
+                if frames_dir is not None:
+                    _res = await self.__render_with_frames(template_name, frames_dir, sentences, tmp_path)
+                    if not _res.success():
+                        logger.warning(f'Stick_maker: 帧序列模式渲染失败, 使用ffmpeg渲染, {_res.info}')
+                if not _res.success():
+                    _res = await self.__render_with_ffmpeg(template_name, sentences, tmp_path)
+                if _res.success():
+                    os.replace(tmp_path, save_path)
+                return _res
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        key = f'sticker_maker_gif:{template_name}-{calculate_hash(sentences)}'
+        return await image_cache.get_source(key=key, downloader=_render)
+
+
+# 全局动图渲染器
+gif_renderer = GifRenderer(
+    max_concurrency=int(getattr(global_config, 'sticker_gif_concurrency', 2)),
+    timeout=float(getattr(global_config, 'sticker_gif_timeout', 60)),
+    frame_mode_max_frames=int(getattr(global_config, 'sticker_gif_frame_mode_max_frames', 0))
+)
 
-    # 使用系统环境ffmpeg执行
-    cmd = f'''ffmpeg -i {video_path} -r 8 -vf "ass='{ass_path}',scale=300:-1" -y {gif_path}'''
 
-    log.logger.debug(cmd)
-    p = Popen(cmd, shell=True, stdout=PIPE, stderr=PIPE)
-    p.wait()
-    if p.returncode != 0:
-        log.logger.error("Error.")
-        return -1
+async def render_gif(template_name, sentences) -> Result:
+    return await gif_renderer.render(template_name=template_name, sentences=sentences)
@@ -1,4 +1,5 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+from .resource import load_font
 from datetime import date
 
 
@@ -9,13 +10,13 @@ def stick_maker_static_traitor(text: str, image_file: bytes, font_path: str, ima
     # 处理文字层 字数部分
     text_num_img = Image.new(mode="RGBA", size=(image_wight, image_height), color=(0, 0, 0, 0))
     font_num_size = 48
-    font_num = ImageFont.truetype(font_path, font_num_size)
+    font_num = load_font(font_path, font_num_size)
     ImageDraw.Draw(text_num_img).text(xy=(0, 0), text=f'{len(text)}/100', font=font_num, fill=(255, 255, 255))
 
     # 处理文字层 主体部分
     text_main_img = Image.new(mode="RGBA", size=(image_wight, image_height), color=(0, 0, 0, 0))
     font_main_size = 54
-    font_main = ImageFont.truetype(font_path, font_main_size)
+    font_main = load_font(font_path, font_main_size)
     # 按长度切分文本
     spl_num = 0
     spl_list = []
@@ -47,7 +48,7 @@ def stick_maker_static_jichou(text: str, image_file: bytes, font_path: str, imag
     # 处理文本主体
     text = f"今天是{date.today().strftime('%Y年%m月%d日')}{text}, 这个仇我先记下了"
     font_main_size = 42
-    font_main = ImageFont.truetype(font_path, font_main_size)
+    font_main = load_font(font_path, font_main_size)
     # 按长度切分文本
     spl_num = 0
     spl_list = []
@@ -60,7 +61,7 @@ def stick_maker_static_jichou(text: str, image_file: bytes, font_path: str, imag
         spl_list.append(text[spl_num:])
     text_main_fin = '\n'.join(spl_list)
 
-    font = ImageFont.truetype(font_path, font_main_size)
+    font = load_font(font_path, font_main_size)
     text_w, text_h = font.getsize_multiline(text_main_fin)
 
     # 处理图片
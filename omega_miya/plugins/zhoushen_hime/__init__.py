@@ -2,13 +2,13 @@
 要求go-cqhttp v0.9.40以上
 """
 import os
-from nonebot import on_notice, export, logger
+from nonebot import on_notice, export, logger, get_driver
 from nonebot.typing import T_State
 from nonebot.adapters.cqhttp.bot import Bot
 from nonebot.adapters.cqhttp.message import MessageSegment, Message
 from nonebot.adapters.cqhttp.event import GroupUploadNoticeEvent
-from omega_miya.utils.Omega_plugin_utils import init_export, has_auth_node
-from .utils import ZhouChecker, download_file
+from omega_miya.utils.Omega_plugin_utils import init_export, has_auth_node, process_pool
+from .utils import check_ass_file, download_file
 
 
 # Custom plugin usage text
@@ -31,6 +31,9 @@ __plugin_auth_node__ = [
 # Init plugin export
 init_export(export(), __plugin_name__, __plugin_usage__, __plugin_auth_node__)
 
+# 单个文件的审轴超时时间(秒)
+CHECK_TIMEOUT = int(getattr(get_driver().config, 'zhoushen_hime_check_timeout', 60))
+
 
 zhouShenHime = on_notice(rule=has_auth_node(__plugin_raw_name__, 'basic'), priority=100, block=False)
 
@@ -67,22 +70,16 @@ async def hime_handle(bot: Bot, event: GroupUploadNoticeEvent, state: T_State):
     msg = f'{at_msg}你刚刚上传了一份轴呢, 让我来帮你看看吧!'
     await zhouShenHime.send(Message(msg))
 
-    checker = ZhouChecker(file_path=download_file_path, flash_mode=True)
-
-    try:
-        init_res = checker.init_file(auto_style=True)
-        if not init_res.success():
-            logger.error(f'初始化时轴文件失败: {init_res.info}')
-            await zhouShenHime.finish('出错了QAQ')
-
-        handle_res = checker.handle()
-        if not handle_res.success():
-            logger.error(f'处理时轴文件失败: {handle_res.info}')
-            await zhouShenHime.finish('出错了QAQ')
-    except Exception as e:
-        logger.error(f'执行ZhouChecker时发生了意外的错误: {repr(e)}')
+    # 在进程池中审轴, 同一群组同时只处理一个文件
+    job_res = await process_pool.run(check_ass_file, download_file_path, flash_mode=True, auto_style=True,
+                                     name='zhoushen_hime', key=event.group_id, timeout=CHECK_TIMEOUT)
+    if not job_res.success():
+        logger.error(f'执行ZhouChecker时发生了意外的错误: {job_res.info}')
+        await zhouShenHime.finish('出错了QAQ')
+    handle_res = job_res.result
+    if not handle_res.success():
+        logger.error(handle_res.info)
         await zhouShenHime.finish('出错了QAQ')
-        return
 
     output_txt_path = os.path.abspath(handle_res.result.get('output_txt_path'))
     output_txt_filename = os.path.basename(output_txt_path)
@@ -0,0 +1,159 @@
+"""
+时轴分析引擎
+时间统一使用整数厘秒(1/100 秒, 即 ass 文件中的最小时间单位)
+按样式分组后将对话行按开始时间排序, 以事件行号倒序扫描一遍, 用线段树维护已扫描行的开始时间区间,
+每行的叠轴/连轴/闪轴判断为 O(log n + k), 结果与逐对比较的结果一致
+"""
+from bisect import bisect_left
+from typing import Dict, Hashable, List, NamedTuple, Tuple
+
+
+# 判断结果类型
+OVERLAP = 'overlap'
+FLASH_CONTINUOUS = 'flash_continuous'
+FLASH_WOULD_OVERLAP = 'flash_would_overlap'
+FLASH_WOULD_FLASH = 'flash_would_flash'
+FLASH_FIXED = 'flash_fixed'
+MULTI_FLASH = 'multi_flash'
+
+
+class TimelineEvent(NamedTuple):
+    is_dialogue: bool
+    start: int
+    end: int
+    style: str
+
+
+class _MinTree(object):
+    """
+    以开始时间排序后的位置为下标, 值为该位置对话行的事件序号, 未插入的位置为 inf
+    """
+    def __init__(self, size: int, inf: int):
+        self.__size = 1
+        while self.__size < max(size, 1):
+            self.__size *= 2
+        self.__inf = inf
+        self.__tree = [inf] * (2 * self.__size)
+
+    def set(self, pos: int, value: int) -> None:
+        pos += self.__size
+        self.__tree[pos] = value
+        pos //= 2
+        while pos:
+            self.__tree[pos] = min(self.__tree[2 * pos], self.__tree[2 * pos + 1])
+            pos //= 2
+
+    def range_min(self, lo: int, hi: int) -> int:
+        result = self.__inf
+        lo += self.__size
+        hi += self.__size
+        while lo < hi:
+            if lo & 1:
+                result = min(result, self.__tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result = min(result, self.__tree[hi])
+            lo //= 2
+            hi //= 2
+        return result
+
+    def collect_less(self, lo: int, hi: int, bound: int) -> List[int]:
+        """
+        :return: 位置在 [lo, hi) 内且值小于 bound 的全部值
+        """
+        result = []
+        stack = [(1, 0, self.__size)]
+        while stack:
+            node, node_lo, node_hi = stack.pop()
+            if node_hi <= lo or node_lo >= hi or self.__tree[node] >= bound:
+                continue
+            if node >= self.__size:
+                result.append(self.__tree[node])
+                continue
+            mid = (node_lo + node_hi) // 2
+            stack.append((2 * node, node_lo, mid))
+            stack.append((2 * node + 1, mid, node_hi))
+        return result
+
+
+def sweep_timeline(events: List[TimelineEvent], single_threshold: int, multi_threshold: int,
+                   style_mode: bool) -> List[List[Tuple[str, int, int]]]:
+    """
+    :param events: 按事件行顺序排列的全部 event 行(含注释行)
+    :param single_threshold: 单行闪轴判断阈值, 单位毫秒
+    :param multi_threshold: 多行闪轴判断阈值, 单位毫秒
+    :param style_mode: 是否只比较样式相同的行
+    :return: 每行的判断结果列表, 元素为 (结果类型, 相关行序号, 建议延长的结束时间厘秒数)
+        单行闪轴只与其后第一行比较; 其余对话行记录其后所有与之叠轴的行,
+        直到遇到与之连轴或间隔小于 multi_threshold 的行为止
+    """
+    count = len(events)
+    findings: List[List[Tuple[str, int, int]]] = [[] for _ in range(count)]
+    groups: Dict[Hashable, List[int]] = {}
+    for index, event in enumerate(events):
+        groups.setdefault(event.style if style_mode else None, []).append(index)
+
+    # 开始时间落在 [结束时间, 结束时间 + multi_window) 内的行与该行连轴或为轴间闪轴
+    multi_window = max(1, -(-multi_threshold // 10))
+    for indexes in groups.values():
+        order = sorted((x for x in indexes if events[x].is_dialogue), key=lambda x: events[x].start)
+        starts = [events[x].start for x in order]
+        position = {index: pos for pos, index in enumerate(order)}
+        tree = _MinTree(size=len(order), inf=count)
+        next_index = None
+        for index in reversed(indexes):
+            event = events[index]
+            if event.is_dialogue:
+                if (event.end - event.start) * 10 < single_threshold:
+                    if next_index is not None:
+                        findings[index] = _single_flash_findings(
+                            event=event, next_index=next_index, next_event=events[next_index],
+                            single_threshold=single_threshold, multi_threshold=multi_threshold)
+                else:
+                    lo = bisect_left(starts, event.end)
+                    hi = bisect_left(starts, event.end + multi_window, lo)
+                    break_index = tree.range_min(lo, hi)
+                    overlaps = sorted(tree.collect_less(0, lo, break_index))
+                    event_findings = [(OVERLAP, x, 0) for x in overlaps]
+                    if break_index < count and events[break_index].start > event.end:
+                        event_findings.append((MULTI_FLASH, break_index, events[break_index].start - event.end))
+                    findings[index] = event_findings
+                tree.set(position[index], index)
+            next_index = index
+    return findings
+
+
+def _single_flash_findings(event: TimelineEvent, next_index: int, next_event: TimelineEvent,
+                           single_threshold: int, multi_threshold: int) -> List[Tuple[str, int, int]]:
+    # 补足单行闪轴所需的时间, 单位毫秒
+    single_diff = single_threshold - (event.end - event.start) * 10
+    if not next_event.is_dialogue:
+        # 后一行为注释行时只比较先后
+        if event.end < next_event.start:
+            return [(FLASH_WOULD_OVERLAP, next_index, 0)]
+        return [(FLASH_FIXED, next_index, single_diff // 10)]
+
+    gap = next_event.start - event.end
+    findings = [(OVERLAP, next_index, 0)] if gap < 0 else []
+    if gap == 0:
+        findings.append((FLASH_CONTINUOUS, next_index, 0))
+    elif gap > 0 and single_diff > gap * 10:
+        findings.append((FLASH_WOULD_OVERLAP, next_index, gap))
+    elif gap > 0 and single_diff > gap * 10 - multi_threshold:
+        findings.append((FLASH_WOULD_FLASH, next_index, gap))
+    else:
+        findings.append((FLASH_FIXED, next_index, single_diff // 10))
+    return findings
+
+
+__all__ = [
+    'OVERLAP',
+    'FLASH_CONTINUOUS',
+    'FLASH_WOULD_OVERLAP',
+    'FLASH_WOULD_FLASH',
+    'FLASH_FIXED',
+    'MULTI_FLASH',
+    'TimelineEvent',
+    'sweep_timeline'
+]
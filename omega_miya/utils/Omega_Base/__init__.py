@@ -9,6 +9,8 @@ from .model import \
     DBPixivillust, DBPixivtag, DBPixivision, \
     DBEmail, DBEmailBox, DBHistory, DBAuth, DBCoolDownEvent
 from .database import DBResult as Result
+from .cache import permission_cache
+from .pixiv_index import pixiv_illust_index
 
 
 __all__ = [
@@ -26,5 +28,7 @@ __all__ = [
     'DBHistory',
     'DBAuth',
     'DBCoolDownEvent',
-    'Result'
+    'Result',
+    'permission_cache',
+    'pixiv_illust_index'
 ]
@@ -0,0 +1,120 @@
+"""
+进程内权限缓存
+缓存群组权限及授权节点的查询结果, 由 DBGroup / DBAuth 的写操作负责失效
+"""
+import time
+import nonebot
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+global_config = nonebot.get_driver().config
+# 缓存有效时间(秒), 写操作会主动失效, ttl 仅作为兜底
+__PERMISSION_CACHE_TTL = int(getattr(global_config, 'permission_cache_ttl', 300))
+# 最多缓存的 (type, id) 数量, 超出时淘汰最久未使用的
+__PERMISSION_CACHE_MAX_SIZE = int(getattr(global_config, 'permission_cache_max_size', 4096))
+
+
+class PermissionCache(object):
+    """
+    以 (type, id, node) 为键的带过期时间缓存
+    按 (type, id) 分桶存储, 以便一次性失效某个用户或群组的全部节点
+    分桶按 LRU 淘汰, 写入时每隔 ttl 秒清理一次全部过期项, 不再访问的用户或群组不会长期占用内存
+    """
+    def __init__(self, ttl: int, max_size: int = 4096):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.__buckets: Dict[Tuple[str, int], Dict[Hashable, Tuple[float, Any]]] = OrderedDict()
+        self.__swept_at = time.monotonic()
+        self.__hits = 0
+        self.__misses = 0
+
+    def get(self, cache_type: str, cache_id: int, node: Hashable) -> Tuple[bool, Any]:
+        """
+        :return: (是否命中, 缓存值)
+        """
+        bucket = self.__buckets.get((cache_type, cache_id))
+        if bucket is not None:
+            self.__buckets.move_to_end((cache_type, cache_id))
+            item = bucket.get(node)
+            if item is not None:
+                expire_at, value = item
+                if expire_at > time.monotonic():
+                    self.__hits += 1
+                    return True, value
+                del bucket[node]
+        self.__misses += 1
+        return False, None
+
+    def set(self, cache_type: str, cache_id: int, node: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        if now - self.__swept_at >= self.ttl:
+            self.sweep()
+        bucket = self.__buckets.setdefault((cache_type, cache_id), {})
+        self.__buckets.move_to_end((cache_type, cache_id))
+        bucket[node] = (now + self.ttl, value)
+        while len(self.__buckets) > self.max_size:
+            self.__buckets.popitem(last=False)
+
+    def sweep(self) -> int:
+        """
+        清理全部过期项及空分桶
+        :return: 清理的项数
+        """
+        now = time.monotonic()
+        self.__swept_at = now
+        removed = 0
+        for key in list(self.__buckets.keys()):
+            bucket = self.__buckets[key]
+            expired = [node for node, (expire_at, _) in bucket.items() if expire_at <= now]
+            for node in expired:
+                del bucket[node]
+            removed += len(expired)
+            if not bucket:
+                del self.__buckets[key]
+        return removed
+
+    def invalidate(self, cache_type: str, cache_id: int, node: Hashable = None) -> None:
+        """
+        :param node: 为 None 时失效该 (type, id) 下的全部节点
+        """
+        if node is None:
+            self.__buckets.pop((cache_type, cache_id), None)
+        else:
+            bucket = self.__buckets.get((cache_type, cache_id))
+            if bucket is not None:
+                bucket.pop(node, None)
+                if not bucket:
+                    del self.__buckets[(cache_type, cache_id)]
+
+    def clear(self) -> None:
+        self.__buckets.clear()
+
+    @property
+    def hits(self) -> int:
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        return self.__misses
+
+    def stats(self) -> dict:
+        total = self.__hits + self.__misses
+        return {
+            'hits': self.__hits,
+            'misses': self.__misses,
+            'hit_rate': self.__hits / total if total else 0.0,
+            'size': sum(len(x) for x in self.__buckets.values()),
+            'buckets': len(self.__buckets)
+        }
+
+
+# 全局权限缓存
+# 群组权限: ('group_permission', group_id, 'info') -> {'notice': int, 'command': int, 'level': int}
+# 授权节点: ('user' | 'group', auth_id, auth_node) -> (allow_tag, deny_tag)
+permission_cache = PermissionCache(ttl=__PERMISSION_CACHE_TTL, max_size=__PERMISSION_CACHE_MAX_SIZE)
+
+
+__all__ = [
+    'PermissionCache',
+    'permission_cache'
+]
@@ -2,6 +2,7 @@ import nonebot
 from typing import Union
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from .tables import *
 
 global_config = nonebot.get_driver().config
@@ -9,14 +10,23 @@ global_config = nonebot.get_driver().config
 __DATABASE = 'mysql'
 # __DB_DRIVER = global_config.db_driver
 __DB_DRIVER = 'mysqldb'
+# 异步引擎使用的驱动
+__DB_ASYNC_DRIVER = 'aiomysql'
 __DB_USER = global_config.db_user
 __DB_PASSWORD = global_config.db_password
 __DB_HOST = global_config.db_host
 __DB_PORT = global_config.db_port
 __DB_NAME = global_config.db_name
 
+# 异步连接池配置(可选), 连接池有界, 超出 pool_size + max_overflow 的请求将排队等待
+__DB_POOL_SIZE = int(getattr(global_config, 'db_pool_size', 10))
+__DB_MAX_OVERFLOW = int(getattr(global_config, 'db_max_overflow', 5))
+__DB_POOL_TIMEOUT = int(getattr(global_config, 'db_pool_timeout', 30))
+
 # 格式化数据库引擎链接
 __DB_ENGINE = f'{__DATABASE}+{__DB_DRIVER}://{__DB_USER}:{__DB_PASSWORD}@{__DB_HOST}:{__DB_PORT}/{__DB_NAME}'
+__DB_ASYNC_ENGINE = \
+    f'{__DATABASE}+{__DB_ASYNC_DRIVER}://{__DB_USER}:{__DB_PASSWORD}@{__DB_HOST}:{__DB_PORT}/{__DB_NAME}'
 
 try:
     # 持久化数据库连接
@@ -26,6 +36,13 @@ try:
     # 初始化数据库结构
     Base.metadata.create_all(engine)
 
+    # 异步数据库引擎, 供事件循环中的高频操作使用
+    async_engine = create_async_engine(__DB_ASYNC_ENGINE, encoding='utf8',
+                                       connect_args={"use_unicode": True, "charset": "utf8mb4"},
+                                       pool_size=__DB_POOL_SIZE, max_overflow=__DB_MAX_OVERFLOW,
+                                       pool_timeout=__DB_POOL_TIMEOUT, pool_recycle=3600, pool_pre_ping=True)
+    async_session_maker = sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
 except Exception as e:
     import sys
     nonebot.logger.critical(f'数据库连接失败, error: {repr(e)}')
@@ -72,6 +89,17 @@ class NBdb(object):
         """
         return self.__session
 
+    @staticmethod
+    def get_async_session() -> AsyncSession:
+        # 创建异步DBSession对象, 连接从有界连接池中获取
+        # 使用方法: async with NBdb.get_async_session() as session: ...
+        return async_session_maker()
+
+    @staticmethod
+    async def dispose_async_engine() -> None:
+        # 释放异步连接池, 由 Omega_runtime 插件在关闭时调用
+        await async_engine.dispose()
+
 
 class DBResult(object):
     def __init__(self, error: bool, info: str, result: Union[int, str, list, set, dict]):
@@ -1,8 +1,12 @@
 from omega_miya.utils.Omega_Base.database import NBdb, DBResult
+from omega_miya.utils.Omega_Base.cache import permission_cache
 from omega_miya.utils.Omega_Base.tables import AuthUser, AuthGroup, User, Group
 from .user import DBUser
 from .group import DBGroup
+from typing import Dict, Iterable, Tuple
 from datetime import datetime
+from sqlalchemy import literal, union_all
+from sqlalchemy.future import select
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 
@@ -64,6 +68,7 @@ class DBAuth(object):
                 auth.auth_info = auth_info
                 auth.updated_at = datetime.now()
                 session.commit()
+                permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
                 result = DBResult(error=False, info='Success upgraded', result=0)
             elif self.auth_type == 'group':
                 auth = session.query(AuthGroup).join(Group). \
@@ -75,6 +80,7 @@ class DBAuth(object):
                 auth.auth_info = auth_info
                 auth.updated_at = datetime.now()
                 session.commit()
+                permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
                 result = DBResult(error=False, info='Success upgraded', result=0)
             else:
                 result = DBResult(error=True, info='Auth type error', result=-1)
@@ -90,6 +96,7 @@ class DBAuth(object):
                                         deny_tag=deny_tag, auth_info=auth_info, created_at=datetime.now())
                         session.add(auth)
                         session.commit()
+                        permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
                         result = DBResult(error=False, info='Success set', result=0)
                 elif self.auth_type == 'group':
                     group = DBGroup(group_id=self.auth_id)
@@ -100,6 +107,7 @@ class DBAuth(object):
                                          deny_tag=deny_tag, auth_info=auth_info, created_at=datetime.now())
                         session.add(auth)
                         session.commit()
+                        permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
                         result = DBResult(error=False, info='Success set', result=0)
                 else:
                     result = DBResult(error=True, info='Auth type error', result=-1)
@@ -169,6 +177,37 @@ class DBAuth(object):
             session.close()
         return result
 
+    def resolve(self) -> DBResult:
+        """
+        一次查询同时获取授权标签和拒绝标签
+        :return: result = (allow_tag, deny_tag), 节点不存在时 info 为 NoResultFound, result 为 (-2, -2)
+        """
+        session = NBdb().get_session()
+        try:
+            if self.auth_type == 'user':
+                allow_tag, deny_tag = session.query(AuthUser.allow_tag, AuthUser.deny_tag).join(User). \
+                    filter(AuthUser.user_id == User.id). \
+                    filter(User.qq == self.auth_id). \
+                    filter(AuthUser.auth_node == self.auth_node).one()
+                result = DBResult(error=False, info='Success', result=(allow_tag, deny_tag))
+            elif self.auth_type == 'group':
+                allow_tag, deny_tag = session.query(AuthGroup.allow_tag, AuthGroup.deny_tag).join(Group). \
+                    filter(AuthGroup.group_id == Group.id). \
+                    filter(Group.group_id == self.auth_id). \
+                    filter(AuthGroup.auth_node == self.auth_node).one()
+                result = DBResult(error=False, info='Success', result=(allow_tag, deny_tag))
+            else:
+                result = DBResult(error=True, info='Auth type error', result=(-1, -1))
+        except NoResultFound:
+            result = DBResult(error=True, info='NoResultFound', result=(-2, -2))
+        except MultipleResultsFound:
+            result = DBResult(error=True, info='MultipleResultsFound', result=(-1, -1))
+        except Exception as e:
+            result = DBResult(error=True, info=repr(e), result=(-1, -1))
+        finally:
+            session.close()
+        return result
+
     def delete(self) -> DBResult:
         session = NBdb().get_session()
         try:
@@ -179,6 +218,7 @@ class DBAuth(object):
                     filter(AuthUser.auth_node == self.auth_node).one()
                 session.delete(auth)
                 session.commit()
+                permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
                 result = DBResult(error=False, info='Success', result=0)
             elif self.auth_type == 'group':
                 auth = session.query(AuthGroup).join(Group). \
@@ -187,6 +227,7 @@ class DBAuth(object):
                     filter(AuthGroup.auth_node == self.auth_node).one()
                 session.delete(auth)
                 session.commit()
+                permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
                 result = DBResult(error=False, info='Success', result=0)
             else:
                 result = DBResult(error=True, info='Auth type error', result=-1)
@@ -228,3 +269,299 @@ class DBAuth(object):
         finally:
             session.close()
         return result
+
+    def __async_select(self, *entities):
+        """
+        :return: 根据授权类型构造查询该授权节点的异步查询语句, 授权类型错误时返回 None
+        """
+        if self.auth_type == 'user':
+            return select(*entities).join(User). \
+                where(AuthUser.user_id == User.id). \
+                where(User.qq == self.auth_id). \
+                where(AuthUser.auth_node == self.auth_node)
+        elif self.auth_type == 'group':
+            return select(*entities).join(Group). \
+                where(AuthGroup.group_id == Group.id). \
+                where(Group.group_id == self.auth_id). \
+                where(AuthGroup.auth_node == self.auth_node)
+        else:
+            return None
+
+    def __auth_table(self):
+        if self.auth_type == 'user':
+            return AuthUser
+        elif self.auth_type == 'group':
+            return AuthGroup
+        else:
+            return None
+
+    async def async_id(self) -> DBResult:
+        auth_table = self.__auth_table()
+        if auth_table is None:
+            return DBResult(error=True, info='Auth type error', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(self.__async_select(auth_table.id))
+                auth_table_id = session_result.one()[0]
+                result = DBResult(error=False, info='Success', result=auth_table_id)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_exist(self) -> bool:
+        result = (await self.async_id()).success()
+        return result
+
+    async def async_set(self, allow_tag: int, deny_tag: int, auth_info: str = None) -> DBResult:
+        auth_table = self.__auth_table()
+        if auth_table is None:
+            return DBResult(error=True, info='Auth type error', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                # 已存在则更新
+                session_result = await session.execute(self.__async_select(auth_table))
+                auth = session_result.scalar_one()
+                auth.allow_tag = allow_tag
+                auth.deny_tag = deny_tag
+                auth.auth_info = auth_info
+                auth.updated_at = datetime.now()
+                await session.commit()
+                permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
+                result = DBResult(error=False, info='Success upgraded', result=0)
+            except NoResultFound:
+                try:
+                    # 不存在则添加信息
+                    if self.auth_type == 'user':
+                        session_result = await session.execute(select(User.id).where(User.qq == self.auth_id))
+                        user_table_id = session_result.scalar_one_or_none()
+                        if user_table_id is None:
+                            result = DBResult(error=True, info='User not exist', result=-1)
+                        else:
+                            auth = AuthUser(user_id=user_table_id, auth_node=self.auth_node, allow_tag=allow_tag,
+                                            deny_tag=deny_tag, auth_info=auth_info, created_at=datetime.now())
+                            session.add(auth)
+                            await session.commit()
+                            permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
+                            result = DBResult(error=False, info='Success set', result=0)
+                    else:
+                        session_result = await session.execute(select(Group.id).where(Group.group_id == self.auth_id))
+                        group_table_id = session_result.scalar_one_or_none()
+                        if group_table_id is None:
+                            result = DBResult(error=True, info='Group not exist', result=-1)
+                        else:
+                            auth = AuthGroup(group_id=group_table_id, auth_node=self.auth_node, allow_tag=allow_tag,
+                                             deny_tag=deny_tag, auth_info=auth_info, created_at=datetime.now())
+                            session.add(auth)
+                            await session.commit()
+                            permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
+                            result = DBResult(error=False, info='Success set', result=0)
+                except Exception as e:
+                    await session.rollback()
+                    result = DBResult(error=True, info=repr(e), result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_allow_tag(self) -> DBResult:
+        auth_table = self.__auth_table()
+        if auth_table is None:
+            return DBResult(error=True, info='Auth type error', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(self.__async_select(auth_table.allow_tag))
+                allow_tag = session_result.one()[0]
+                result = DBResult(error=False, info='Success', result=allow_tag)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=-2)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_deny_tag(self) -> DBResult:
+        auth_table = self.__auth_table()
+        if auth_table is None:
+            return DBResult(error=True, info='Auth type error', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(self.__async_select(auth_table.deny_tag))
+                deny_tag = session_result.one()[0]
+                result = DBResult(error=False, info='Success', result=deny_tag)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=-2)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_resolve(self) -> DBResult:
+        """
+        一次查询同时获取授权标签和拒绝标签
+        :return: result = (allow_tag, deny_tag), 节点不存在时 info 为 NoResultFound, result 为 (-2, -2)
+        """
+        auth_table = self.__auth_table()
+        if auth_table is None:
+            return DBResult(error=True, info='Auth type error', result=(-1, -1))
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    self.__async_select(auth_table.allow_tag, auth_table.deny_tag))
+                allow_tag, deny_tag = session_result.one()
+                result = DBResult(error=False, info='Success', result=(allow_tag, deny_tag))
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=(-2, -2))
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=(-1, -1))
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=(-1, -1))
+        return result
+
+    async def async_delete(self) -> DBResult:
+        auth_table = self.__auth_table()
+        if auth_table is None:
+            return DBResult(error=True, info='Auth type error', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(self.__async_select(auth_table))
+                auth = session_result.scalar_one()
+                await session.delete(auth)
+                await session.commit()
+                permission_cache.invalidate(self.auth_type, self.auth_id, self.auth_node)
+                result = DBResult(error=False, info='Success', result=0)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    @classmethod
+    async def async_list(cls, auth_type: str, auth_id: int) -> DBResult:
+        if auth_type == 'user':
+            stmt = select(AuthUser.auth_node, AuthUser.allow_tag, AuthUser.deny_tag). \
+                join(User). \
+                where(AuthUser.user_id == User.id). \
+                where(User.qq == auth_id)
+        elif auth_type == 'group':
+            stmt = select(AuthGroup.auth_node, AuthGroup.allow_tag, AuthGroup.deny_tag). \
+                join(Group). \
+                where(AuthGroup.group_id == Group.id). \
+                where(Group.group_id == auth_id)
+        else:
+            return DBResult(error=True, info='Auth type error', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(stmt)
+                auth_node_list = session_result.all()
+                result = DBResult(error=False, info='Success', result=auth_node_list)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_cached_tags(self) -> DBResult:
+        """
+        带进程内缓存的授权查询
+        :return: result = (allow_tag, deny_tag), 节点不存在时为 (-2, -2)
+        """
+        hit, result = permission_cache.get(self.auth_type, self.auth_id, self.auth_node)
+        if hit:
+            return result
+        result = await self.async_resolve()
+        if result.success() or result.info == 'NoResultFound':
+            permission_cache.set(self.auth_type, self.auth_id, self.auth_node, result)
+        return result
+
+    @classmethod
+    async def async_resolve_bulk(cls, subjects: Iterable[Tuple[str, int]], auth_nodes: Iterable[str]) -> DBResult:
+        """
+        一次查询获取多个用户/群组在多个授权节点上的授权情况
+        :param subjects: (auth_type, auth_id) 序列, auth_type 为 user 或 group
+        :param auth_nodes: 授权节点序列
+        :return: result = {(auth_type, auth_id, auth_node): (allow_tag, deny_tag)}, 不存在的节点为 (-2, -2)
+        """
+        auth_nodes = list(set(auth_nodes))
+        user_ids = list(set(auth_id for auth_type, auth_id in subjects if auth_type == 'user' and auth_id))
+        group_ids = list(set(auth_id for auth_type, auth_id in subjects if auth_type == 'group' and auth_id))
+        res: Dict[Tuple[str, int, str], Tuple[int, int]] = {}
+        for auth_node in auth_nodes:
+            res.update({('user', user_id, auth_node): (-2, -2) for user_id in user_ids})
+            res.update({('group', group_id, auth_node): (-2, -2) for group_id in group_ids})
+        if not res:
+            return DBResult(error=False, info='Success', result=res)
+
+        stmts = []
+        if user_ids:
+            stmts.append(
+                select(literal('user'), User.qq, AuthUser.auth_node, AuthUser.allow_tag, AuthUser.deny_tag).
+                select_from(AuthUser).
+                join(User, AuthUser.user_id == User.id).
+                where(User.qq.in_(user_ids)).
+                where(AuthUser.auth_node.in_(auth_nodes))
+            )
+        if group_ids:
+            stmts.append(
+                select(literal('group'), Group.group_id, AuthGroup.auth_node, AuthGroup.allow_tag, AuthGroup.deny_tag).
+                select_from(AuthGroup).
+                join(Group, AuthGroup.group_id == Group.id).
+                where(Group.group_id.in_(group_ids)).
+                where(AuthGroup.auth_node.in_(auth_nodes))
+            )
+        stmt = stmts[0] if len(stmts) == 1 else union_all(*stmts)
+
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(stmt)
+                for auth_type, auth_id, auth_node, allow_tag, deny_tag in session_result.all():
+                    res[(auth_type, auth_id, auth_node)] = (allow_tag, deny_tag)
+                result = DBResult(error=False, info='Success', result=res)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result={})
+        return result
+
+    @classmethod
+    async def async_cached_resolve_bulk(
+            cls, subjects: Iterable[Tuple[str, int]], auth_nodes: Iterable[str]) -> DBResult:
+        """
+        带进程内缓存的批量授权查询, 仅对未命中缓存的部分发起一次查询
+        :return: 同 async_resolve_bulk
+        """
+        subjects = list(subjects)
+        auth_nodes = list(auth_nodes)
+        res: Dict[Tuple[str, int, str], Tuple[int, int]] = {}
+        miss_subjects = set()
+        miss_nodes = set()
+        for auth_type, auth_id in subjects:
+            if not auth_id:
+                continue
+            for auth_node in auth_nodes:
+                hit, cached = permission_cache.get(auth_type, auth_id, auth_node)
+                if hit:
+                    res[(auth_type, auth_id, auth_node)] = cached.result
+                else:
+                    miss_subjects.add((auth_type, auth_id))
+                    miss_nodes.add(auth_node)
+        if not miss_subjects:
+            return DBResult(error=False, info='Success', result=res)
+
+        bulk_result = await cls.async_resolve_bulk(subjects=miss_subjects, auth_nodes=miss_nodes)
+        if not bulk_result.success():
+            return bulk_result
+        for (auth_type, auth_id, auth_node), tags in bulk_result.result.items():
+            if tags == (-2, -2):
+                item = DBResult(error=True, info='NoResultFound', result=tags)
+            else:
+                item = DBResult(error=False, info='Success', result=tags)
+            permission_cache.set(auth_type, auth_id, auth_node, item)
+            res[(auth_type, auth_id, auth_node)] = tags
+        return DBResult(error=False, info='Success', result=res)
@@ -1,6 +1,8 @@
 from omega_miya.utils.Omega_Base.database import NBdb, DBResult
 from omega_miya.utils.Omega_Base.tables import Bilidynamic
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.future import select
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 
@@ -59,3 +61,19 @@ class DBDynamic(object):
         finally:
             session.close()
         return result
+
+    @classmethod
+    async def async_latest_dynamic_ids(cls) -> DBResult:
+        """
+        :return: result = {uid: 该用户最新的 dynamic_id}, 单次聚合查询, 不加载历史动态
+        """
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Bilidynamic.uid, func.max(Bilidynamic.dynamic_id)).group_by(Bilidynamic.uid)
+                )
+                res = {int(uid): int(dynamic_id) for uid, dynamic_id in session_result.all()}
+                result = DBResult(error=False, info='Success', result=res)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result={})
+        return result
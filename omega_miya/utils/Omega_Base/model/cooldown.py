@@ -1,6 +1,8 @@
 from omega_miya.utils.Omega_Base.database import NBdb, DBResult
 from omega_miya.utils.Omega_Base.tables import CoolDownEvent
 from datetime import datetime
+from sqlalchemy.future import select
+from sqlalchemy import delete
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 
@@ -223,3 +225,100 @@ class DBCoolDownEvent(object):
             except Exception:
                 session.rollback()
                 continue
+
+    @classmethod
+    def __event_select(cls, event_type: str, plugin: str = None, group_id: int = None, user_id: int = None):
+        stmt = select(CoolDownEvent).where(CoolDownEvent.event_type == event_type)
+        if event_type in ['plugin', 'group', 'user']:
+            stmt = stmt.where(CoolDownEvent.plugin == plugin)
+        if event_type == 'group':
+            stmt = stmt.where(CoolDownEvent.group_id == group_id)
+        if event_type == 'user':
+            stmt = stmt.where(CoolDownEvent.user_id == user_id)
+        return stmt
+
+    @classmethod
+    async def __async_add_event(
+            cls, event_type: str, stop_at: datetime, description: str = None,
+            plugin: str = None, group_id: int = None, user_id: int = None) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(cls.__event_select(
+                    event_type=event_type, plugin=plugin, group_id=group_id, user_id=user_id))
+                exist_event = session_result.scalar_one()
+                exist_event.stop_at = stop_at
+                exist_event.description = description
+                exist_event.updated_at = datetime.now()
+                await session.commit()
+                result = DBResult(error=False, info='Success upgraded', result=0)
+            except NoResultFound:
+                try:
+                    new_event = CoolDownEvent(
+                        event_type=event_type, plugin=plugin, group_id=group_id, user_id=user_id,
+                        stop_at=stop_at, description=description, created_at=datetime.now())
+                    session.add(new_event)
+                    await session.commit()
+                    result = DBResult(error=False, info='Success added', result=0)
+                except Exception as e:
+                    await session.rollback()
+                    result = DBResult(error=True, info=repr(e), result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    @classmethod
+    async def async_add_global_cool_down_event(cls, stop_at: datetime, description: str = None) -> DBResult:
+        return await cls.__async_add_event(event_type='global', stop_at=stop_at, description=description)
+
+    @classmethod
+    async def async_add_plugin_cool_down_event(
+            cls, plugin: str, stop_at: datetime, description: str = None) -> DBResult:
+        return await cls.__async_add_event(
+            event_type='plugin', plugin=plugin, stop_at=stop_at, description=description)
+
+    @classmethod
+    async def async_add_group_cool_down_event(
+            cls, plugin: str, group_id: int, stop_at: datetime, description: str = None) -> DBResult:
+        return await cls.__async_add_event(
+            event_type='group', plugin=plugin, group_id=group_id, stop_at=stop_at, description=description)
+
+    @classmethod
+    async def async_add_user_cool_down_event(
+            cls, plugin: str, user_id: int, stop_at: datetime, description: str = None) -> DBResult:
+        return await cls.__async_add_event(
+            event_type='user', plugin=plugin, user_id=user_id, stop_at=stop_at, description=description)
+
+    @classmethod
+    async def async_clear_time_out_event(cls) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                # 单条语句清理全部过期事件
+                session_result = await session.execute(
+                    delete(CoolDownEvent).where(CoolDownEvent.stop_at <= datetime.now()))
+                await session.commit()
+                result = DBResult(error=False, info='Success', result=session_result.rowcount)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    @classmethod
+    async def async_list_active_events(cls) -> DBResult:
+        """
+        :return: result = [(event_type, plugin, group_id, user_id, stop_at)], 仅包含未过期的事件
+        """
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(CoolDownEvent.event_type, CoolDownEvent.plugin, CoolDownEvent.group_id,
+                           CoolDownEvent.user_id, CoolDownEvent.stop_at).
+                    where(CoolDownEvent.stop_at > datetime.now())
+                )
+                res = [tuple(x) for x in session_result.all()]
+                result = DBResult(error=False, info='Success', result=res)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=[])
+        return result
@@ -1,9 +1,11 @@
 from omega_miya.utils.Omega_Base.database import NBdb, DBResult
+from omega_miya.utils.Omega_Base.cache import permission_cache
 from omega_miya.utils.Omega_Base.tables import User, Group, UserGroup, Vocation, Skill, UserSkill, Subscription, GroupSub, EmailBox, GroupEmailBox
 from .user import DBUser, DBSkill
 from .subscription import DBSubscription
 from .mail import DBEmailBox
 from datetime import datetime
+from sqlalchemy.future import select
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 
@@ -61,6 +63,7 @@ class DBGroup(object):
                                   command_permissions=0, permission_level=0, created_at=datetime.now())
                 session.add(new_group)
                 session.commit()
+                permission_cache.invalidate('group_permission', self.group_id)
                 result = DBResult(error=False, info='Success added', result=0)
             except Exception as e:
                 session.rollback()
@@ -84,6 +87,8 @@ class DBGroup(object):
             exist_group = session.query(Group).filter(Group.group_id == self.group_id).one()
             session.delete(exist_group)
             session.commit()
+            permission_cache.invalidate('group_permission', self.group_id)
+            permission_cache.invalidate('group', self.group_id)
             result = DBResult(error=False, info='Success', result=0)
         except NoResultFound:
             result = DBResult(error=True, info='NoResultFound', result=-1)
@@ -198,6 +203,7 @@ class DBGroup(object):
             exist_group.permission_level = 0
             exist_group.updated_at = datetime.now()
             session.commit()
+            permission_cache.invalidate('group_permission', self.group_id)
             result = DBResult(error=False, info='Success', result=0)
         except NoResultFound:
             result = DBResult(error=True, info='NoResultFound', result=-1)
@@ -220,6 +226,7 @@ class DBGroup(object):
             exist_group.permission_level = level
             exist_group.updated_at = datetime.now()
             session.commit()
+            permission_cache.invalidate('group_permission', self.group_id)
             result = DBResult(error=False, info='Success', result=0)
         except NoResultFound:
             result = DBResult(error=True, info='NoResultFound', result=-1)
@@ -585,3 +592,299 @@ class DBGroup(object):
         else:
             result = DBResult(error=True, info='Group or mailbox not exist', result=-1)
         return result
+
+    async def async_id(self) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(select(Group.id).where(Group.group_id == self.group_id))
+                group_table_id = session_result.one()[0]
+                result = DBResult(error=False, info='Success', result=group_table_id)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_exist(self) -> bool:
+        result = (await self.async_id()).success()
+        return result
+
+    async def async_name(self) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(select(Group.name).where(Group.group_id == self.group_id))
+                group_name = session_result.one()[0]
+                result = DBResult(error=False, info='Success', result=group_name)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result='')
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result='')
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result='')
+        return result
+
+    async def async_add(self, name: str) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                # qq群已存在则更新群名称
+                session_result = await session.execute(select(Group).where(Group.group_id == self.group_id))
+                exist_group = session_result.scalar_one()
+                exist_group.name = name
+                exist_group.updated_at = datetime.now()
+                await session.commit()
+                result = DBResult(error=False, info='Success upgraded', result=0)
+            except NoResultFound:
+                # 不存在则添加新群组
+                try:
+                    new_group = Group(group_id=self.group_id, name=name, notice_permissions=0,
+                                      command_permissions=0, permission_level=0, created_at=datetime.now())
+                    session.add(new_group)
+                    await session.commit()
+                    permission_cache.invalidate('group_permission', self.group_id)
+                    result = DBResult(error=False, info='Success added', result=0)
+                except Exception as e:
+                    await session.rollback()
+                    result = DBResult(error=True, info=repr(e), result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_member_list(self) -> DBResult:
+        group_id_result = await self.async_id()
+        if not group_id_result.success():
+            return DBResult(error=True, info='Group not exist', result=[])
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(User.qq, UserGroup.user_group_nickname).join(UserGroup).
+                    where(User.id == UserGroup.user_id).
+                    where(UserGroup.group_id == group_id_result.result)
+                )
+                res = [tuple(x) for x in session_result.all()]
+                result = DBResult(error=False, info='Success', result=res)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=[])
+        return result
+
+    async def __async_permission_update(self, notice: int, command: int, level: int) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            # 检查群组是否在表中, 存在则直接更新状态
+            try:
+                session_result = await session.execute(select(Group).where(Group.group_id == self.group_id))
+                exist_group = session_result.scalar_one()
+                exist_group.notice_permissions = notice
+                exist_group.command_permissions = command
+                exist_group.permission_level = level
+                exist_group.updated_at = datetime.now()
+                await session.commit()
+                permission_cache.invalidate('group_permission', self.group_id)
+                result = DBResult(error=False, info='Success', result=0)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_permission_reset(self) -> DBResult:
+        result = await self.__async_permission_update(notice=0, command=0, level=0)
+        return result
+
+    async def async_permission_set(self, notice: int = 0, command: int = 0, level: int = 0) -> DBResult:
+        result = await self.__async_permission_update(notice=notice, command=command, level=level)
+        return result
+
+    async def async_permission_info(self) -> DBResult:
+        res = {}
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Group.notice_permissions, Group.command_permissions, Group.permission_level).
+                    where(Group.group_id == self.group_id)
+                )
+                notice, command, level = session_result.one()
+                res['notice'] = notice
+                res['command'] = command
+                res['level'] = level
+                result = DBResult(error=False, info='Success', result=res)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=res)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=res)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=res)
+        return result
+
+    async def async_permission_notice(self) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Group.notice_permissions).where(Group.group_id == self.group_id))
+                res = session_result.one()
+                if res and res[0] == 1:
+                    result = DBResult(error=False, info='Success', result=1)
+                else:
+                    result = DBResult(error=False, info='Success', result=0)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_permission_command(self) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Group.command_permissions).where(Group.group_id == self.group_id))
+                res = session_result.one()
+                if res and res[0] == 1:
+                    result = DBResult(error=False, info='Success', result=1)
+                else:
+                    result = DBResult(error=False, info='Success', result=0)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_permission_level(self) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Group.permission_level).where(Group.group_id == self.group_id))
+                res = session_result.one()
+                result = DBResult(error=False, info='Success', result=res[0])
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_subscription_list(self) -> DBResult:
+        group_id_result = await self.async_id()
+        if not group_id_result.success():
+            return DBResult(error=True, info='Group not exist', result=[])
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Subscription.sub_type, Subscription.sub_id, Subscription.up_name).join(GroupSub).
+                    where(Subscription.id == GroupSub.sub_id).
+                    where(GroupSub.group_id == group_id_result.result)
+                )
+                res = [tuple(x) for x in session_result.all()]
+                result = DBResult(error=False, info='Success', result=res)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=[])
+        return result
+
+    async def async_subscription_add(self, sub: DBSubscription, group_sub_info: str = None) -> DBResult:
+        group_id_result = await self.async_id()
+        sub_id_result = await sub.async_id()
+        if not group_id_result.success() or not sub_id_result.success():
+            return DBResult(error=True, info='Group or subscription not exist', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                # 订阅关系已存在, 更新信息
+                session_result = await session.execute(
+                    select(GroupSub).
+                    where(GroupSub.group_id == group_id_result.result).
+                    where(GroupSub.sub_id == sub_id_result.result)
+                )
+                exist_subscription = session_result.scalar_one()
+                exist_subscription.group_sub_info = group_sub_info
+                exist_subscription.updated_at = datetime.now()
+                await session.commit()
+                result = DBResult(error=False, info='Success upgraded', result=0)
+            except NoResultFound:
+                # 不存在关系则添加新成员
+                try:
+                    subscription = GroupSub(sub_id=sub_id_result.result, group_id=group_id_result.result,
+                                            group_sub_info=group_sub_info, created_at=datetime.now())
+                    session.add(subscription)
+                    await session.commit()
+                    result = DBResult(error=False, info='Success added', result=0)
+                except Exception as e:
+                    await session.rollback()
+                    result = DBResult(error=True, info=repr(e), result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_subscription_del(self, sub: DBSubscription) -> DBResult:
+        group_id_result = await self.async_id()
+        sub_id_result = await sub.async_id()
+        if not group_id_result.success() or not sub_id_result.success():
+            return DBResult(error=True, info='Group or subscription not exist', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(GroupSub).
+                    where(GroupSub.group_id == group_id_result.result).
+                    where(GroupSub.sub_id == sub_id_result.result)
+                )
+                exist_subscription = session_result.scalar_one()
+                await session.delete(exist_subscription)
+                await session.commit()
+                result = DBResult(error=False, info='Success', result=0)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_subscription_clear(self) -> DBResult:
+        group_id_result = await self.async_id()
+        if not group_id_result.success():
+            return DBResult(error=True, info='Group or subscription not exist', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(GroupSub).where(GroupSub.group_id == group_id_result.result))
+                for exist_group_sub in session_result.scalars().all():
+                    await session.delete(exist_group_sub)
+                await session.commit()
+                result = DBResult(error=False, info='Success', result=0)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_subscription_clear_by_type(self, sub_type: int) -> DBResult:
+        group_id_result = await self.async_id()
+        if not group_id_result.success():
+            return DBResult(error=True, info='Group or subscription not exist', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(GroupSub).join(Subscription).
+                    where(GroupSub.sub_id == Subscription.id).
+                    where(Subscription.sub_type == sub_type).
+                    where(GroupSub.group_id == group_id_result.result)
+                )
+                for exist_group_sub in session_result.scalars().all():
+                    await session.delete(exist_group_sub)
+                await session.commit()
+                result = DBResult(error=False, info='Success', result=0)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_cached_permission_info(self) -> DBResult:
+        """
+        带进程内缓存的群组权限查询, 仅缓存成功或 NoResultFound 的结果
+        """
+        hit, result = permission_cache.get('group_permission', self.group_id, 'info')
+        if hit:
+            return result
+        result = await self.async_permission_info()
+        if result.success() or result.info == 'NoResultFound':
+            permission_cache.set('group_permission', self.group_id, 'info', result)
+        return result
@@ -1,6 +1,8 @@
 from omega_miya.utils.Omega_Base.database import NBdb, DBResult
 from omega_miya.utils.Omega_Base.tables import History
+from typing import List
 from datetime import datetime
+from sqlalchemy import insert
 
 
 class DBHistory(object):
@@ -27,3 +29,39 @@ class DBHistory(object):
         finally:
             session.close()
         return result
+
+    async def async_add(self, sub_type: str = None, group_id: int = None, user_id: int = None, user_name: str = None,
+                        raw_data: str = None, msg_data: str = None) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                new_event = History(time=self.time, self_id=self.self_id,
+                                    post_type=self.post_type, detail_type=self.detail_type, sub_type=sub_type,
+                                    group_id=group_id, user_id=user_id, user_name=user_name,
+                                    raw_data=raw_data, msg_data=msg_data, created_at=datetime.now())
+                session.add(new_event)
+                await session.commit()
+                result = DBResult(error=False, info='Success added', result=0)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    @classmethod
+    async def async_add_batch(cls, events: List[dict]) -> DBResult:
+        """
+        单条多行 INSERT 批量写入事件
+        :param events: 事件字典列表, 键与 History 表字段一致
+        """
+        if not events:
+            return DBResult(error=False, info='Nothing to add', result=0)
+        now = datetime.now()
+        rows = [dict(event, created_at=event.get('created_at', now)) for event in events]
+        async with NBdb.get_async_session() as session:
+            try:
+                await session.execute(insert(History).values(rows))
+                await session.commit()
+                result = DBResult(error=False, info='Success added', result=len(rows))
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
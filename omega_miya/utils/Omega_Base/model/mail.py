@@ -1,6 +1,7 @@
 from omega_miya.utils.Omega_Base.database import NBdb, DBResult
 from omega_miya.utils.Omega_Base.tables import Email, EmailBox
 from datetime import datetime
+from typing import Iterable
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 
@@ -113,6 +114,24 @@ class DBEmail(object):
     def __init__(self, mail_hash: str):
         self.mail_hash = mail_hash
 
+    @classmethod
+    def list_exist_hash(cls, mail_hashes: Iterable[str]) -> DBResult:
+        """
+        :return: result 为 mail_hashes 中已存在于数据库的 hash 集合
+        """
+        mail_hashes = list(set(mail_hashes))
+        if not mail_hashes:
+            return DBResult(error=False, info='Success', result=set())
+        session = NBdb().get_session()
+        try:
+            res = {x[0] for x in session.query(Email.mail_hash).filter(Email.mail_hash.in_(mail_hashes)).all()}
+            result = DBResult(error=False, info='Success', result=res)
+        except Exception as e:
+            result = DBResult(error=True, info=repr(e), result=set())
+        finally:
+            session.close()
+        return result
+
     def add(self, date: str, header: str, sender: str, to: str = None, body: str = None, html: str = None) -> DBResult:
         session = NBdb().get_session()
         try:
@@ -1,8 +1,11 @@
-from typing import List
+from typing import Dict, List
 from omega_miya.utils.Omega_Base.database import NBdb, DBResult
 from omega_miya.utils.Omega_Base.tables import Pixiv, PixivTag, PixivT2I
+from omega_miya.utils.Omega_Base.pixiv_index import pixiv_illust_index
 from .pixivtag import DBPixivtag
 from datetime import datetime
+from sqlalchemy.future import select
+from sqlalchemy.dialects.mysql import insert
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 from sqlalchemy.sql.expression import func
 from sqlalchemy import or_
@@ -97,10 +100,99 @@ class DBPixivillust(object):
             result = DBResult(error=True, info=repr(e), result=-1)
         finally:
             session.close()
+        # 同步更新作品索引
+        if result.success() and pixiv_illust_index.ready:
+            pixiv_illust_index.add(pid=self.pid, nsfw_tag=nsfw_tag, uname=uname, tags=tags)
+        return result
+
+    @classmethod
+    async def async_add_batch(cls, illusts: List[Dict]) -> DBResult:
+        """
+        在一个事务中批量写入作品, 行为与逐个调用 add 一致:
+        tag 与作品均以多行 INSERT ... ON DUPLICATE KEY UPDATE 写入, 已存在作品的 nsfw_tag 只升不降,
+        仅为新作品写入 tag 关联
+        :param illusts: 作品字典列表, 键为 pid, uid, title, uname, nsfw_tag, tags, url
+        :return: result 为写入的作品数
+        """
+        if not illusts:
+            return DBResult(error=False, info='Nothing to add', result=0)
+        # 同一批次内重复的 pid 以最后一个为准
+        illusts = list({int(x['pid']): x for x in illusts}.values())
+        pids = [int(x['pid']) for x in illusts]
+        tagnames = list({tag for x in illusts for tag in x['tags'] if tag})
+        now = datetime.now()
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(select(Pixiv.pid).where(Pixiv.pid.in_(pids)))
+                exist_pids = {int(x) for x in session_result.scalars().all()}
+
+                tag_ids = {}
+                if tagnames:
+                    stmt = insert(PixivTag).values([{'tagname': x, 'created_at': now} for x in tagnames])
+                    await session.execute(stmt.on_duplicate_key_update(tagname=stmt.inserted.tagname))
+                    session_result = await session.execute(
+                        select(PixivTag.id, PixivTag.tagname).where(PixivTag.tagname.in_(tagnames)))
+                    # tagname 列的排序规则不区分大小写, 以小写匹配
+                    tag_ids = {str(tagname).lower(): int(tag_id) for tag_id, tagname in session_result.all()}
+
+                stmt = insert(Pixiv).values([
+                    {'pid': int(x['pid']), 'uid': x['uid'], 'title': x['title'], 'uname': x['uname'],
+                     'url': x['url'], 'nsfw_tag': x['nsfw_tag'], 'tags': repr(x['tags']), 'created_at': now}
+                    for x in illusts])
+                await session.execute(stmt.on_duplicate_key_update(
+                    title=stmt.inserted.title, uname=stmt.inserted.uname, tags=stmt.inserted.tags,
+                    nsfw_tag=func.greatest(Pixiv.nsfw_tag, stmt.inserted.nsfw_tag), updated_at=now))
+
+                new_pids = [x for x in pids if x not in exist_pids]
+                if new_pids:
+                    session_result = await session.execute(
+                        select(Pixiv.id, Pixiv.pid).where(Pixiv.pid.in_(new_pids)))
+                    illust_ids = {int(pid): int(illust_id) for illust_id, pid in session_result.all()}
+                    t2i_rows = []
+                    for illust in illusts:
+                        illust_id = illust_ids.get(int(illust['pid']))
+                        if illust_id is None:
+                            continue
+                        for tag_id in {tag_ids.get(tag.lower()) for tag in illust['tags'] if tag}:
+                            if tag_id is not None:
+                                t2i_rows.append({'illust_id': illust_id, 'tag_id': tag_id, 'created_at': now})
+                    if t2i_rows:
+                        await session.execute(insert(PixivT2I).values(t2i_rows))
+                await session.commit()
+                result = DBResult(error=False, info='Success added', result=len(illusts))
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        # 同步更新作品索引
+        if result.success() and pixiv_illust_index.ready:
+            for illust in illusts:
+                pixiv_illust_index.add(pid=int(illust['pid']), nsfw_tag=illust['nsfw_tag'],
+                                       uname=illust['uname'], tags=illust['tags'])
+        return result
+
+    @classmethod
+    async def async_build_index(cls) -> DBResult:
+        """
+        从数据库构建作品倒排索引, 单次查询加载全部作品及其 tag
+        """
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Pixiv.pid, Pixiv.nsfw_tag, Pixiv.uname, PixivTag.tagname).
+                    outerjoin(PixivT2I, PixivT2I.illust_id == Pixiv.id).
+                    outerjoin(PixivTag, PixivTag.id == PixivT2I.tag_id)
+                )
+                pixiv_illust_index.build(session_result.all())
+                result = DBResult(error=False, info='Success', result=pixiv_illust_index.stats())
+            except Exception as e:
+                pixiv_illust_index.clear()
+                result = DBResult(error=True, info=repr(e), result={})
         return result
 
     @classmethod
     def rand_illust(cls, num: int, nsfw_tag: int):
+        if pixiv_illust_index.ready:
+            return pixiv_illust_index.sample(nsfw_tag=nsfw_tag, num=num)
         session = NBdb().get_session()
         _res = session.query(Pixiv.pid).filter(Pixiv.nsfw_tag == nsfw_tag).order_by(func.random()).limit(num).all()
         pid_list = []
@@ -110,6 +202,9 @@ class DBPixivillust(object):
 
     @classmethod
     def status(cls):
+        if pixiv_illust_index.ready:
+            return {'total': pixiv_illust_index.count(), 'moe': pixiv_illust_index.count(nsfw_tag=0),
+                    'setu': pixiv_illust_index.count(nsfw_tag=1), 'r18': pixiv_illust_index.count(nsfw_tag=2)}
         session = NBdb().get_session()
         all_count = session.query(func.count(Pixiv.id)).scalar()
         moe_count = session.query(func.count(Pixiv.id)).filter(Pixiv.nsfw_tag == 0).scalar()
@@ -120,6 +215,9 @@ class DBPixivillust(object):
 
     @classmethod
     def list_illust(cls, nsfw_tag: int, keyword: str) -> DBResult:
+        if pixiv_illust_index.ready:
+            pid_list = list(pixiv_illust_index.match(nsfw_tag=nsfw_tag, keyword=keyword))
+            return DBResult(error=False, info='Success', result=pid_list)
         session = NBdb().get_session()
         try:
             pid_list = session.query(Pixiv.pid).join(PixivT2I).join(PixivTag). \
@@ -136,3 +234,21 @@ class DBPixivillust(object):
         finally:
             session.close()
         return result
+
+    @classmethod
+    def list_illust_by_tags(cls, nsfw_tag: int, keywords: List[str]) -> DBResult:
+        """
+        :return: 同时匹配所有 keyword(tag 或作者名)的作品 pid 列表
+        """
+        if pixiv_illust_index.ready:
+            pid_list = list(pixiv_illust_index.search(nsfw_tag=nsfw_tag, keywords=keywords))
+            return DBResult(error=False, info='Success', result=pid_list)
+        pid_set = None
+        for keyword in keywords:
+            _res = cls.list_illust(nsfw_tag=nsfw_tag, keyword=keyword)
+            if not _res.success():
+                return _res
+            pid_set = set(_res.result) if pid_set is None else pid_set & set(_res.result)
+            if not pid_set:
+                break
+        return DBResult(error=False, info='Success', result=list(pid_set or []))
@@ -1,6 +1,7 @@
 from omega_miya.utils.Omega_Base.database import NBdb, DBResult
 from omega_miya.utils.Omega_Base.tables import Subscription, Group, GroupSub
 from datetime import datetime
+from sqlalchemy.future import select
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 
@@ -111,3 +112,138 @@ class DBSubscription(object):
         else:
             result = DBResult(error=True, info='Subscription not exist', result=-1)
         return result
+
+    async def async_id(self) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Subscription.id).
+                    where(Subscription.sub_type == self.sub_type).
+                    where(Subscription.sub_id == self.sub_id)
+                )
+                subscription_table_id = session_result.one()[0]
+                result = DBResult(error=False, info='Success', result=subscription_table_id)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_exist(self) -> bool:
+        result = (await self.async_id()).success()
+        return result
+
+    async def async_add(self, up_name: str, live_info: str = None) -> DBResult:
+        async with NBdb.get_async_session() as session:
+            try:
+                # 已存在则更新描述
+                session_result = await session.execute(
+                    select(Subscription).
+                    where(Subscription.sub_type == self.sub_type).
+                    where(Subscription.sub_id == self.sub_id)
+                )
+                exist_subscription = session_result.scalar_one()
+                exist_subscription.up_name = up_name
+                exist_subscription.live_info = live_info
+                exist_subscription.updated_at = datetime.now()
+                await session.commit()
+                result = DBResult(error=False, info='Success upgraded', result=0)
+            except NoResultFound:
+                # 不存在则添加新订阅信息
+                try:
+                    new_subscription = Subscription(sub_type=self.sub_type, sub_id=self.sub_id,
+                                                    up_name=up_name, live_info=live_info, created_at=datetime.now())
+                    session.add(new_subscription)
+                    await session.commit()
+                    result = DBResult(error=False, info='Success added', result=0)
+                except Exception as e:
+                    await session.rollback()
+                    result = DBResult(error=True, info=repr(e), result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_delete(self) -> DBResult:
+        # 清空持已订阅这个sub的群组
+        await self.async_sub_group_clear()
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Subscription).
+                    where(Subscription.sub_type == self.sub_type).
+                    where(Subscription.sub_id == self.sub_id)
+                )
+                exist_subscription = session_result.scalar_one()
+                await session.delete(exist_subscription)
+                await session.commit()
+                result = DBResult(error=False, info='Success', result=0)
+            except NoResultFound:
+                result = DBResult(error=True, info='NoResultFound', result=-1)
+            except MultipleResultsFound:
+                result = DBResult(error=True, info='MultipleResultsFound', result=-1)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
+
+    async def async_sub_group_list(self) -> DBResult:
+        # 直接按订阅类型和id连表查询, 避免先查询订阅表id的额外往返
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Group.group_id).join(GroupSub).join(Subscription).
+                    where(Group.id == GroupSub.group_id).
+                    where(GroupSub.sub_id == Subscription.id).
+                    where(Subscription.sub_type == self.sub_type).
+                    where(Subscription.sub_id == self.sub_id)
+                )
+                res = [x for x in session_result.scalars().all()]
+                result = DBResult(error=False, info='Success', result=res)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result=[])
+        if result.success() and not result.result and not await self.async_exist():
+            result = DBResult(error=True, info='Subscription not exist', result=[])
+        return result
+
+    @classmethod
+    async def async_sub_group_map(cls, sub_type: int) -> DBResult:
+        """
+        :return: result = {sub_id: [订阅了该对象的 group_id]}, 单次连表查询该类型的全部订阅, 无群订阅的对象不在结果中
+        """
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(Subscription.sub_id, Group.group_id).
+                    join(GroupSub, GroupSub.sub_id == Subscription.id).
+                    join(Group, Group.id == GroupSub.group_id).
+                    where(Subscription.sub_type == sub_type)
+                )
+                res = {}
+                for sub_id, group_id in session_result.all():
+                    res.setdefault(int(sub_id), []).append(int(group_id))
+                result = DBResult(error=False, info='Success', result=res)
+            except Exception as e:
+                result = DBResult(error=True, info=repr(e), result={})
+        return result
+
+    async def async_sub_group_clear(self) -> DBResult:
+        sub_id_result = await self.async_id()
+        if not sub_id_result.success():
+            return DBResult(error=True, info='Subscription not exist', result=-1)
+        async with NBdb.get_async_session() as session:
+            try:
+                session_result = await session.execute(
+                    select(GroupSub).where(GroupSub.sub_id == sub_id_result.result))
+                for exist_group_sub in session_result.scalars().all():
+                    await session.delete(exist_group_sub)
+                await session.commit()
+                result = DBResult(error=False, info='Success', result=0)
+            except Exception as e:
+                await session.rollback()
+                result = DBResult(error=True, info=repr(e), result=-1)
+        return result
@@ -1,4 +1,5 @@
 from omega_miya.utils.Omega_Base.database import NBdb, DBResult
+from omega_miya.utils.Omega_Base.cache import permission_cache
 from omega_miya.utils.Omega_Base.tables import User, UserGroup, Skill, UserSkill, Vocation
 from .skill import DBSkill
 from datetime import datetime
@@ -87,6 +88,7 @@ class DBUser(object):
             exist_user = session.query(User).filter(User.qq == self.qq).one()
             session.delete(exist_user)
             session.commit()
+            permission_cache.invalidate('user', self.qq)
             result = DBResult(error=False, info='Success', result=0)
         except NoResultFound:
             result = DBResult(error=True, info='NoResultFound', result=-1)
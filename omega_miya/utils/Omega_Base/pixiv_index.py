@@ -0,0 +1,165 @@
+"""
+Pixiv 作品进程内倒排索引
+启动时由 DBPixivillust.async_build_index 从数据库一次性构建, DBPixivillust.add 成功后增量更新
+未构建完成前 DBPixivillust 的查询方法回退为直接查询数据库
+"""
+import random
+from typing import Dict, Iterable, List, Set
+
+
+class PixivIllustIndex(object):
+    """
+    检索词(tag 名与作者名, 统一小写)-> 作品 pid 集合的倒排表
+    另对检索词本身建立 1-gram / 2-gram 索引, 子串查询时先用 n-gram 求交集得到候选检索词再校验, 与 ilike '%kw%' 语义一致
+    每个 nsfw_tag 分桶维护 pid 列表及其下标, 随机抽样与修改分桶均为 O(1)
+    倒排表使用 set, 交集运算由 C 实现, tag 分布稀疏时比位图更省内存
+    """
+    def __init__(self):
+        self.__ready = False
+        self.__postings: Dict[str, Set[int]] = {}
+        self.__grams: Dict[str, Set[str]] = {}
+        self.__nsfw: Dict[int, int] = {}
+        self.__buckets: Dict[int, List[int]] = {}
+        self.__bucket_pos: Dict[int, Dict[int, int]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.__ready
+
+    @staticmethod
+    def __term_grams(term: str) -> Set[str]:
+        grams = set(term)
+        grams.update(term[i:i + 2] for i in range(len(term) - 1))
+        return grams
+
+    def __add_term(self, term: str, pid: int) -> None:
+        term = term.strip().lower()
+        if not term:
+            return
+        postings = self.__postings.get(term)
+        if postings is None:
+            postings = self.__postings[term] = set()
+            for gram in self.__term_grams(term):
+                self.__grams.setdefault(gram, set()).add(term)
+        postings.add(pid)
+
+    def __bucket_remove(self, nsfw_tag: int, pid: int) -> None:
+        bucket = self.__buckets[nsfw_tag]
+        pos = self.__bucket_pos[nsfw_tag]
+        # 与末尾元素交换后弹出
+        index = pos.pop(pid)
+        last = bucket.pop()
+        if last != pid:
+            bucket[index] = last
+            pos[last] = index
+
+    def __bucket_add(self, nsfw_tag: int, pid: int) -> None:
+        bucket = self.__buckets.setdefault(nsfw_tag, [])
+        self.__bucket_pos.setdefault(nsfw_tag, {})[pid] = len(bucket)
+        bucket.append(pid)
+
+    def add(self, pid: int, nsfw_tag: int, uname: str, tags: Iterable[str]) -> None:
+        """
+        与 DBPixivillust.add 一致, 已存在的作品 nsfw_tag 只升不降
+        """
+        exist_nsfw_tag = self.__nsfw.get(pid)
+        if exist_nsfw_tag is None:
+            self.__nsfw[pid] = nsfw_tag
+            self.__bucket_add(nsfw_tag, pid)
+        elif nsfw_tag > exist_nsfw_tag:
+            self.__bucket_remove(exist_nsfw_tag, pid)
+            self.__nsfw[pid] = nsfw_tag
+            self.__bucket_add(nsfw_tag, pid)
+        if uname:
+            self.__add_term(uname, pid)
+        for tag in tags:
+            if tag:
+                self.__add_term(tag, pid)
+
+    def build(self, illusts: Iterable[tuple]) -> None:
+        """
+        :param illusts: (pid, nsfw_tag, uname, tagname) 行, 同一作品的多个 tag 分多行给出, tagname 可为 None
+        """
+        self.clear()
+        for pid, nsfw_tag, uname, tagname in illusts:
+            self.add(pid=pid, nsfw_tag=nsfw_tag, uname=uname, tags=(tagname,))
+        self.__ready = True
+
+    def clear(self) -> None:
+        self.__ready = False
+        self.__postings.clear()
+        self.__grams.clear()
+        self.__nsfw.clear()
+        self.__buckets.clear()
+        self.__bucket_pos.clear()
+
+    def match_terms(self, keyword: str) -> List[str]:
+        """
+        :return: 包含 keyword 子串的全部检索词
+        """
+        keyword = keyword.strip().lower()
+        if not keyword:
+            return []
+        if len(keyword) == 1:
+            return list(self.__grams.get(keyword, ()))
+        gram_sets = []
+        for i in range(len(keyword) - 1):
+            terms = self.__grams.get(keyword[i:i + 2])
+            if not terms:
+                return []
+            gram_sets.append(terms)
+        gram_sets.sort(key=len)
+        candidates = gram_sets[0].intersection(*gram_sets[1:])
+        return [x for x in candidates if keyword in x]
+
+    def match(self, nsfw_tag: int, keyword: str) -> Set[int]:
+        bucket_pos = self.__bucket_pos.get(nsfw_tag)
+        if not bucket_pos:
+            return set()
+        result = set()
+        for term in self.match_terms(keyword):
+            result.update(self.__postings[term])
+        return result & bucket_pos.keys()
+
+    def search(self, nsfw_tag: int, keywords: Iterable[str]) -> Set[int]:
+        """
+        :return: 同时匹配所有 keyword 的作品 pid
+        """
+        matched = []
+        for keyword in keywords:
+            pids = self.match(nsfw_tag=nsfw_tag, keyword=keyword)
+            if not pids:
+                return set()
+            matched.append(pids)
+        if not matched:
+            return set()
+        matched.sort(key=len)
+        return matched[0].intersection(*matched[1:])
+
+    def sample(self, nsfw_tag: int, num: int) -> List[int]:
+        bucket = self.__buckets.get(nsfw_tag, [])
+        return random.sample(bucket, k=min(num, len(bucket)))
+
+    def count(self, nsfw_tag: int = None) -> int:
+        if nsfw_tag is None:
+            return len(self.__nsfw)
+        return len(self.__buckets.get(nsfw_tag, []))
+
+    def stats(self) -> dict:
+        return {
+            'ready': self.__ready,
+            'illusts': len(self.__nsfw),
+            'terms': len(self.__postings),
+            'grams': len(self.__grams),
+            'buckets': {k: len(v) for k, v in self.__buckets.items()}
+        }
+
+
+# 全局作品索引
+pixiv_illust_index = PixivIllustIndex()
+
+
+__all__ = [
+    'PixivIllustIndex',
+    'pixiv_illust_index'
+]
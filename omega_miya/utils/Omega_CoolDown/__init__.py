@@ -14,8 +14,24 @@ from nonebot.adapters.cqhttp.bot import Bot
 from nonebot.adapters.cqhttp.event import Event
 from omega_miya.utils.Omega_plugin_utils import \
     check_and_set_global_cool_down, check_and_set_plugin_cool_down, \
-    check_and_set_group_cool_down, check_and_set_user_cool_down, PluginCoolDown
-from omega_miya.utils.Omega_Base import DBCoolDownEvent, DBAuth
+    check_and_set_group_cool_down, check_and_set_user_cool_down, PluginCoolDown, cool_down_engine
+from omega_miya.utils.Omega_Base import DBAuth
+
+
+# 启动时从数据库恢复冷却状态
+@get_driver().on_startup
+async def init_cool_down_engine():
+    _res = await cool_down_engine.load()
+    if _res.success():
+        logger.opt(colors=True).info(f'init_cool_down_engine: <g>已恢复 {_res.result} 个冷却事件</g>')
+    else:
+        logger.error(f'init_cool_down_engine: 恢复冷却事件失败, error: {_res.info}')
+
+
+# 关闭前等待冷却事件回写完成
+@get_driver().on_shutdown
+async def flush_cool_down_engine():
+    await cool_down_engine.flush()
 
 
 @run_preprocessor
@@ -47,19 +63,19 @@ async def handle_plugin_cooldown(matcher: Matcher, bot: Bot, event: Event, state
 
     # 检查用户或群组是否有skip_cd权限, 跳过冷却检查
     skip_cd_auth_node = f'{plugin_name}.{PluginCoolDown.skip_auth_node}'
-    user_auth_res = DBAuth(auth_id=user_id, auth_type='user', auth_node=skip_cd_auth_node)
-    if user_auth_res.allow_tag().result == 1 and user_auth_res.deny_tag().result == 0:
+    # 用户和群组的授权在一次查询中获取
+    auth_res = await DBAuth.async_cached_resolve_bulk(
+        subjects=[('user', user_id), ('group', group_id)], auth_nodes=[skip_cd_auth_node])
+    if auth_res.result.get(('user', user_id, skip_cd_auth_node)) == (1, 0):
         return
-
-    group_auth_res = DBAuth(auth_id=group_id, auth_type='group', auth_node=skip_cd_auth_node)
-    if group_auth_res.allow_tag().result == 1 and group_auth_res.deny_tag().result == 0:
+    if auth_res.result.get(('group', group_id, skip_cd_auth_node)) == (1, 0):
         return
 
     # 检查冷却情况
-    global_check = DBCoolDownEvent.check_global_cool_down_event()
-    plugin_check = DBCoolDownEvent.check_plugin_cool_down_event(plugin=plugin_name)
-    group_check = DBCoolDownEvent.check_group_cool_down_event(plugin=plugin_name, group_id=group_id)
-    user_check = DBCoolDownEvent.check_user_cool_down_event(plugin=plugin_name, user_id=user_id)
+    global_check = cool_down_engine.check(event_type='global')
+    plugin_check = cool_down_engine.check(event_type='plugin', plugin=plugin_name)
+    group_check = cool_down_engine.check(event_type='group', plugin=plugin_name, target_id=group_id)
+    user_check = cool_down_engine.check(event_type='user', plugin=plugin_name, target_id=user_id)
 
     # 处理全局冷却
     # 先检查是否已有全局冷却
@@ -1,9 +1,31 @@
-from nonebot import on_message, on_request, on_notice, logger
+from nonebot import on_message, on_request, on_notice, logger, get_driver
 from nonebot.plugin import on
 from nonebot.typing import T_State
 from nonebot.adapters.cqhttp.bot import Bot
 from nonebot.adapters.cqhttp.event import Event
-from omega_miya.utils.Omega_Base import DBHistory
+from .sink import HistorySink
+
+
+global_config = get_driver().config
+# 历史记录批量写入配置(可选)
+history_sink = HistorySink(
+    batch_size=int(getattr(global_config, 'history_batch_size', 200)),
+    flush_interval=float(getattr(global_config, 'history_flush_interval', 2.0)),
+    max_queue_size=int(getattr(global_config, 'history_max_queue_size', 10000)),
+    put_timeout=float(getattr(global_config, 'history_put_timeout', 1.0))
+)
+
+
+@get_driver().on_startup
+async def start_history_sink():
+    history_sink.start()
+
+
+# 关闭时写入队列中剩余的记录
+@get_driver().on_shutdown
+async def close_history_sink():
+    await history_sink.close()
+    logger.info(f'History sink closed, metrics: {history_sink.metrics()}')
 
 
 # 注册事件响应器, 处理MessageEvent
@@ -25,9 +47,11 @@ async def handle_message(bot: Bot, event: Event, state: T_State):
         user_id = event.dict().get('user_id')
         raw_data = repr(event)
         msg_data = str(event.dict().get('message'))
-        new_event = DBHistory(time=time, self_id=self_id, post_type=post_type, detail_type=detail_type)
-        new_event.add(sub_type=sub_type, group_id=group_id, user_id=user_id, user_name=user_name,
-                      raw_data=raw_data, msg_data=msg_data)
+        _res = await history_sink.put(time=time, self_id=self_id, post_type=post_type, detail_type=detail_type,
+                                      sub_type=sub_type, group_id=group_id, user_id=user_id, user_name=user_name,
+                                      raw_data=raw_data, msg_data=msg_data)
+        if not _res.success():
+            logger.warning(f'History recording skipped, {_res.info}')
     except Exception as e:
         logger.error(f'Message history recording Failed, error: {repr(e)}')
 
@@ -51,9 +75,11 @@ async def handle_message_sent_history(bot: Bot, event: Event, state: T_State):
         user_id = event.dict().get('user_id')
         raw_data = repr(event)
         msg_data = str(event.dict().get('message'))
-        new_event = DBHistory(time=time, self_id=self_id, post_type=post_type, detail_type=detail_type)
-        new_event.add(sub_type=sub_type, group_id=group_id, user_id=user_id, user_name=user_name,
-                      raw_data=raw_data, msg_data=msg_data)
+        _res = await history_sink.put(time=time, self_id=self_id, post_type=post_type, detail_type=detail_type,
+                                      sub_type=sub_type, group_id=group_id, user_id=user_id, user_name=user_name,
+                                      raw_data=raw_data, msg_data=msg_data)
+        if not _res.success():
+            logger.warning(f'History recording skipped, {_res.info}')
     except Exception as e:
         logger.error(f'Message history recording Failed, error: {repr(e)}')
 
@@ -74,9 +100,11 @@ async def handle_notice(bot: Bot, event: Event, state: T_State):
         user_id = event.dict().get('user_id')
         raw_data = repr(event)
         msg_data = str(event.dict().get('message'))
-        new_event = DBHistory(time=time, self_id=self_id, post_type=post_type, detail_type=detail_type)
-        new_event.add(sub_type=sub_type, group_id=group_id, user_id=user_id, user_name=None,
-                      raw_data=raw_data, msg_data=msg_data)
+        _res = await history_sink.put(time=time, self_id=self_id, post_type=post_type, detail_type=detail_type,
+                                      sub_type=sub_type, group_id=group_id, user_id=user_id, user_name=None,
+                                      raw_data=raw_data, msg_data=msg_data)
+        if not _res.success():
+            logger.warning(f'History recording skipped, {_res.info}')
     except Exception as e:
         logger.error(f'Notice history recording Failed, error: {repr(e)}')
 
@@ -97,8 +125,10 @@ async def handle_request(bot: Bot, event: Event, state: T_State):
         user_id = event.dict().get('user_id')
         raw_data = repr(event)
         msg_data = str(event.dict().get('message'))
-        new_event = DBHistory(time=time, self_id=self_id, post_type=post_type, detail_type=detail_type)
-        new_event.add(sub_type=sub_type, group_id=group_id, user_id=user_id, user_name=None,
-                      raw_data=raw_data, msg_data=msg_data)
+        _res = await history_sink.put(time=time, self_id=self_id, post_type=post_type, detail_type=detail_type,
+                                      sub_type=sub_type, group_id=group_id, user_id=user_id, user_name=None,
+                                      raw_data=raw_data, msg_data=msg_data)
+        if not _res.success():
+            logger.warning(f'History recording skipped, {_res.info}')
     except Exception as e:
         logger.error(f'Request history recording Failed, error: {repr(e)}')
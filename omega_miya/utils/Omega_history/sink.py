@@ -0,0 +1,159 @@
+import asyncio
+from time import monotonic
+from typing import List, Optional
+from nonebot import logger
+from omega_miya.utils.Omega_Base import DBHistory, Result
+
+
+# 关闭时放入队列的停止标记, 后台任务取到后写完剩余事件并退出
+_STOP = object()
+
+
+class HistorySink(object):
+    """
+    历史记录批量写入队列
+    事件先进入有界的 asyncio 队列, 由后台任务在攒够 batch_size 条或距上次写入超过 flush_interval 秒时
+    以一条多行 INSERT 写入数据库
+    队列满时写入方最多等待 put_timeout 秒(背压), 超时则丢弃该事件并计数
+    关闭时不取消后台任务, 而是放入停止标记, 由后台任务写完当前批次及队列中剩余事件后退出
+    """
+    def __init__(self, batch_size: int = 200, flush_interval: float = 2.0,
+                 max_queue_size: int = 10000, put_timeout: float = 1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_queue_size = max_queue_size
+        # 队列在 start 时于运行中的事件循环内创建
+        self.__queue: Optional[asyncio.Queue] = None
+        self.__worker: Optional[asyncio.Task] = None
+        self.__closing = False
+        # 运行指标
+        self.__flushed = 0
+        self.__failed = 0
+        self.__dropped = 0
+        self.__flush_count = 0
+        self.__last_flush_latency = 0.0
+        self.__total_flush_latency = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self.__queue.qsize() if self.__queue is not None else 0
+
+    def metrics(self) -> dict:
+        return {
+            'queue_depth': self.depth,
+            'queue_max_size': self.max_queue_size,
+            'flushed': self.__flushed,
+            'failed': self.__failed,
+            'dropped': self.__dropped,
+            'flush_count': self.__flush_count,
+            'last_flush_latency': self.__last_flush_latency,
+            'avg_flush_latency':
+                self.__total_flush_latency / self.__flush_count if self.__flush_count else 0.0
+        }
+
+    async def put(self, time: int, self_id: int, post_type: str, detail_type: str,
+                  sub_type: str = None, group_id: int = None, user_id: int = None, user_name: str = None,
+                  raw_data: str = None, msg_data: str = None) -> Result:
+        event = {
+            'time': time, 'self_id': self_id, 'post_type': post_type, 'detail_type': detail_type,
+            'sub_type': sub_type, 'group_id': group_id, 'user_id': user_id, 'user_name': user_name,
+            'raw_data': raw_data, 'msg_data': msg_data
+        }
+        if self.__closing or self.__queue is None:
+            # 未启动或已关闭时直接写入, 避免丢失关闭过程中产生的事件
+            return await DBHistory.async_add_batch([event])
+        try:
+            await asyncio.wait_for(self.__queue.put(event), timeout=self.put_timeout)
+            return Result(error=False, info='Success queued', result=0)
+        except asyncio.TimeoutError:
+            self.__dropped += 1
+            return Result(error=True, info='History queue full, event dropped', result=-1)
+
+    def start(self) -> None:
+        if self.__worker is None or self.__worker.done():
+            self.__closing = False
+            if self.__queue is None:
+                self.__queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self.__worker = asyncio.get_event_loop().create_task(self.__run())
+
+    async def close(self) -> None:
+        """
+        停止后台任务并写入队列中剩余的全部事件
+        """
+        self.__closing = True
+        if self.__worker is not None:
+            if not self.__worker.done():
+                # 不取消后台任务, 避免中断正在进行的数据库写入导致重复或不完整的写入
+                await self.__queue.put(_STOP)
+            try:
+                await self.__worker
+            except Exception as e:
+                logger.error(f'HistorySink: 后台任务异常退出, error: {repr(e)}')
+            self.__worker = None
+        if self.__queue is None:
+            return
+        # 后台任务异常退出或关闭期间仍有等待入队的事件时, 在此写入
+        while not self.__queue.empty():
+            await self.__flush(self.__drain(self.batch_size))
+
+    def __drain(self, limit: int) -> List[dict]:
+        batch = []
+        while len(batch) < limit and not self.__queue.empty():
+            event = self.__queue.get_nowait()
+            if event is not _STOP:
+                batch.append(event)
+        return batch
+
+    async def __run(self) -> None:
+        stopped = False
+        while not stopped:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                try:
+                    event = self.__queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    if deadline is None:
+                        event = await self.__queue.get()
+                    else:
+                        remaining = deadline - monotonic()
+                        if remaining <= 0:
+                            break
+                        try:
+                            event = await asyncio.wait_for(self.__queue.get(), timeout=remaining)
+                        except asyncio.TimeoutError:
+                            break
+                if event is _STOP:
+                    stopped = True
+                    break
+                batch.append(event)
+                if deadline is None:
+                    deadline = monotonic() + self.flush_interval
+            await self.__flush(batch)
+        # 停止标记之后仍可能有关闭前等待入队的事件
+        while not self.__queue.empty():
+            await self.__flush(self.__drain(self.batch_size))
+
+    async def __flush(self, batch: List[dict]) -> None:
+        if not batch:
+            return
+        start = monotonic()
+        _res = await DBHistory.async_add_batch(batch)
+        if not _res.success():
+            # 批量写入失败时逐条重试, 避免单条异常数据导致整批丢失
+            logger.warning(f'HistorySink: 批量写入 {len(batch)} 条记录失败, 逐条重试, error: {_res.info}')
+            for event in batch:
+                _event_res = await DBHistory.async_add_batch([event])
+                if _event_res.success():
+                    self.__flushed += 1
+                else:
+                    self.__failed += 1
+                    logger.error(f'HistorySink: 历史记录写入失败, error: {_event_res.info}')
+        else:
+            self.__flushed += len(batch)
+        latency = monotonic() - start
+        self.__flush_count += 1
+        self.__last_flush_latency = latency
+        self.__total_flush_latency += latency
+        logger.debug(f'HistorySink: flushed {len(batch)} events in {latency:.3f}s, queue depth: {self.depth}')
@@ -2,6 +2,11 @@ from nonebot.plugin import Export
 from .rules import *
 from .encrypt import AESEncryptStr
 from .cooldown import *
+from .http_client import *
+from .dispatcher import *
+from .image_cache import *
+from .process_pool import *
+from .state_store import *
 
 
 def init_export(
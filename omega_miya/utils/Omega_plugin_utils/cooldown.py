@@ -1,4 +1,9 @@
+import asyncio
 import datetime
+import heapq
+import itertools
+from typing import Dict, List, Optional, Set, Tuple
+from nonebot import logger, get_driver
 from omega_miya.utils.Omega_Base import DBCoolDownEvent, Result
 from dataclasses import dataclass, field
 
@@ -11,64 +16,128 @@ class PluginCoolDown:
     cool_down_time: int
 
 
+# 冷却事件键: (event_type, plugin, group_id 或 user_id)
+T_CoolDownKey = Tuple[str, Optional[str], Optional[int]]
+
+
+class CoolDownEngine(object):
+    """
+    内存冷却事件引擎
+    哈希表保存各冷却事件的结束时间, 查询为 O(1) 并在查询时判断过期
+    小顶堆按结束时间排列, 写入时顺带清除已过期事件, 不再需要定时清理任务
+    可选异步回写 CoolDownEvent 表, 使冷却状态在重启后得以恢复
+    """
+    def __init__(self, write_behind: bool = True):
+        self.write_behind = write_behind
+        self.__events: Dict[T_CoolDownKey, datetime.datetime] = {}
+        self.__heap: List[Tuple[datetime.datetime, int, T_CoolDownKey]] = []
+        self.__counter = itertools.count()
+        self.__pending_tasks: Set[asyncio.Task] = set()
+
+    def __purge(self, now: datetime.datetime) -> None:
+        while self.__heap and self.__heap[0][0] <= now:
+            stop_at, _, key = heapq.heappop(self.__heap)
+            # 堆中可能存在已被更新的旧记录, 仅当结束时间一致时才删除
+            if self.__events.get(key) == stop_at:
+                del self.__events[key]
+
+    def check(self, event_type: str, plugin: str = None, target_id: int = None) -> Result:
+        key = (event_type, plugin, target_id)
+        stop_at = self.__events.get(key)
+        if stop_at is None:
+            return Result(error=False, info='NoResultFound', result=0)
+        if stop_at <= datetime.datetime.now():
+            del self.__events[key]
+            return Result(error=False, info='NoResultFound', result=0)
+        return Result(error=False, info=f'CoolDown until: {stop_at}', result=1)
+
+    def set(self, event_type: str, stop_at: datetime.datetime,
+            plugin: str = None, target_id: int = None, persist: bool = True) -> None:
+        self.__purge(now=datetime.datetime.now())
+        key = (event_type, plugin, target_id)
+        self.__events[key] = stop_at
+        heapq.heappush(self.__heap, (stop_at, next(self.__counter), key))
+        if persist and self.write_behind:
+            self.__persist(event_type=event_type, stop_at=stop_at, plugin=plugin, target_id=target_id)
+
+    def __persist(self, event_type: str, stop_at: datetime.datetime, plugin: str, target_id: int) -> None:
+        if event_type == 'global':
+            coro = DBCoolDownEvent.async_add_global_cool_down_event(stop_at=stop_at)
+        elif event_type == 'plugin':
+            coro = DBCoolDownEvent.async_add_plugin_cool_down_event(plugin=plugin, stop_at=stop_at)
+        elif event_type == 'group':
+            coro = DBCoolDownEvent.async_add_group_cool_down_event(plugin=plugin, group_id=target_id, stop_at=stop_at)
+        elif event_type == 'user':
+            coro = DBCoolDownEvent.async_add_user_cool_down_event(plugin=plugin, user_id=target_id, stop_at=stop_at)
+        else:
+            return
+
+        async def _write():
+            _res = await coro
+            if not _res.success():
+                logger.warning(f'CoolDownEngine: 冷却事件回写失败, {event_type}/{plugin}/{target_id}, error: {_res.info}')
+
+        task = asyncio.get_event_loop().create_task(_write())
+        self.__pending_tasks.add(task)
+        task.add_done_callback(self.__pending_tasks.discard)
+
+    async def load(self) -> Result:
+        """
+        从数据库恢复未过期的冷却事件并清理已过期的记录
+        """
+        await DBCoolDownEvent.async_clear_time_out_event()
+        _res = await DBCoolDownEvent.async_list_active_events()
+        if not _res.success():
+            return _res
+        for event_type, plugin, group_id, user_id, stop_at in _res.result:
+            target_id = group_id if event_type == 'group' else user_id if event_type == 'user' else None
+            self.set(event_type=event_type, stop_at=stop_at, plugin=plugin, target_id=target_id, persist=False)
+        return Result(error=False, info='Success', result=len(_res.result))
+
+    async def flush(self) -> None:
+        """
+        等待所有未完成的回写
+        """
+        if self.__pending_tasks:
+            await asyncio.gather(*self.__pending_tasks, return_exceptions=True)
+
+    def __len__(self) -> int:
+        return len(self.__events)
+
+
+# 全局冷却引擎, 可通过 COOL_DOWN_WRITE_BEHIND=false 关闭数据库回写
+cool_down_engine = CoolDownEngine(
+    write_behind=str(getattr(get_driver().config, 'cool_down_write_behind', True)).lower() not in ['false', '0'])
+
+
+def _check_and_set(event_type: str, minutes: int, plugin: str = None, target_id: int = None) -> Result:
+    check = cool_down_engine.check(event_type=event_type, plugin=plugin, target_id=target_id)
+    if check.result == 0 and minutes > 0:
+        cool_down_engine.set(event_type=event_type, plugin=plugin, target_id=target_id,
+                             stop_at=datetime.datetime.now() + datetime.timedelta(minutes=minutes))
+    return check
+
+
 def check_and_set_global_cool_down(minutes: int) -> Result:
-    check = DBCoolDownEvent.check_global_cool_down_event()
-    if check.result == 1:
-        return check
-    elif check.result == 0:
-        if minutes <= 0:
-            return check
-        DBCoolDownEvent.add_global_cool_down_event(
-            stop_at=datetime.datetime.now() + datetime.timedelta(minutes=minutes))
-        return check
-    else:
-        return check
+    return _check_and_set(event_type='global', minutes=minutes)
 
 
 def check_and_set_plugin_cool_down(minutes: int, plugin: str) -> Result:
-    check = DBCoolDownEvent.check_plugin_cool_down_event(plugin=plugin)
-    if check.result == 1:
-        return check
-    elif check.result == 0:
-        if minutes <= 0:
-            return check
-        DBCoolDownEvent.add_plugin_cool_down_event(
-            stop_at=datetime.datetime.now() + datetime.timedelta(minutes=minutes), plugin=plugin)
-        return check
-    else:
-        return check
+    return _check_and_set(event_type='plugin', minutes=minutes, plugin=plugin)
 
 
 def check_and_set_group_cool_down(minutes: int, plugin: str, group_id: int) -> Result:
-    check = DBCoolDownEvent.check_group_cool_down_event(plugin=plugin, group_id=group_id)
-    if check.result == 1:
-        return check
-    elif check.result == 0:
-        if minutes <= 0:
-            return check
-        DBCoolDownEvent.add_group_cool_down_event(
-            stop_at=datetime.datetime.now() + datetime.timedelta(minutes=minutes), plugin=plugin, group_id=group_id)
-        return check
-    else:
-        return check
+    return _check_and_set(event_type='group', minutes=minutes, plugin=plugin, target_id=group_id)
 
 
 def check_and_set_user_cool_down(minutes: int, plugin: str, user_id: int) -> Result:
-    check = DBCoolDownEvent.check_user_cool_down_event(plugin=plugin, user_id=user_id)
-    if check.result == 1:
-        return check
-    elif check.result == 0:
-        if minutes <= 0:
-            return check
-        DBCoolDownEvent.add_user_cool_down_event(
-            stop_at=datetime.datetime.now() + datetime.timedelta(minutes=minutes), plugin=plugin, user_id=user_id)
-        return check
-    else:
-        return check
+    return _check_and_set(event_type='user', minutes=minutes, plugin=plugin, target_id=user_id)
 
 
 __all__ = [
     'PluginCoolDown',
+    'CoolDownEngine',
+    'cool_down_engine',
     'check_and_set_global_cool_down',
     'check_and_set_plugin_cool_down',
     'check_and_set_group_cool_down',
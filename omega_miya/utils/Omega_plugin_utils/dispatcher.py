@@ -0,0 +1,180 @@
+"""
+群组通知分发器
+各订阅类插件(直播间, 动态, Pixivision)统一通过此处向多个群组推送消息
+"""
+import asyncio
+import random
+import time
+import httpx
+from typing import Dict, Iterable, Optional
+from nonebot import logger, get_driver, get_bots
+from nonebot.adapters.cqhttp.bot import Bot
+from nonebot.adapters.cqhttp.exception import ActionFailed, ApiNotAvailable, NetworkError
+from omega_miya.utils.Omega_Base import Result
+
+
+global_config = get_driver().config
+
+
+def _is_pre_send_error(e: Exception) -> bool:
+    """
+    判断消息是否确定未发出, 仅此类错误可安全重试
+    ActionFailed 为 go-cqhttp 明确返回的发送失败(如风控限频), ApiNotAvailable 为 bot 连接不可用
+    NetworkError 中仅 HTTP 连接阶段的错误确定请求未到达 go-cqhttp, 超时等其余错误时消息可能已经发出
+    """
+    if isinstance(e, (ActionFailed, ApiNotAvailable)):
+        return True
+    if isinstance(e, NetworkError):
+        return isinstance(e.__context__, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+    return False
+
+
+class TokenBucket(object):
+    """
+    令牌桶, 每秒补充 rate 个令牌, 最多积攒 capacity 个
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.__tokens = float(capacity)
+        self.__updated_at = time.monotonic()
+        self.__lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.__lock:
+            while True:
+                now = time.monotonic()
+                self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated_at) * self.rate)
+                self.__updated_at = now
+                if self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.__tokens) / self.rate)
+
+
+class NoticeDispatcher(object):
+    """
+    按 "群组 -> 所在 bot" 映射推送消息, 每个群只由一个实际在群内的 bot 发送一次
+    不同群组并行发送, 每个 bot 受各自的令牌桶限速, 确定未发出的失败带随机抖动退避重试
+    超时等无法确定是否已发出的错误不再重发, 避免群内收到重复消息
+    群组映射通过 get_group_list 获取并缓存 group_map_ttl 秒, 发送失败时会在下次发送前刷新
+    """
+    def __init__(self, rate: float = 1.0, burst: int = 5, retry_times: int = 3,
+                 retry_backoff: float = 1.0, group_map_ttl: int = 600):
+        self.rate = rate
+        self.burst = burst
+        self.retry_times = retry_times
+        self.retry_backoff = retry_backoff
+        self.group_map_ttl = group_map_ttl
+        self.__group_map: Dict[int, str] = {}
+        self.__group_map_expire_at = 0.0
+        self.__group_map_lock: Optional[asyncio.Lock] = None
+        self.__buckets: Dict[str, TokenBucket] = {}
+        # 运行指标
+        self.__sent = 0
+        self.__failed = 0
+        self.__retried = 0
+        self.__unknown = 0
+
+    def metrics(self) -> dict:
+        return {
+            'sent': self.__sent,
+            'failed': self.__failed,
+            'retried': self.__retried,
+            'unknown': self.__unknown,
+            'mapped_groups': len(self.__group_map)
+        }
+
+    def invalidate_group_map(self) -> None:
+        self.__group_map_expire_at = 0.0
+
+    async def refresh_group_map(self, force: bool = False) -> Dict[int, str]:
+        if self.__group_map_lock is None:
+            self.__group_map_lock = asyncio.Lock()
+        async with self.__group_map_lock:
+            if not force and self.__group_map_expire_at > time.monotonic():
+                return self.__group_map
+            group_map = {}
+            for bot_id, bot in get_bots().items():
+                try:
+                    group_list = await bot.call_api('get_group_list')
+                except Exception as e:
+                    logger.warning(f'NoticeDispatcher: 获取 bot: {bot_id} 群组列表失败, error: {repr(e)}')
+                    # 沿用该 bot 原有的映射
+                    group_list = [{'group_id': k} for k, v in self.__group_map.items() if v == bot_id]
+                for group in group_list:
+                    group_map.setdefault(int(group['group_id']), bot_id)
+            self.__group_map = group_map
+            self.__group_map_expire_at = time.monotonic() + self.group_map_ttl
+            return self.__group_map
+
+    def __bucket(self, bot_id: str) -> TokenBucket:
+        bucket = self.__buckets.get(bot_id)
+        if bucket is None:
+            bucket = self.__buckets[bot_id] = TokenBucket(rate=self.rate, capacity=self.burst)
+        return bucket
+
+    async def __send(self, bot: Bot, group_id: int, message) -> Result:
+        error_info = ''
+        for attempt in range(self.retry_times):
+            if attempt > 0:
+                self.__retried += 1
+                backoff = self.retry_backoff * 2 ** (attempt - 1)
+                await asyncio.sleep(backoff + random.uniform(0, backoff))
+            await self.__bucket(bot.self_id).acquire()
+            try:
+                await bot.call_api(api='send_group_msg', group_id=group_id, message=message)
+                self.__sent += 1
+                return Result(error=False, info='Success', result=bot.self_id)
+            except Exception as e:
+                error_info += f'{repr(e)} Occurred in sending to group {group_id} trying {attempt + 1}\n'
+                if not _is_pre_send_error(e):
+                    self.__unknown += 1
+                    return Result(error=True, info=f'Send result unknown, not retried: {error_info}',
+                                  result=bot.self_id)
+        self.__failed += 1
+        # bot 可能已退群, 下次发送前重新获取群组映射
+        self.invalidate_group_map()
+        return Result(error=True, info=error_info, result=bot.self_id)
+
+    async def send_group_msg(self, group_ids: Iterable[int], message, log_info: str = '') -> Result:
+        """
+        向多个群组并行发送同一条消息
+        :param log_info: 日志中对该消息的描述
+        :return: Result.result 为 {group_id: 该群发送结果 Result}, 任一群组发送失败时 error 为 True
+        """
+        group_ids = list(set(group_ids))
+        if not group_ids:
+            return Result(error=False, info='No group to send', result={})
+        group_map = await self.refresh_group_map()
+        bots = get_bots()
+
+        async def _send(_group_id: int) -> Result:
+            bot = bots.get(group_map.get(_group_id))
+            if bot is None:
+                return Result(error=True, info='No bot in group', result=None)
+            return await self.__send(bot=bot, group_id=_group_id, message=message)
+
+        results = await asyncio.gather(*[_send(x) for x in group_ids])
+        delivery = dict(zip(group_ids, results))
+        failed = [k for k, v in delivery.items() if not v.success()]
+        for group_id in failed:
+            logger.warning(f'向群组: {group_id} 发送{log_info}失败, error: {delivery[group_id].info}')
+        info = f'{len(group_ids) - len(failed)}/{len(group_ids)} delivered'
+        logger.info(f'发送{log_info}完成, {info}')
+        return Result(error=bool(failed), info=info, result=delivery)
+
+
+# 全局通知分发器
+notice_dispatcher = NoticeDispatcher(
+    rate=float(getattr(global_config, 'notice_rate_per_bot', 1.0)),
+    burst=int(getattr(global_config, 'notice_burst_per_bot', 5)),
+    retry_times=int(getattr(global_config, 'notice_retry_times', 3)),
+    group_map_ttl=int(getattr(global_config, 'notice_group_map_ttl', 600))
+)
+
+
+__all__ = [
+    'NoticeDispatcher',
+    'notice_dispatcher'
+]
@@ -0,0 +1,192 @@
+"""
+全局共享 HTTP 客户端
+所有插件共用同一个 aiohttp.ClientSession, 复用按 host 划分的连接池与 DNS 缓存
+由 Omega_runtime 插件随 driver 生命周期启动与关闭
+"""
+import os
+import asyncio
+import random
+import aiohttp
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from nonebot import logger, get_driver
+from omega_miya.utils.Omega_Base import Result
+
+
+global_config = get_driver().config
+
+DEFAULT_HEADERS = {'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+                                 'AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.88 Safari/537.36'}
+# 以下状态码视为临时错误, 进行重试, 其余 >= 400 的状态码直接返回失败
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class HttpClient(object):
+    """
+    共享连接池的 HTTP 客户端
+    TCPConnector 负责连接池(总数 limit / 单 host limit_per_host)与 DNS 缓存
+    每个 host 另有一个信号量限制同时进行的请求数, 避免单个站点占满连接池
+    信号量仅在单次请求期间持有, 重试的退避等待期间释放
+    失败时按指数退避加随机抖动重试, 最终结果统一以 Result 返回
+    """
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, dns_cache_ttl: int = 300,
+                 retry_times: int = 3, retry_backoff: float = 0.5, max_backoff: float = 8.0,
+                 host_concurrency: int = 8):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.retry_times = retry_times
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.host_concurrency = host_concurrency
+        self.__session: Optional[aiohttp.ClientSession] = None
+        self.__host_limits: Dict[str, int] = {}
+        self.__host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def set_host_limit(self, host: str, limit: int) -> None:
+        """
+        单独设置某个 host 的并发请求上限, 需在该 host 首次请求前设置
+        """
+        self.__host_limits[host] = limit
+        self.__host_semaphores.pop(host, None)
+
+    def __semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        semaphore = self.__host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.__host_limits.get(host, self.host_concurrency))
+            self.__host_semaphores[host] = semaphore
+        return semaphore
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # 未随 driver 启动时(如单独运行脚本)在首次请求时创建
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host,
+                use_dns_cache=True, ttl_dns_cache=self.dns_cache_ttl)
+            self.__session = aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS)
+        return self.__session
+
+    def start(self) -> None:
+        _ = self.session
+
+    async def close(self) -> None:
+        if self.__session is not None and not self.__session.closed:
+            await self.__session.close()
+        self.__session = None
+        self.__host_semaphores.clear()
+
+    @staticmethod
+    async def __save_file(resp: aiohttp.ClientResponse, save_path: str) -> str:
+        """
+        响应体分块写入文件, 文件操作均在线程池中执行
+        先写入临时文件, 完整下载后再替换, 避免留下不完整的文件
+        """
+        loop = asyncio.get_event_loop()
+        tmp_path = f'{save_path}.{os.getpid()}.tmp'
+        try:
+            f = await loop.run_in_executor(None, open, tmp_path, 'wb')
+            try:
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    await loop.run_in_executor(None, f.write, chunk)
+            finally:
+                await loop.run_in_executor(None, f.close)
+            await loop.run_in_executor(None, os.replace, tmp_path, save_path)
+        finally:
+            await loop.run_in_executor(None, _remove_file, tmp_path)
+        return save_path
+
+    async def request(self, method: str, url: str, *, response_type: str = 'json', default=None,
+                      params: dict = None, data=None, headers: dict = None, cookies: dict = None,
+                      timeout: float = 10, retry_times: int = None, save_path: str = None, **kwargs) -> Result:
+        """
+        :param response_type: 'json' / 'text' / 'bytes' / 'headers' / 'file'
+        :param save_path: response_type 为 'file' 时响应体分块写入的文件路径, 成功时 Result.result 为该路径
+        :param default: 请求失败时 Result.result 的值
+        :param retry_times: 最大尝试次数, 默认使用全局配置
+        :param kwargs: 其余参数原样传给 aiohttp, 如 allow_redirects
+        """
+        retry_times = self.retry_times if retry_times is None else retry_times
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        error_info = ''
+        for attempt in range(retry_times):
+            if attempt > 0:
+                backoff = min(self.retry_backoff * 2 ** (attempt - 1), self.max_backoff)
+                await asyncio.sleep(backoff + random.uniform(0, backoff / 2))
+            try:
+                async with self.__semaphore(url):
+                    async with self.session.request(
+                            method=method, url=url, params=params, data=data, headers=headers,
+                            cookies=cookies, timeout=client_timeout, **kwargs) as resp:
+                        if resp.status in RETRY_STATUS:
+                            error_info += f'Status {resp.status} Occurred in {method} {url} ' \
+                                          f'trying {attempt + 1} using paras: {params}\n'
+                            continue
+                        if resp.status >= 400:
+                            # 其余错误状态不重试, 也不将错误页面作为结果返回
+                            error_info += f'Status {resp.status} Occurred in {method} {url} ' \
+                                          f'trying {attempt + 1} using paras: {params}'
+                            logger.debug(error_info)
+                            return Result(error=True, info=error_info, result=default)
+                        if response_type == 'json':
+                            _res = await resp.json(content_type=None)
+                        elif response_type == 'text':
+                            _res = await resp.text()
+                        elif response_type == 'bytes':
+                            _res = await resp.read()
+                        elif response_type == 'file':
+                            _res = await self.__save_file(resp=resp, save_path=save_path)
+                        else:
+                            _res = dict(resp.headers)
+                return Result(error=False, info='Success', result=_res)
+            except Exception as e:
+                error_info += f'{repr(e)} Occurred in {method} {url} trying {attempt + 1} using paras: {params}\n'
+        error_info += f'Failed too many times in {method} {url} using paras: {params}'
+        logger.debug(error_info)
+        return Result(error=True, info=error_info, result=default)
+
+    async def get_json(self, url: str, params: dict = None, default=None, **kwargs) -> Result:
+        return await self.request('GET', url, response_type='json', params=params,
+                                  default={} if default is None else default, **kwargs)
+
+    async def post_json(self, url: str, data=None, default=None, **kwargs) -> Result:
+        return await self.request('POST', url, response_type='json', data=data,
+                                  default={} if default is None else default, **kwargs)
+
+    async def get_text(self, url: str, params: dict = None, **kwargs) -> Result:
+        return await self.request('GET', url, response_type='text', params=params, default='', **kwargs)
+
+    async def get_bytes(self, url: str, params: dict = None, **kwargs) -> Result:
+        return await self.request('GET', url, response_type='bytes', params=params, default=b'', **kwargs)
+
+    async def download(self, url: str, save_path: str, params: dict = None, **kwargs) -> Result:
+        return await self.request('GET', url, response_type='file', params=params, save_path=save_path,
+                                  default='', **kwargs)
+
+    async def get_headers(self, url: str, params: dict = None, **kwargs) -> Result:
+        return await self.request('GET', url, response_type='headers', params=params, default={}, **kwargs)
+
+
+# 全局 HTTP 客户端
+http_client = HttpClient(
+    limit=int(getattr(global_config, 'http_pool_limit', 100)),
+    limit_per_host=int(getattr(global_config, 'http_pool_limit_per_host', 10)),
+    dns_cache_ttl=int(getattr(global_config, 'http_dns_cache_ttl', 300)),
+    retry_times=int(getattr(global_config, 'http_retry_times', 3)),
+    retry_backoff=float(getattr(global_config, 'http_retry_backoff', 0.5)),
+    host_concurrency=int(getattr(global_config, 'http_host_concurrency', 8))
+)
+
+
+__all__ = [
+    'HttpClient',
+    'http_client'
+]
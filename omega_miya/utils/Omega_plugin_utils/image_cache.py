@@ -0,0 +1,379 @@
+"""
+全局图片缓存
+内存 LRU + 磁盘两级缓存, 以 URL 或 Pixiv PID 等字符串为键, 缓存原始图片字节
+同一键的并发请求会合并为一次下载, 缓存目录同时作为 file 模式下以 file:// 发送图片时的文件目录
+"""
+import os
+import time
+import asyncio
+import threading
+import base64
+import hashlib
+import pathlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from nonebot import logger, get_driver
+from omega_miya.utils.Omega_Base import Result
+
+
+global_config = get_driver().config
+DEFAULT_CACHE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir, 'cache', 'image'))
+
+
+class ImageCache(object):
+    """
+    内存层: 按最近使用排序的 OrderedDict, 总大小不超过 memory_budget 字节
+    磁盘层: 以键的 sha1 为文件名保存在 cache_dir, 总大小不超过 disk_budget 字节, 按文件修改时间淘汰
+    两层均在超过 ttl 秒后失效, 命中时刷新磁盘文件的修改时间
+    delivery_mode 默认为 base64, 图片以 base64:// 字符串发送, 不依赖 go-cqhttp 能否访问 bot 的文件系统
+    go-cqhttp 与 bot 共享文件系统时可设置为 file, 图片以缓存文件的 file:// 路径发送, 无需 base64 编码
+    """
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, memory_budget: int = 64 * 1024 * 1024,
+                 disk_budget: int = 1024 * 1024 * 1024, ttl: int = 7 * 24 * 3600, delivery_mode: str = 'base64'):
+        self.cache_dir = cache_dir
+        self.delivery_mode = delivery_mode
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.ttl = ttl
+        self.__memory: Dict[str, Tuple[float, bytes]] = OrderedDict()
+        self.__memory_size = 0
+        self.__disk_size: Optional[int] = None
+        # 磁盘层操作在线程池中执行, 磁盘占用统计及淘汰需加锁
+        self.__disk_lock = threading.RLock()
+        self.__pending: Dict[str, asyncio.Task] = {}
+        # 运行指标
+        self.__memory_hits = 0
+        self.__disk_hits = 0
+        self.__misses = 0
+        self.__coalesced = 0
+        self.__bytes_saved = 0
+
+    def stats(self) -> dict:
+        hits = self.__memory_hits + self.__disk_hits
+        total = hits + self.__misses
+        return {
+            'memory_hits': self.__memory_hits,
+            'disk_hits': self.__disk_hits,
+            'misses': self.__misses,
+            'coalesced': self.__coalesced,
+            'hit_rate': hits / total if total else 0.0,
+            'bytes_saved': self.__bytes_saved,
+            'memory_size': self.__memory_size,
+            'memory_items': len(self.__memory),
+            'disk_size': self.__disk_size or 0
+        }
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    # 内存层
+    def __memory_get(self, key: str) -> Optional[bytes]:
+        item = self.__memory.get(key)
+        if item is None:
+            return None
+        expire_at, data = item
+        if expire_at <= time.time():
+            self.__memory_pop(key)
+            return None
+        self.__memory.move_to_end(key)
+        return data
+
+    def __memory_pop(self, key: str) -> None:
+        item = self.__memory.pop(key, None)
+        if item is not None:
+            self.__memory_size -= len(item[1])
+
+    def __memory_set(self, key: str, data: bytes, expire_at: float) -> None:
+        # 超过内存预算四分之一的大图只保存在磁盘
+        if len(data) > self.memory_budget // 4:
+            return
+        self.__memory_pop(key)
+        self.__memory[key] = (expire_at, data)
+        self.__memory_size += len(data)
+        while self.__memory_size > self.memory_budget and self.__memory:
+            _, (_, evicted) = self.__memory.popitem(last=False)
+            self.__memory_size -= len(evicted)
+
+    # 磁盘层, 在线程池中执行
+    def __disk_get(self, key: str) -> Optional[Tuple[float, bytes]]:
+        path = self.path(key)
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime + self.ttl <= time.time():
+                self.__disk_remove(path)
+                return None
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 以修改时间作为最近使用时间
+            os.utime(path, None)
+            return time.time() + self.ttl, data
+        except FileNotFoundError:
+            return None
+
+    def __disk_remove(self, path: str) -> None:
+        with self.__disk_lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                return
+            if self.__disk_size is not None:
+                self.__disk_size -= size
+
+    def __disk_set(self, key: str, data: bytes) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        self.__disk_remove(path)
+        os.replace(tmp_path, path)
+        self.__disk_add(len(data))
+
+    def __disk_touch(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl <= time.time():
+                self.__disk_remove(path)
+                return None
+            os.utime(path, None)
+            return path
+        except FileNotFoundError:
+            return None
+
+    def __disk_account(self, path: str) -> None:
+        """
+        统计由外部直接写入缓存目录的文件并按预算淘汰
+        """
+        self.__disk_add(os.path.getsize(path))
+
+    def __disk_add(self, size: int) -> None:
+        with self.__disk_lock:
+            if self.__disk_size is None:
+                self.__disk_size = self.__scan_disk_size()
+            else:
+                self.__disk_size += size
+            if self.__disk_size > self.disk_budget:
+                self.__disk_evict()
+
+    def __scan_disk_size(self) -> int:
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        return sum(x.stat().st_size for x in self.__cache_files())
+
+    def __cache_files(self) -> list:
+        # 跳过其他线程正在写入的临时文件
+        return [x for x in os.scandir(self.cache_dir) if x.is_file() and not x.name.endswith('.tmp')]
+
+    def __disk_evict(self) -> None:
+        with self.__disk_lock:
+            self.__disk_size = self.__evict_files()
+
+    def __evict_files(self) -> int:
+        """
+        :return: 淘汰后的磁盘占用
+        """
+        now = time.time()
+        entries = sorted(self.__cache_files(), key=lambda x: x.stat().st_mtime)
+        size = sum(x.stat().st_size for x in entries)
+        # 先清除过期文件, 再按最久未使用淘汰至预算的 90%
+        for entry in entries:
+            if size <= self.disk_budget * 0.9 and entry.stat().st_mtime + self.ttl > now:
+                continue
+            try:
+                entry_size = entry.stat().st_size
+                os.remove(entry.path)
+                size -= entry_size
+            except FileNotFoundError:
+                continue
+        return size
+
+    def cleanup(self) -> None:
+        """
+        清除磁盘上的过期文件并按预算淘汰
+        """
+        if os.path.isdir(self.cache_dir):
+            self.__disk_evict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        data = self.__memory_get(key)
+        if data is not None:
+            self.__memory_hits += 1
+            self.__bytes_saved += len(data)
+            return data
+        return await self.__disk_load(key)
+
+    async def __disk_load(self, key: str) -> Optional[bytes]:
+        disk_item = await asyncio.get_event_loop().run_in_executor(None, self.__disk_get, key)
+        if disk_item is None:
+            return None
+        expire_at, data = disk_item
+        self.__disk_hits += 1
+        self.__bytes_saved += len(data)
+        self.__memory_set(key, data, expire_at)
+        return data
+
+    async def put(self, key: str, data: bytes) -> None:
+        self.__memory_set(key, data, time.time() + self.ttl)
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, self.__disk_set, key, data)
+        except Exception as e:
+            logger.warning(f'ImageCache: 写入磁盘缓存失败, key: {key}, error: {repr(e)}')
+
+    async def get_or_fetch(self, key: str, fetcher: Callable[[], Awaitable[Result]]) -> Result:
+        """
+        :param fetcher: 缓存未命中时调用, 返回 result 为图片字节的 Result
+        :return: result 为图片字节的 Result
+        """
+        data = self.__memory_get(key)
+        if data is not None:
+            self.__memory_hits += 1
+            self.__bytes_saved += len(data)
+            return Result(error=False, info='Cache hit', result=data)
+
+        # 合并同一键的并发请求(包括磁盘读取与下载)
+        return await self.__coalesce(pending_key=key, loader=lambda: self.__load_or_fetch(key=key, fetcher=fetcher))
+
+    async def __coalesce(self, pending_key: str, loader: Callable[[], Awaitable[Result]]) -> Result:
+        task = self.__pending.get(pending_key)
+        if task is not None:
+            self.__coalesced += 1
+        else:
+            # 加载在独立的 Task 中执行, 发起请求者被取消时其他等待中的请求仍可获得结果
+            task = asyncio.ensure_future(loader())
+            self.__pending[pending_key] = task
+            task.add_done_callback(lambda _: self.__pending.pop(pending_key, None))
+        return await asyncio.shield(task)
+
+    async def __load_or_fetch(self, key: str, fetcher: Callable[[], Awaitable[Result]]) -> Result:
+        try:
+            data = await self.__disk_load(key)
+            if data is not None:
+                return Result(error=False, info='Cache hit', result=data)
+            self.__misses += 1
+            _res = await fetcher()
+            if _res.success() and _res.result:
+                await self.put(key, _res.result)
+            return _res
+        except Exception as e:
+            return Result(error=True, info=f'ImageCache fetch error: {repr(e)}', result=b'')
+
+    async def get_file(self, key: str, fetcher: Callable[[], Awaitable[Result]] = None,
+                       downloader: Callable[[str], Awaitable[Result]] = None) -> Result:
+        """
+        确保图片保存在磁盘缓存中并返回文件路径, 图片内容不经过内存层
+        :param downloader: 接收目标文件路径并将图片直接写入(如流式下载), 优先使用
+        :param fetcher: 未提供 downloader 时使用, 返回 result 为图片字节的 Result
+        :return: result 为缓存文件路径的 Result
+        """
+        loop = asyncio.get_event_loop()
+        path = await loop.run_in_executor(None, self.__disk_touch, key)
+        if path is not None:
+            self.__disk_hits += 1
+            self.__bytes_saved += os.path.getsize(path)
+            return Result(error=False, info='Cache hit', result=path)
+
+        async def _load() -> Result:
+            self.__misses += 1
+            try:
+                if downloader is not None:
+                    await loop.run_in_executor(None, lambda: os.makedirs(self.cache_dir, exist_ok=True))
+                    _res = await downloader(self.path(key))
+                    if not _res.success():
+                        return _res
+                    await loop.run_in_executor(None, self.__disk_account, self.path(key))
+                else:
+                    _res = await fetcher()
+                    if not _res.success() or not _res.result:
+                        return _res
+                    await loop.run_in_executor(None, self.__disk_set, key, _res.result)
+                return Result(error=False, info='Success', result=self.path(key))
+            except Exception as e:
+                return Result(error=True, info=f'ImageCache get file error: {repr(e)}', result='')
+
+        return await self.__coalesce(pending_key=f'file:{key}', loader=_load)
+
+    async def get_source(self, key: str, fetcher: Callable[[], Awaitable[Result]] = None,
+                         downloader: Callable[[str], Awaitable[Result]] = None) -> Result:
+        """
+        获取可直接用于 MessageSegment.image 的图片来源
+        delivery_mode 为 file 时返回缓存文件的 file:// 路径, 失败或为 base64 模式时返回 base64:// 字符串
+        """
+        if self.delivery_mode == 'file':
+            _res = await self.get_file(key=key, fetcher=fetcher, downloader=downloader)
+            if _res.success():
+                return Result(error=False, info='Success', result=pathlib.Path(_res.result).as_uri())
+            logger.warning(f'ImageCache: 获取图片文件失败, 使用 base64 发送, key: {key}, error: {_res.info}')
+
+        if fetcher is None:
+            _res = await self.__get_or_download(key=key, downloader=downloader)
+        else:
+            _res = await self.get_or_fetch(key=key, fetcher=fetcher)
+        if not _res.success():
+            return Result(error=True, info=_res.info, result='')
+        return Result(error=False, info='Success', result=self.b64_source(_res.result))
+
+    async def __get_or_download(self, key: str, downloader: Callable[[str], Awaitable[Result]]) -> Result:
+        """
+        downloader 直接写入磁盘缓存文件, 再在线程池中读入内存层, 图片只写入磁盘一次
+        :return: result 为图片字节的 Result
+        """
+        data = self.__memory_get(key)
+        if data is not None:
+            self.__memory_hits += 1
+            self.__bytes_saved += len(data)
+            return Result(error=False, info='Cache hit', result=data)
+
+        async def _load() -> Result:
+            file_res = await self.get_file(key=key, downloader=downloader)
+            if not file_res.success():
+                return Result(error=True, info=file_res.info, result=b'')
+            try:
+                data_ = await asyncio.get_event_loop().run_in_executor(None, self.__read_file, file_res.result)
+            except Exception as e:
+                return Result(error=True, info=f'ImageCache read file error: {repr(e)}', result=b'')
+            self.__memory_set(key, data_, time.time() + self.ttl)
+            return Result(error=False, info='Success', result=data_)
+
+        return await self.__coalesce(pending_key=key, loader=_load)
+
+    @staticmethod
+    def __read_file(path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    async def bytes_source(self, data: bytes, key: str = None) -> str:
+        """
+        本地生成的图片(如表情包)按 delivery_mode 转换为图片来源
+        file 模式下写入磁盘缓存(不进入内存层)并返回 file:// 路径, 写入失败或为 base64 模式时返回 base64:// 字符串
+        :param key: 缓存键, 默认为图片内容的 sha1
+        """
+        if self.delivery_mode == 'file':
+            key = key if key is not None else f'bytes:{hashlib.sha1(data).hexdigest()}'
+            try:
+                await asyncio.get_event_loop().run_in_executor(None, self.__disk_set, key, data)
+                return pathlib.Path(self.path(key)).as_uri()
+            except Exception as e:
+                logger.warning(f'ImageCache: 写入磁盘缓存失败, 使用 base64 发送, key: {key}, error: {repr(e)}')
+        return self.b64_source(data)
+
+    @staticmethod
+    def b64_source(data: bytes) -> str:
+        return 'base64://' + str(base64.b64encode(data), encoding='utf-8')
+
+
+# 全局图片缓存
+image_cache = ImageCache(
+    cache_dir=str(getattr(global_config, 'image_cache_dir', DEFAULT_CACHE_DIR)),
+    memory_budget=int(getattr(global_config, 'image_cache_memory_mb', 64)) * 1024 * 1024,
+    disk_budget=int(getattr(global_config, 'image_cache_disk_mb', 1024)) * 1024 * 1024,
+    ttl=int(getattr(global_config, 'image_cache_ttl', 7 * 24 * 3600)),
+    delivery_mode=str(getattr(global_config, 'image_delivery_mode', 'base64')).lower()
+)
+
+
+__all__ = [
+    'ImageCache',
+    'image_cache'
+]
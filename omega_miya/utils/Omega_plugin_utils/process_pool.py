@@ -0,0 +1,184 @@
+"""
+共享进程池
+CPU 密集的任务(字幕检查, 图片渲染等)放到子进程中执行, 避免阻塞事件循环
+子进程以 fork 方式创建并在启动时预先创建好, 任务函数须为模块顶层函数, 参数与返回值须可 pickle
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+from typing import Callable, Dict, Hashable, Optional
+from nonebot import logger, get_driver
+from omega_miya.utils.Omega_Base import Result
+
+
+global_config = get_driver().config
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+class ProcessPoolRunner(object):
+    """
+    进程池任务调度
+    同时提交到进程池的任务数不超过 max_workers, 其余任务在事件循环中排队, 排队数超过 queue_limit 时直接拒绝
+    可按 key(如群号)限制同一来源同时执行的任务数
+    任务超时后终止整个进程池并重建, 此时同一进程池中正在执行的其他任务也会失败
+    按任务名称统计排队数, 执行数及耗时
+    """
+    def __init__(self, max_workers: int = 2, queue_limit: int = 64, default_timeout: float = 60):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.default_timeout = default_timeout
+        self.__executor: Optional[ProcessPoolExecutor] = None
+        self.__slots: Optional[asyncio.Semaphore] = None
+        # key -> [信号量, 使用中的任务数], 无任务使用时删除
+        self.__key_slots: Dict[Hashable, list] = {}
+        self.__queued = 0
+        self.__running = 0
+        self.__task_metrics: Dict[str, dict] = {}
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context('fork'))
+        return self.__executor
+
+    def start(self) -> None:
+        """
+        预先创建全部子进程, 尽量在 bot 启动初期其他线程较少时完成 fork
+        """
+        for _ in range(self.max_workers):
+            self.executor.submit(_warm_up)
+
+    async def close(self) -> None:
+        if self.__executor is not None:
+            await asyncio.get_event_loop().run_in_executor(None, self.__executor.shutdown)
+            self.__executor = None
+
+    def __recycle(self) -> None:
+        """
+        终止当前进程池中的全部子进程, 之后的任务使用新的进程池
+        """
+        executor, self.__executor = self.__executor, None
+        if executor is None:
+            return
+        # ProcessPoolExecutor 不支持终止正在执行的任务, 只能直接终止其子进程
+        for process in list(getattr(executor, '_processes', {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
+
+    def __task_metric(self, name: str) -> dict:
+        metric = self.__task_metrics.get(name)
+        if metric is None:
+            metric = self.__task_metrics[name] = {
+                'queued': 0, 'running': 0, 'completed': 0, 'failed': 0, 'timeout': 0, 'rejected': 0,
+                'total_latency': 0.0, 'max_latency': 0.0}
+        return metric
+
+    def metrics(self) -> dict:
+        tasks = {}
+        for name, metric in self.__task_metrics.items():
+            finished = metric['completed'] + metric['failed'] + metric['timeout']
+            tasks[name] = dict(metric, avg_latency=metric['total_latency'] / finished if finished else 0.0)
+        return {
+            'max_workers': self.max_workers,
+            'queued': self.__queued,
+            'running': self.__running,
+            'tasks': tasks
+        }
+
+    async def run(self, func: Callable, *args, name: str = None, key: Hashable = None, key_limit: int = 1,
+                  timeout: float = None, **kwargs) -> Result:
+        """
+        在进程池中执行 func(*args, **kwargs)
+        :param name: 任务名称, 用于统计, 默认为函数名
+        :param key: 限制并发的来源标识, 同一 key 同时最多执行 key_limit 个任务
+        :param timeout: 执行超时时间(秒), 不含排队时间
+        :return: result 为 func 的返回值
+        """
+        name = name or getattr(func, '__name__', 'task')
+        timeout = self.default_timeout if timeout is None else timeout
+        metric = self.__task_metric(name)
+        if self.__queued >= self.queue_limit:
+            metric['rejected'] += 1
+            return Result(error=True, info='Process pool queue full', result=None)
+        if self.__slots is None:
+            self.__slots = asyncio.Semaphore(self.max_workers)
+
+        key_slot = None
+        if key is not None:
+            key_slot = self.__key_slots.setdefault(key, [asyncio.Semaphore(key_limit), 0])
+            key_slot[1] += 1
+
+        start = monotonic()
+        queued = True
+        self.__queued += 1
+        metric['queued'] += 1
+        try:
+            if key_slot is not None:
+                await key_slot[0].acquire()
+            try:
+                async with self.__slots:
+                    queued = False
+                    self.__queued -= 1
+                    metric['queued'] -= 1
+                    self.__running += 1
+                    metric['running'] += 1
+                    try:
+                        return await self.__execute(func, args, kwargs, name, timeout, metric, start)
+                    finally:
+                        self.__running -= 1
+                        metric['running'] -= 1
+            finally:
+                if key_slot is not None:
+                    key_slot[0].release()
+        finally:
+            # 排队期间被取消
+            if queued:
+                self.__queued -= 1
+                metric['queued'] -= 1
+            if key_slot is not None:
+                key_slot[1] -= 1
+                if key_slot[1] <= 0:
+                    self.__key_slots.pop(key, None)
+
+    async def __execute(self, func: Callable, args: tuple, kwargs: dict, name: str, timeout: float,
+                        metric: dict, start: float) -> Result:
+        executor = self.executor
+        future = executor.submit(functools.partial(func, *args, **kwargs))
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+            metric['completed'] += 1
+            return Result(error=False, info='Success', result=result)
+        except asyncio.TimeoutError:
+            metric['timeout'] += 1
+            logger.warning(f'ProcessPoolRunner: 任务 {name} 执行超过 {timeout} 秒, 重建进程池')
+            if executor is self.__executor:
+                self.__recycle()
+            return Result(error=True, info=f'Task {name} timeout', result=None)
+        except Exception as e:
+            metric['failed'] += 1
+            return Result(error=True, info=f'Task {name} failed: {repr(e)}', result=None)
+        finally:
+            latency = monotonic() - start
+            metric['total_latency'] += latency
+            metric['max_latency'] = max(metric['max_latency'], latency)
+
+
+# 全局进程池
+process_pool = ProcessPoolRunner(
+    max_workers=int(getattr(global_config, 'process_pool_workers', min(4, os.cpu_count() or 1))),
+    queue_limit=int(getattr(global_config, 'process_pool_queue_limit', 64)),
+    default_timeout=float(getattr(global_config, 'process_pool_timeout', 60))
+)
+
+
+__all__ = [
+    'ProcessPoolRunner',
+    'process_pool'
+]
@@ -15,7 +15,7 @@ def has_notice_permission() -> Rule:
         if detail_type != 'group':
             return False
         else:
-            if DBGroup(group_id=group_id).permission_notice().result == 1:
+            if (await DBGroup(group_id=group_id).async_cached_permission_info()).result.get('notice') == 1:
                 return True
             else:
                 return False
@@ -30,7 +30,7 @@ def has_command_permission() -> Rule:
         if detail_type != 'group':
             return False
         else:
-            if DBGroup(group_id=group_id).permission_command().result == 1:
+            if (await DBGroup(group_id=group_id).async_cached_permission_info()).result.get('command') == 1:
                 return True
             else:
                 return False
@@ -46,7 +46,7 @@ def permission_level(level: int) -> Rule:
         if detail_type != 'group':
             return False
         else:
-            if DBGroup(group_id=group_id).permission_level().result >= level:
+            if (await DBGroup(group_id=group_id).async_cached_permission_info()).result.get('level', -1) >= level:
                 return True
             else:
                 return False
@@ -62,11 +62,11 @@ def has_auth_node(*auth_nodes: str) -> Rule:
         user_id = event.dict().get('user_id')
         # 检查当前消息类型
         if detail_type == 'private':
-            allow_tag = DBAuth(auth_id=user_id, auth_type='user', auth_node=auth_node).allow_tag().result
-            deny_tag = DBAuth(auth_id=user_id, auth_type='user', auth_node=auth_node).deny_tag().result
+            allow_tag, deny_tag = \
+                (await DBAuth(auth_id=user_id, auth_type='user', auth_node=auth_node).async_cached_tags()).result
         elif detail_type == 'group' or detail_type == 'group_upload':
-            allow_tag = DBAuth(auth_id=group_id, auth_type='group', auth_node=auth_node).allow_tag().result
-            deny_tag = DBAuth(auth_id=group_id, auth_type='group', auth_node=auth_node).deny_tag().result
+            allow_tag, deny_tag = \
+                (await DBAuth(auth_id=group_id, auth_type='group', auth_node=auth_node).async_cached_tags()).result
         else:
             allow_tag = 0
             deny_tag = 0
@@ -95,18 +95,18 @@ def has_level_or_node(level: int, *auth_nodes: str) -> Rule:
         if detail_type != 'group':
             level_checker = False
         else:
-            if DBGroup(group_id=group_id).permission_level().result >= level:
+            if (await DBGroup(group_id=group_id).async_cached_permission_info()).result.get('level', -1) >= level:
                 level_checker = True
             else:
                 level_checker = False
 
         # node检查部分
         if detail_type == 'private':
-            allow_tag = DBAuth(auth_id=user_id, auth_type='user', auth_node=auth_node).allow_tag().result
-            deny_tag = DBAuth(auth_id=user_id, auth_type='user', auth_node=auth_node).deny_tag().result
+            allow_tag, deny_tag = \
+                (await DBAuth(auth_id=user_id, auth_type='user', auth_node=auth_node).async_cached_tags()).result
         elif detail_type == 'group':
-            allow_tag = DBAuth(auth_id=group_id, auth_type='group', auth_node=auth_node).allow_tag().result
-            deny_tag = DBAuth(auth_id=group_id, auth_type='group', auth_node=auth_node).deny_tag().result
+            allow_tag, deny_tag = \
+                (await DBAuth(auth_id=group_id, auth_type='group', auth_node=auth_node).async_cached_tags()).result
         else:
             allow_tag = 0
             deny_tag = 0
@@ -0,0 +1,86 @@
+"""
+插件进程内状态存储
+为按群组/用户保存运行状态的插件提供有界的 LRU 存储, 长时间不活跃的条目自动淘汰
+"""
+import hashlib
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+
+T = TypeVar('T')
+
+
+def msg_digest(msg: str) -> bytes:
+    """
+    消息摘要, 用于比较消息是否相同而无需保存消息原文
+    """
+    return hashlib.blake2b(msg.encode('utf-8'), digest_size=16).digest()
+
+
+class StateStore(Generic[T]):
+    """
+    LRU 状态存储
+    get 时不存在的键由 factory 创建, 条目数超过 max_size 时淘汰最久未访问的条目
+    超过 idle_ttl 秒未访问的条目视为不活跃, 在每次访问时从最久未访问的一端顺带淘汰, 无需后台任务
+    状态对象建议使用 __slots__ 定义以减少内存占用
+    """
+    def __init__(self, factory: Callable[[], T], max_size: int = 1024, idle_ttl: float = 24 * 3600):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        # key -> (最后访问时间, 状态)
+        self.__items: Dict[Hashable, list] = OrderedDict()
+        self.__evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.__items
+
+    def __evict(self, now: float) -> None:
+        while self.__items:
+            key, (accessed_at, _) = next(iter(self.__items.items()))
+            if len(self.__items) <= self.max_size and now - accessed_at < self.idle_ttl:
+                break
+            del self.__items[key]
+            self.__evicted += 1
+
+    def get(self, key: Hashable) -> T:
+        now = monotonic()
+        item = self.__items.get(key)
+        if item is None:
+            item = self.__items[key] = [now, self.factory()]
+        else:
+            item[0] = now
+            self.__items.move_to_end(key)
+        self.__evict(now)
+        return item[1]
+
+    def peek(self, key: Hashable) -> Optional[T]:
+        """
+        获取状态但不刷新访问时间, 不存在时返回 None
+        """
+        item = self.__items.get(key)
+        return item[1] if item is not None else None
+
+    def pop(self, key: Hashable) -> Optional[T]:
+        item = self.__items.pop(key, None)
+        return item[1] if item is not None else None
+
+    def clear(self) -> None:
+        self.__items.clear()
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self.__items),
+            'max_size': self.max_size,
+            'evicted': self.__evicted
+        }
+
+
+__all__ = [
+    'StateStore',
+    'msg_digest'
+]
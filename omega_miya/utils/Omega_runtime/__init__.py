@@ -0,0 +1,46 @@
+"""
+共享资源生命周期管理
+随 driver 启动与关闭全局进程池, HTTP 客户端, 图片缓存的定时清理任务及数据库异步连接池
+bot.py 会将 omega_miya/utils 下的包作为插件再次导入, 生命周期钩子须在插件中注册,
+不能在 Omega_Base / Omega_plugin_utils 中随模块导入注册, 否则会对另一份模块副本再次启动相同的资源
+"""
+import asyncio
+from typing import Optional
+from nonebot import get_driver, logger
+from omega_miya.utils.Omega_Base.database import NBdb
+from omega_miya.utils.Omega_plugin_utils import http_client, image_cache, process_pool
+
+
+# 定时清理图片缓存目录的间隔(秒)
+IMAGE_CACHE_CLEANUP_INTERVAL = 3600
+_cleanup_task: Optional[asyncio.Task] = None
+
+
+async def _cleanup_image_cache_loop():
+    while True:
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, image_cache.cleanup)
+        except Exception as e:
+            logger.warning(f'ImageCache: 清理缓存目录失败, error: {repr(e)}')
+        await asyncio.sleep(IMAGE_CACHE_CLEANUP_INTERVAL)
+
+
+@get_driver().on_startup
+async def start_runtime():
+    global _cleanup_task
+    # 进程池尽量在启动初期其他线程较少时 fork
+    process_pool.start()
+    http_client.start()
+    if _cleanup_task is None or _cleanup_task.done():
+        _cleanup_task = asyncio.get_event_loop().create_task(_cleanup_image_cache_loop())
+
+
+@get_driver().on_shutdown
+async def close_runtime():
+    if _cleanup_task is not None:
+        _cleanup_task.cancel()
+    logger.info(f'Image cache stats: {image_cache.stats()}')
+    await http_client.close()
+    logger.info(f'Process pool metrics: {process_pool.metrics()}')
+    await process_pool.close()
+    await NBdb.dispose_async_engine()
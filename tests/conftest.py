@@ -0,0 +1,104 @@
+"""
+测试公共配置
+Omega_Base 在导入时即连接数据库, 测试中以仅提供 Result 及数据库替身的模块代替
+各包的 __init__ 会导入全部插件及其依赖, 测试中只注册各包的路径而不执行 __init__, 被测模块按完整模块名直接导入
+"""
+import importlib
+import os
+import socket
+import sys
+import types
+import nonebot
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_PATH not in sys.path:
+    sys.path.insert(0, ROOT_PATH)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# 外部 API 指向本地替身服务器, 由各测试在该地址启动
+STUB_API_HOST = f'http://127.0.0.1:{_free_port()}'
+
+# 使用项目默认配置, 保证各模块读取的可选配置项存在
+nonebot.init(_env_file=os.path.join(ROOT_PATH, '.env.dev'),
+             bili_live_api_host=STUB_API_HOST, bili_api_host=STUB_API_HOST)
+
+
+class Result(object):
+    def __init__(self, error: bool, info: str, result):
+        self.error = error
+        self.info = info
+        self.result = result
+
+    def success(self) -> bool:
+        return not self.error
+
+    def __repr__(self):
+        return f'<DBResult(error={self.error}, info={self.info}, result={self.result})>'
+
+
+class DBCoolDownEvent(object):
+    """
+    记录回写调用, 不访问数据库
+    """
+    writes = []
+    active_events = []
+
+    @classmethod
+    async def __add(cls, *args) -> Result:
+        cls.writes.append(args)
+        return Result(error=False, info='Success', result=0)
+
+    @classmethod
+    async def async_add_global_cool_down_event(cls, stop_at):
+        return await cls.__add('global', None, None, stop_at)
+
+    @classmethod
+    async def async_add_plugin_cool_down_event(cls, plugin, stop_at):
+        return await cls.__add('plugin', plugin, None, stop_at)
+
+    @classmethod
+    async def async_add_group_cool_down_event(cls, plugin, group_id, stop_at):
+        return await cls.__add('group', plugin, group_id, stop_at)
+
+    @classmethod
+    async def async_add_user_cool_down_event(cls, plugin, user_id, stop_at):
+        return await cls.__add('user', plugin, user_id, stop_at)
+
+    @classmethod
+    async def async_clear_time_out_event(cls) -> Result:
+        return Result(error=False, info='Success', result=0)
+
+    @classmethod
+    async def async_list_active_events(cls) -> Result:
+        return Result(error=False, info='Success', result=list(cls.active_events))
+
+
+def _register_package(name: str, path: str) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__path__ = [os.path.join(ROOT_PATH, path)]
+    sys.modules[name] = module
+    return module
+
+
+for _root, _dirs, _files in os.walk(os.path.join(ROOT_PATH, 'omega_miya')):
+    _dirs[:] = [x for x in _dirs if x != '__pycache__']
+    if '__init__.py' in _files:
+        _path = os.path.relpath(_root, ROOT_PATH)
+        _register_package(_path.replace(os.sep, '.'), _path)
+
+_omega_base = sys.modules['omega_miya.utils.Omega_Base']
+_omega_base.Result = Result
+_omega_base.DBCoolDownEvent = DBCoolDownEvent
+
+# 与 Omega_plugin_utils/__init__ 一致, 导出不依赖数据库的共享组件, 供插件模块导入
+_plugin_utils = sys.modules['omega_miya.utils.Omega_plugin_utils']
+for _name in ('http_client', 'image_cache', 'dispatcher', 'process_pool', 'state_store'):
+    _module = importlib.import_module(f'omega_miya.utils.Omega_plugin_utils.{_name}')
+    for _attr in _module.__all__:
+        setattr(_plugin_utils, _attr, getattr(_module, _attr))
@@ -0,0 +1,92 @@
+import asyncio
+from urllib.parse import urlparse
+from aiohttp import web
+from nonebot import get_driver
+from omega_miya.utils.Omega_plugin_utils import http_client
+from omega_miya.plugins.bilibili_live_monitor.utils import fetch_live_info_with_name
+
+# 批量接口中 uname 为空的直播间
+NO_NAME_ROOMS = {3, 13, 43}
+# 批量接口未返回的直播间
+MISSING_ROOMS = {5}
+# 以短号订阅的直播间: 短号 -> 长号
+SHORT_ROOMS = {7: 1007}
+
+
+def _uid(room_id: int) -> int:
+    return room_id + 1000
+
+
+def _room(room_id: int) -> dict:
+    return {'live_status': 1, 'title': f'title{room_id}', 'live_time': '2021-01-01 00:00:00',
+            'uid': _uid(room_id), 'cover': '', 'user_cover': ''}
+
+
+def test_fetch_live_info_with_name():
+    requests = {'batch': [], 'single': [], 'user': []}
+
+    async def batch(request: web.Request):
+        room_ids = [int(x) for x in request.query.getall('room_ids')]
+        requests['batch'].append(room_ids)
+        # 第二批整批失败
+        if 21 in room_ids:
+            return web.json_response({'code': -400, 'message': 'request error'})
+        by_room_ids = {}
+        for room_id in room_ids:
+            if room_id in MISSING_ROOMS:
+                continue
+            item = dict(_room(room_id), room_id=SHORT_ROOMS.get(room_id, room_id), short_id=0,
+                        uname='' if room_id in NO_NAME_ROOMS else f'up{room_id}')
+            if room_id in SHORT_ROOMS:
+                item['short_id'] = room_id
+            by_room_ids[str(item['room_id'])] = item
+        return web.json_response({'code': 0, 'data': {'by_room_ids': by_room_ids}})
+
+    async def single(request: web.Request):
+        room_id = int(request.query['id'])
+        requests['single'].append(room_id)
+        if room_id == 30:
+            return web.json_response({'code': 1, 'message': 'room not found'})
+        return web.json_response({'code': 0, 'data': dict(_room(room_id), live_status=0)})
+
+    async def user(request: web.Request):
+        uid = int(request.query['mid'])
+        requests['user'].append(uid)
+        if uid == _uid(33):
+            return web.json_response({'code': -404, 'message': 'user not found'})
+        return web.json_response({'code': 0, 'data': {'name': f'name{uid}'}})
+
+    async def main():
+        app = web.Application()
+        app.add_routes([web.get('/xlive/web-room/v1/index/getRoomBaseInfo', batch),
+                        web.get('/room/v1/Room/get_info', single),
+                        web.get('/x/space/acc/info', user)])
+        runner = web.AppRunner(app)
+        await runner.setup()
+        host = urlparse(get_driver().config.bili_live_api_host)
+        await web.TCPSite(runner, host.hostname, host.port).start()
+        try:
+            return await fetch_live_info_with_name(room_ids=list(range(1, 46)))
+        finally:
+            await http_client.close()
+            await runner.cleanup()
+
+    live_infos = asyncio.run(main())
+
+    # 每 20 个直播间一批
+    assert [len(x) for x in requests['batch']] == [20, 20, 5]
+    # 失败批次及批量接口未返回的直播间逐个获取
+    assert sorted(requests['single']) == sorted(list(range(21, 41)) + list(MISSING_ROOMS))
+    # 直播间或UP信息获取失败的直播间不在结果中
+    assert set(live_infos) == set(range(1, 46)) - {30, 33}
+
+    for room_id, live_info in live_infos.items():
+        from_batch = not 21 <= room_id <= 40 and room_id not in MISSING_ROOMS
+        if from_batch and room_id not in NO_NAME_ROOMS:
+            assert live_info['uname'] == f'up{room_id}'
+        else:
+            assert live_info['uname'] == f'name{_uid(room_id)}'
+        assert live_info['status'] == (1 if from_batch else 0)
+    assert live_infos[7]['url'].endswith('/1007')
+    assert sorted(requests['user']) == sorted(
+        _uid(x) for x in NO_NAME_ROOMS | MISSING_ROOMS | set(range(21, 41)) if x != 30)
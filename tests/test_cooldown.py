@@ -0,0 +1,61 @@
+import asyncio
+import datetime
+from omega_miya.utils.Omega_Base import DBCoolDownEvent
+from omega_miya.utils.Omega_plugin_utils.cooldown import CoolDownEngine
+
+
+def test_check_and_expire():
+    engine = CoolDownEngine(write_behind=False)
+    now = datetime.datetime.now()
+    assert engine.check(event_type='global').result == 0
+
+    engine.set(event_type='global', stop_at=now + datetime.timedelta(minutes=1))
+    engine.set(event_type='group', plugin='setu', target_id=1, stop_at=now + datetime.timedelta(minutes=1))
+    assert engine.check(event_type='global').result == 1
+    assert engine.check(event_type='group', plugin='setu', target_id=1).result == 1
+    # 键包含插件与目标
+    assert engine.check(event_type='group', plugin='setu', target_id=2).result == 0
+    assert engine.check(event_type='group', plugin='pixiv', target_id=1).result == 0
+    assert engine.check(event_type='user', plugin='setu', target_id=1).result == 0
+
+    # 过期事件在查询时判断
+    engine.set(event_type='user', plugin='setu', target_id=1, stop_at=now - datetime.timedelta(seconds=1))
+    assert engine.check(event_type='user', plugin='setu', target_id=1).result == 0
+    assert len(engine) == 2
+
+
+def test_set_purges_expired_and_keeps_updated():
+    engine = CoolDownEngine(write_behind=False)
+    now = datetime.datetime.now()
+    for user_id in range(10):
+        engine.set(event_type='user', plugin='setu', target_id=user_id, stop_at=now - datetime.timedelta(seconds=1))
+    # 更新后的事件不受堆中旧记录影响
+    engine.set(event_type='user', plugin='setu', target_id=0, stop_at=now + datetime.timedelta(minutes=1))
+    engine.set(event_type='global', stop_at=now + datetime.timedelta(minutes=1))
+    assert len(engine) == 2
+    assert engine.check(event_type='user', plugin='setu', target_id=0).result == 1
+
+
+def test_write_behind_and_load():
+    DBCoolDownEvent.writes.clear()
+    now = datetime.datetime.now()
+    stop_at = now + datetime.timedelta(minutes=5)
+
+    async def main():
+        engine = CoolDownEngine(write_behind=True)
+        engine.set(event_type='group', plugin='setu', target_id=1, stop_at=stop_at)
+        engine.set(event_type='plugin', plugin='setu', stop_at=stop_at, persist=False)
+        await engine.flush()
+
+        DBCoolDownEvent.active_events = [('user', 'setu', None, 2, stop_at), ('global', None, None, None, stop_at)]
+        restored = CoolDownEngine(write_behind=True)
+        _res = await restored.load()
+        await restored.flush()
+        return restored, _res
+
+    restored, _res = asyncio.run(main())
+    # 恢复的事件不再回写
+    assert DBCoolDownEvent.writes == [('group', 'setu', 1, stop_at)]
+    assert _res.result == 2
+    assert restored.check(event_type='user', plugin='setu', target_id=2).result == 1
+    assert restored.check(event_type='global').result == 1
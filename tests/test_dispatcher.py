@@ -0,0 +1,66 @@
+import asyncio
+import httpx
+from nonebot.adapters.cqhttp.exception import ActionFailed, NetworkError
+from omega_miya.utils.Omega_plugin_utils import dispatcher
+from omega_miya.utils.Omega_plugin_utils.dispatcher import NoticeDispatcher, TokenBucket
+
+
+class FakeBot(object):
+    def __init__(self, self_id: str, errors: list):
+        self.self_id = self_id
+        self.errors = errors
+        self.sent = []
+
+    async def call_api(self, api: str, **data):
+        if api == 'get_group_list':
+            return [{'group_id': 1}]
+        self.sent.append(data)
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+def _connect_error() -> NetworkError:
+    try:
+        try:
+            raise httpx.ConnectError('refused')
+        except httpx.HTTPError:
+            raise NetworkError('HTTP request failed')
+    except NetworkError as e:
+        return e
+
+
+def _send(monkeypatch, errors: list):
+    bot = FakeBot('10000', errors)
+    monkeypatch.setattr(dispatcher, 'get_bots', lambda: {bot.self_id: bot})
+    notice = NoticeDispatcher(rate=100, burst=10, retry_times=3, retry_backoff=0.001)
+    _res = asyncio.run(notice.send_group_msg(group_ids=[1], message='test'))
+    return bot, notice, _res
+
+
+def test_retry_pre_send_errors(monkeypatch):
+    bot, notice, _res = _send(monkeypatch, [ActionFailed(retcode=100), _connect_error()])
+    assert _res.success()
+    assert len(bot.sent) == 3
+    assert notice.metrics()['retried'] == 2
+
+
+def test_timeout_not_resent(monkeypatch):
+    bot, notice, _res = _send(monkeypatch, [NetworkError('WebSocket API call timeout')])
+    assert not _res.success()
+    assert len(bot.sent) == 1
+    assert notice.metrics()['unknown'] == 1
+    assert notice.metrics()['retried'] == 0
+
+
+
+def test_token_bucket_rate():
+    async def main():
+        bucket = TokenBucket(rate=50, capacity=2)
+        start = asyncio.get_event_loop().time()
+        for _ in range(7):
+            await bucket.acquire()
+        return asyncio.get_event_loop().time() - start
+
+    # 前 2 个令牌立即可用, 其余 5 个按每秒 50 个补充
+    elapsed = asyncio.run(main())
+    assert 0.08 <= elapsed < 0.5
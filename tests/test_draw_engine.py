@@ -0,0 +1,66 @@
+import json
+import os
+import numpy as np
+import pytest
+from omega_miya.plugins.draw.deck.engine import AliasTable, CompiledDeck
+
+
+def test_alias_table_probabilities():
+    weights = [1, 0, 3, 6, 0.5]
+    table = AliasTable(weights)
+    total = sum(weights)
+    assert np.allclose(table.probabilities(), [x / total for x in weights])
+
+    for invalid in ([], [0, 0], [1, -1]):
+        with pytest.raises(ValueError):
+            AliasTable(invalid)
+
+
+def test_alias_table_sampling():
+    weights = [1, 0, 3, 6]
+    table = AliasTable(weights)
+    samples = table.sample_array(200000, rng=np.random.default_rng(1))
+    assert samples.dtype.kind == 'i'
+    frequency = np.bincount(samples, minlength=len(weights)) / len(samples)
+    assert np.allclose(frequency, [0.1, 0.0, 0.3, 0.6], atol=0.01)
+
+    assert table.sample_many(0) == []
+    assert len(table.sample_many(1)) == 1
+    # 同一随机数生成器状态下结果可复现
+    assert table.sample_many(10, rng=np.random.default_rng(2)) == table.sample_many(10, rng=np.random.default_rng(2))
+    assert all(x != 1 for x in table.sample_many(1000)) and all(table.sample() != 1 for _ in range(1000))
+
+
+def _compiler(data: dict):
+    items = [(name, star) for name, star in data['items']]
+    return items, [x[1] for x in items], f'{len(items)} items'
+
+
+def test_compiled_deck_reload(tmp_path):
+    data_file = tmp_path / 'deck.json'
+    data_file.write_text(json.dumps({'items': [['a', 1], ['b', 3]]}), encoding='utf-8')
+    deck = CompiledDeck(name='test', data_file=str(data_file), compiler=_compiler, check_interval=0)
+
+    draws = deck.draw_many(1000)
+    assert deck.version == 1 and deck.info == '2 items'
+    assert {x[0] for x in draws} == {'a', 'b'}
+    assert all(isinstance(x, tuple) for x in draws)
+    assert deck.draw_many(0) == [] and len(deck.draw_many(1)) == 1 and deck.draw() in deck.items
+
+    # 数据文件变化后重新编译
+    data_file.write_text(json.dumps({'items': [['c', 1]]}), encoding='utf-8')
+    os.utime(data_file, (1, 1))
+    assert deck.draw_many(5) == [('c', 1)] * 5
+    assert deck.version == 2
+
+    # 编译失败时保留原卡组
+    data_file.write_text(json.dumps({'items': [['d', 0]]}), encoding='utf-8')
+    os.utime(data_file, (2, 2))
+    assert deck.draw() == ('c', 1)
+    assert deck.version == 2
+
+
+def test_compiled_deck_missing_file(tmp_path):
+    deck = CompiledDeck(name='test', data_file=str(tmp_path / 'missing.json'), compiler=_compiler)
+    with pytest.raises(RuntimeError):
+        deck.draw()
@@ -0,0 +1,57 @@
+import asyncio
+from aiohttp import web
+from omega_miya.utils.Omega_plugin_utils.http_client import HttpClient
+
+
+async def _serve(routes) -> web.AppRunner:
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner
+
+
+def _port(runner: web.AppRunner) -> int:
+    return runner.addresses[0][1]
+
+
+def test_download_and_status(tmp_path):
+    counts = {'flaky': 0}
+
+    async def image(_):
+        return web.Response(body=b'x' * 200 * 1024)
+
+    async def missing(_):
+        return web.Response(status=404, text='not found')
+
+    async def flaky(_):
+        counts['flaky'] += 1
+        if counts['flaky'] < 2:
+            return web.Response(status=503)
+        return web.json_response({'ok': True})
+
+    async def main():
+        runner = await _serve([web.get('/image', image), web.get('/missing', missing), web.get('/flaky', flaky)])
+        client = HttpClient(retry_backoff=0.01)
+        base = f'http://127.0.0.1:{_port(runner)}'
+        try:
+            save_path = str(tmp_path / 'image')
+            _res = await client.download(f'{base}/image', save_path=save_path)
+            assert _res.success() and _res.result == save_path
+            assert (tmp_path / 'image').read_bytes() == b'x' * 200 * 1024
+            assert [x.name for x in tmp_path.iterdir()] == ['image']
+
+            # 非临时错误的状态码不重试, 也不返回错误页面
+            _res = await client.get_text(f'{base}/missing')
+            assert not _res.success() and _res.result == ''
+
+            _res = await client.get_json(f'{base}/flaky')
+            assert _res.success() and _res.result == {'ok': True}
+            assert counts['flaky'] == 2
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+import asyncio
+from omega_miya.utils.Omega_Base import Result
+from omega_miya.utils.Omega_plugin_utils.image_cache import ImageCache
+
+
+def test_coalesce_leader_cancelled(tmp_path):
+    cache = ImageCache(cache_dir=str(tmp_path))
+    calls = []
+
+    async def fetcher() -> Result:
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return Result(error=False, info='Success', result=b'image')
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_fetch(key='k', fetcher=fetcher))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_fetch(key='k', fetcher=fetcher))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        _res = await follower
+        assert leader.cancelled()
+        assert _res.success() and _res.result == b'image'
+        # 加载完成后结果已写入缓存, 不再重复获取
+        _res = await cache.get_or_fetch(key='k', fetcher=fetcher)
+        assert _res.result == b'image'
+
+    asyncio.run(main())
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 1
+
+
+def test_get_source_downloads_once(tmp_path):
+    cache = ImageCache(cache_dir=str(tmp_path))
+    calls = []
+
+    async def downloader(path: str) -> Result:
+        calls.append(path)
+        await asyncio.sleep(0.01)
+        with open(path, 'wb') as f:
+            f.write(b'abc')
+        return Result(error=False, info='Success', result=path)
+
+    async def main():
+        return await asyncio.gather(*[cache.get_source(key='k', downloader=downloader) for _ in range(4)])
+
+    results = asyncio.run(main())
+    assert [x.result for x in results] == ['base64://YWJj'] * 4
+    assert len(calls) == 1
+    assert cache.stats()['disk_size'] == 3
@@ -0,0 +1,49 @@
+from omega_miya.utils.Omega_Base.pixiv_index import PixivIllustIndex
+
+
+def _index() -> PixivIllustIndex:
+    index = PixivIllustIndex()
+    index.build([
+        (1, 0, 'Artist', '初音ミク'),
+        (1, 0, 'Artist', 'VOCALOID'),
+        (2, 0, 'other', '初音'),
+        (3, 1, 'Artist', '初音ミク'),
+        (4, 0, 'painter', None)
+    ])
+    return index
+
+
+def test_build_and_match():
+    index = _index()
+    assert index.ready
+    assert index.count() == 4 and index.count(nsfw_tag=0) == 3
+    # 子串匹配, 不区分大小写, 与 ilike '%kw%' 一致
+    assert index.match(nsfw_tag=0, keyword='初音') == {1, 2}
+    assert index.match(nsfw_tag=0, keyword='ミ') == {1}
+    assert index.match(nsfw_tag=0, keyword='vocal') == {1}
+    assert index.match(nsfw_tag=0, keyword='ARTIST') == {1}
+    assert index.match(nsfw_tag=1, keyword='初音') == {3}
+    assert index.match(nsfw_tag=0, keyword='初ミ') == set()
+    assert index.match(nsfw_tag=2, keyword='初音') == set()
+    assert index.match(nsfw_tag=0, keyword=' ') == set()
+
+
+def test_search_intersection():
+    index = _index()
+    assert index.search(nsfw_tag=0, keywords=['初音', 'artist']) == {1}
+    assert index.search(nsfw_tag=0, keywords=['初音', 'painter']) == set()
+    assert index.search(nsfw_tag=0, keywords=[]) == set()
+
+
+def test_nsfw_tag_only_upgrades():
+    index = _index()
+    index.add(pid=2, nsfw_tag=1, uname='other', tags=['新tag'])
+    index.add(pid=2, nsfw_tag=0, uname='other', tags=[])
+    assert index.match(nsfw_tag=1, keyword='新tag') == {2}
+    assert index.match(nsfw_tag=0, keyword='初音') == {1}
+    assert index.count(nsfw_tag=0) == 2 and index.count(nsfw_tag=1) == 2
+    assert sorted(index.sample(nsfw_tag=0, num=10)) == [1, 4]
+    assert len(index.sample(nsfw_tag=1, num=1)) == 1
+
+    index.clear()
+    assert not index.ready and index.count() == 0
@@ -0,0 +1,43 @@
+import json
+from omega_miya.plugins.repeater.utils import SpecialReplyRules
+
+
+def _rules(tmp_path, rules: list) -> SpecialReplyRules:
+    rules_file = tmp_path / 'sp_rules.json'
+    rules_file.write_text(json.dumps(rules), encoding='utf-8')
+    return SpecialReplyRules(rules_file=str(rules_file))
+
+
+def test_uncombinable_rules(tmp_path):
+    sp_rules = _rules(tmp_path, [
+        {'pattern': '(', 'reply': 'invalid'},
+        {'pattern': '^(.+)好萌好可爱$', 'reply': '我也觉得{}好萌好可爱', 'handle': True},
+        {'pattern': r'^(\w)\1$', 'reply': '叠字{}', 'handle': True},
+        {'pattern': '(?i)^hello$', 'reply': 'hi'},
+        {'pattern': '^(?P<x>a+)b$', 'reply': 'ab'},
+        {'pattern': '^(?P<x>c+)(d+)$', 'reply': '{}-{}', 'handle': True},
+        {'pattern': '^对呀(对呀)?$', 'reply': '对呀对呀'},
+        {'pattern': '^小母猫', 'reply': '喵喵喵~'},
+        {'pattern': '^.*$', 'reply': 'fallback', 'group_id': [1]}
+    ])
+    assert sp_rules.match(group_id=None, msg='猫猫好萌好可爱') == (True, '我也觉得猫猫好萌好可爱')
+    assert sp_rules.match(group_id=None, msg='哈哈') == (True, '叠字哈')
+    assert sp_rules.match(group_id=None, msg='哈嘿') == (False, '')
+    assert sp_rules.match(group_id=None, msg='HeLLo') == (True, 'hi')
+    assert sp_rules.match(group_id=None, msg='aab') == (True, 'ab')
+    assert sp_rules.match(group_id=None, msg='ccd') == (True, 'cc-d')
+    assert sp_rules.match(group_id=None, msg='对呀') == (True, '对呀对呀')
+    assert sp_rules.match(group_id=None, msg='小母猫来了') == (True, '喵喵喵~')
+    # 群组规则排在全局规则之后
+    assert sp_rules.match(group_id=1, msg='哈哈') == (True, '叠字哈')
+    assert sp_rules.match(group_id=1, msg='其他') == (True, 'fallback')
+    assert sp_rules.match(group_id=2, msg='其他') == (False, '')
+
+
+def test_rules_keep_order(tmp_path):
+    sp_rules = _rules(tmp_path, [
+        {'pattern': '^a', 'reply': 'first'},
+        {'pattern': r'^(a)\1', 'reply': 'second'},
+        {'pattern': '^aa', 'reply': 'third'}
+    ])
+    assert sp_rules.match(group_id=None, msg='aa') == (True, 'first')
@@ -0,0 +1,36 @@
+from omega_miya.utils.Omega_plugin_utils import state_store
+from omega_miya.utils.Omega_plugin_utils.state_store import StateStore, msg_digest
+
+
+def test_lru_eviction():
+    store = StateStore(factory=list, max_size=2)
+    store.get('a').append(1)
+    store.get('b')
+    # 访问 a 后 b 为最久未访问
+    assert store.get('a') == [1]
+    store.get('c')
+    assert 'a' in store and 'c' in store and 'b' not in store
+    assert store.stats() == {'size': 2, 'max_size': 2, 'evicted': 1}
+
+
+def test_idle_eviction(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(state_store, 'monotonic', lambda: now[0])
+    store = StateStore(factory=dict, idle_ttl=10)
+    store.get('a')
+    now[0] = 5
+    store.get('b')
+    # peek 不刷新访问时间
+    assert store.peek('a') == {}
+    now[0] = 12
+    store.get('b')
+    assert 'a' not in store and 'b' in store
+    assert store.peek('a') is None
+    assert store.pop('b') == {}
+    assert len(store) == 0
+
+
+def test_msg_digest():
+    assert msg_digest('复读') == msg_digest('复读')
+    assert msg_digest('复读') != msg_digest('复读机')
+    assert len(msg_digest('复读')) == 16
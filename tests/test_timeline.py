@@ -0,0 +1,94 @@
+import random
+from omega_miya.plugins.zhoushen_hime.timeline import \
+    OVERLAP, FLASH_CONTINUOUS, FLASH_WOULD_OVERLAP, FLASH_WOULD_FLASH, FLASH_FIXED, MULTI_FLASH, \
+    TimelineEvent, sweep_timeline
+
+
+def _dialogue(start: int, end: int, style: str = 'Default') -> TimelineEvent:
+    return TimelineEvent(is_dialogue=True, start=start, end=end, style=style)
+
+
+def _pairwise(events, multi_threshold: int, style_mode: bool):
+    """
+    逐对比较的参考实现: 对每行依次检查其后同组的对话行,
+    记录叠轴的行, 直到遇到连轴或间隔小于 multi_threshold 的行为止
+    """
+    findings = []
+    for index, event in enumerate(events):
+        event_findings = []
+        for next_index in range(index + 1, len(events)):
+            next_event = events[next_index]
+            if not next_event.is_dialogue or (style_mode and next_event.style != event.style):
+                continue
+            gap = next_event.start - event.end
+            if gap == 0 or 0 < gap and gap * 10 < multi_threshold:
+                if gap > 0:
+                    event_findings.append((MULTI_FLASH, next_index, gap))
+                break
+            if gap < 0:
+                event_findings.append((OVERLAP, next_index, 0))
+        findings.append(event_findings)
+    return findings
+
+
+def test_sweep_matches_pairwise():
+    rand = random.Random(20210501)
+    compared = set()
+    for _ in range(300):
+        count = rand.randint(0, 40)
+        events = []
+        start = 0
+        for _ in range(count):
+            # 大致按时间顺序, 偶有乱序行
+            start = max(0, start + rand.randint(-150, 300))
+            events.append(TimelineEvent(is_dialogue=rand.random() > 0.15, start=start,
+                                        end=start + rand.randint(0, 400), style=rand.choice(['A', 'B'])))
+        single_threshold = rand.choice([0, 300, 500])
+        multi_threshold = rand.choice([0, 100, 300, 1000])
+        style_mode = rand.random() > 0.5
+        findings = sweep_timeline(events=events, single_threshold=single_threshold,
+                                  multi_threshold=multi_threshold, style_mode=style_mode)
+        expected = _pairwise(events=events, multi_threshold=multi_threshold, style_mode=style_mode)
+        for index, event in enumerate(events):
+            if not event.is_dialogue:
+                assert findings[index] == []
+            elif (event.end - event.start) * 10 >= single_threshold:
+                assert findings[index] == expected[index], (events, index)
+                compared.update(x[0] for x in findings[index])
+    # 随机数据覆盖叠轴与轴间闪轴两类结果
+    assert compared == {OVERLAP, MULTI_FLASH}
+
+
+def test_single_flash():
+    comment = TimelineEvent(is_dialogue=False, start=500, end=600, style='Default')
+    findings = sweep_timeline(
+        events=[
+            # 单行闪轴(20 厘秒 < 300 毫秒)与后一行依次为: 连轴, 叠轴, 补足后叠轴, 补足后闪轴, 可直接补足
+            _dialogue(0, 20), _dialogue(20, 200),
+            _dialogue(300, 320), _dialogue(310, 400),
+            _dialogue(500, 520), _dialogue(525, 600),
+            _dialogue(700, 720), _dialogue(740, 800),
+            _dialogue(900, 920), _dialogue(1000, 1100),
+            # 后一行为注释行
+            _dialogue(1200, 1220), comment._replace(start=1300),
+            _dialogue(1400, 1420), comment._replace(start=1410),
+            # 最后一行无可比较的行
+            _dialogue(1500, 1510)
+        ],
+        single_threshold=300, multi_threshold=300, style_mode=True)
+    assert findings[0] == [(FLASH_CONTINUOUS, 1, 0)]
+    assert findings[2] == [(OVERLAP, 3, 0), (FLASH_FIXED, 3, 10)]
+    assert findings[4] == [(FLASH_WOULD_OVERLAP, 5, 5)]
+    assert findings[6] == [(FLASH_WOULD_FLASH, 7, 20)]
+    assert findings[8] == [(FLASH_FIXED, 9, 10)]
+    assert findings[10] == [(FLASH_WOULD_OVERLAP, 11, 0)]
+    assert findings[12] == [(FLASH_FIXED, 13, 10)]
+    assert findings[14] == []
+
+
+def test_style_mode():
+    events = [_dialogue(0, 200, 'A'), _dialogue(100, 300, 'B'), _dialogue(150, 300, 'A')]
+    assert sweep_timeline(events=events, single_threshold=0, multi_threshold=300, style_mode=True)[0] == \
+        [(OVERLAP, 2, 0)]
+    assert sweep_timeline(events=events, single_threshold=0, multi_threshold=300, style_mode=False)[0] == \
+        [(OVERLAP, 1, 0), (OVERLAP, 2, 0)]